@@ -70,4 +70,4 @@ class PaymentAdmin(admin.ModelAdmin):
 
 @admin.register(AdminBalance)
 class AdminBalanceAdmin(admin.ModelAdmin):
-    list_display = ('balance',)
+    list_display = ('id', 'balance')
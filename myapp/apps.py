@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class MyappConfig(AppConfig):
     name = 'myapp'
+
+    def ready(self):
+        # connect the signal receivers that live outside models.py and
+        # register the system checks
+        from . import backends, bans, checks, conversations, geo, instrumentation, mailbox, reports, roster, search  # noqa: F401
@@ -0,0 +1,197 @@
+"""Batch assignment of pending inspection requests to inspectors.
+
+Each inspector has a cost: their open workload plus a penalty for recent
+complaints. A request goes to the cheapest inspector, less a proximity bonus:
+
+- when the request and the inspector were both geocoded (see geo.py), the
+  bonus depends on the distance between them, in PROXIMITY_BANDS: the full
+  bonus within the grid cells ~1 km across around the request, half of it
+  within the ones ~5 km across, none further out. Of two equally busy
+  inspectors in the same city the nearer one wins;
+- when the request has no coordinates, inspectors whose `Profile.location`
+  shares an area with its `building_location` (comma separated parts, e.g.
+  "Dhanmondi, Dhaka") get a flat bonus instead.
+
+Inspectors sit in lazy-deletion min-heaps: one global heap, one per text area
+and one per grid cell of each band. Picking an inspector only looks at the
+top of the global heap and of the request's area heaps or of the 3x3 cells
+around it in each band, so assigning is O(log inspectors) per request instead
+of a scan over every inspector.
+"""
+import heapq
+import itertools
+import math
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Complaint, InspectionRequest
+from .queries import related_count
+
+OPEN_STATUSES = ('Assigned',)
+LOAD_WEIGHT = 1.0
+COMPLAINT_WEIGHT = 2.0
+PROXIMITY_BONUS = 3.0
+# (grid cell size in degrees, share of PROXIMITY_BONUS), nearest band first;
+# the 3x3 block of cells around a request reaches 1-2 km, then 5-10 km
+PROXIMITY_BANDS = ((0.01, 1.0), (0.05, 0.5))
+COMPLAINT_WINDOW = timedelta(days=30)
+ASSIGN_BATCH_SIZE = 1000
+
+
+def location_areas(location):
+    """Normalised comma separated parts of a free-text location."""
+    if not location:
+        return ()
+    parts = (re.sub(r'\s+', ' ', part).strip().lower() for part in location.split(','))
+    return tuple(part for part in parts if part)
+
+
+def grid_cell(lat, lon, size):
+    """Heap key of the `size`-degree grid cell containing (lat, lon)."""
+    return size, math.floor(lat / size), math.floor(lon / size)
+
+
+class InspectorPool:
+    """In-memory priority queue of inspectors ordered by current cost."""
+
+    def __init__(self, inspectors, max_load=None):
+        """`inspectors` is an iterable of (id, location, open_load, recent_complaints[, lat, lon])."""
+        self.max_load = max_load
+        self.load = {}
+        self.penalty = {}
+        self.areas = {}
+        self.cells = {}
+        self.heaps = defaultdict(list)
+        self._tie = itertools.count()
+        for inspector_id, location, load, complaints, *point in inspectors:
+            self.load[inspector_id] = load
+            self.penalty[inspector_id] = complaints * COMPLAINT_WEIGHT
+            self.areas[inspector_id] = location_areas(location)
+            if point and None not in point:
+                self.cells[inspector_id] = [grid_cell(*point, size) for size, _ in PROXIMITY_BANDS]
+            self._push(inspector_id)
+
+    def __len__(self):
+        return len(self.load)
+
+    def cost(self, inspector_id):
+        return self.load[inspector_id] * LOAD_WEIGHT + self.penalty[inspector_id]
+
+    def _push(self, inspector_id):
+        if self._full(inspector_id):
+            return  # full: drop out of every heap
+        entry = (self.cost(inspector_id), next(self._tie), inspector_id)
+        heapq.heappush(self.heaps[None], entry)
+        for area in self.areas[inspector_id]:
+            heapq.heappush(self.heaps[area], entry)
+        for cell in self.cells.get(inspector_id, ()):
+            heapq.heappush(self.heaps[cell], entry)
+
+    def _full(self, inspector_id):
+        return self.max_load is not None and self.load[inspector_id] >= self.max_load
+
+    def _peek(self, key):
+        heap = self.heaps.get(key)
+        while heap:
+            cost, _, inspector_id = heap[0]
+            if cost == self.cost(inspector_id) and not self._full(inspector_id):
+                return cost, inspector_id
+            heapq.heappop(heap)  # stale entry from before a load change
+        return None
+
+    def choose(self, location, point=None):
+        """Return the best inspector id for a request at `location`, or None if all are full.
+
+        `point` is the request's (lat, lon), when it was geocoded.
+        """
+        if point and None not in point:
+            return self._choose_near(*point)
+        best = self._peek(None)
+        for area in location_areas(location):
+            top = self._peek(area)
+            if top and (best is None or top[0] - PROXIMITY_BONUS < best[0]):
+                best = (top[0] - PROXIMITY_BONUS, top[1])
+        return best[1] if best else None
+
+    def _choose_near(self, lat, lon):
+        best = self._peek(None)
+        for size, share in PROXIMITY_BANDS:
+            bonus = PROXIMITY_BONUS * share
+            _, row, col = grid_cell(lat, lon, size)
+            for cell in itertools.product((size,), (row - 1, row, row + 1), (col - 1, col, col + 1)):
+                top = self._peek(cell)
+                if top and (best is None or top[0] - bonus < best[0]):
+                    best = (top[0] - bonus, top[1])
+        return best[1] if best else None
+
+    def assign(self, inspector_id):
+        self.load[inspector_id] += 1
+        self._push(inspector_id)
+
+
+def plan_assignments(pending, pool):
+    """Yield (request_id, inspector_id) for each (request_id, location[, lat, lon]) in `pending`."""
+    for request_id, location, *point in pending:
+        inspector_id = pool.choose(location, point)
+        if inspector_id is None:
+            return
+        pool.assign(inspector_id)
+        yield request_id, inspector_id
+
+
+def load_inspector_pool(max_load=None):
+    """Build an InspectorPool from approved, unbanned inspectors with one query."""
+    since = timezone.now() - COMPLAINT_WINDOW
+    inspectors = (
+        User.objects.filter(profile__user_type='Inspector', profile__is_approved=True, profile__is_banned=False)
+        .annotate(
+            # subqueries: counting both relations over joins multiplies their rows
+            open_load=related_count(InspectionRequest, 'inspector', status__in=OPEN_STATUSES),
+            recent_complaints=related_count(Complaint, 'against_inspector', created_at__gte=since),
+        )
+        .values_list('pk', 'profile__location', 'open_load', 'recent_complaints', 'profile__latitude', 'profile__longitude')
+    )
+    return InspectorPool(inspectors, max_load=max_load)
+
+
+def assign_pending(batch_size=ASSIGN_BATCH_SIZE, limit=None, max_load=None, dry_run=False):
+    """Assign pending, unassigned requests oldest first. Returns the number assigned."""
+    pool = load_inspector_pool(max_load=max_load)
+    if not pool:
+        return 0
+    assigned = 0
+    last_pk = 0
+    while limit is None or assigned < limit:
+        size = batch_size if limit is None else min(batch_size, limit - assigned)
+        batch = list(
+            InspectionRequest.objects.filter(status='Pending', inspector__isnull=True, pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'building_location', 'latitude', 'longitude')[:size]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        by_inspector = defaultdict(list)
+        for request_id, inspector_id in plan_assignments(batch, pool):
+            by_inspector[inspector_id].append(request_id)
+        if not by_inspector:
+            break  # every inspector is at max_load
+        if dry_run:
+            assigned += sum(len(ids) for ids in by_inspector.values())
+            continue
+        with transaction.atomic():
+            for inspector_id, request_ids in by_inspector.items():
+                # re-check status so a concurrent manual assignment wins
+                assigned += InspectionRequest.objects.filter(
+                    pk__in=request_ids, status='Pending', inspector__isnull=True,
+                ).update(inspector_id=inspector_id, status='Assigned')
+    if assigned and not dry_run:
+        # .update() sends no signals; inspector loads changed
+        from .roster import bump_roster_version
+        bump_roster_version()
+    return assigned
@@ -0,0 +1,139 @@
+"""Async versions of the read-heavy views, served under ASGI.
+
+With settings.ASYNC_VIEWS on (ubr/asgi.py turns it on) urls.py routes these
+URLs here instead of to their sync versions in views.py, and the middleware
+stack stays async end to end, so a request waiting on the database holds no
+thread. They build the same context as the sync views, using the async ORM;
+helpers that only have a sync API (cache-or-database lookups, report
+rendering) run through sync_to_async.
+
+Everything a template touches is loaded before rendering: a lazy query
+inside a template raises SynchronousOnlyOperation in an async view.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import redirect, render
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+
+from .decorators import role_required
+from .geo import place_names
+from .ledger import admin_balance_total
+from .mailbox import unread_count
+from .models import InspectionRequest
+from .pagination import akeyset_page
+from .reports import can_view_report, cached_render, render_report_body, report_meta
+from .views import (
+    _admin_filtered_requests, _attach_reports, _inspector_requests, _owner_requests, _pending_inspectors,
+    _received_messages, _report_etag_value, _status_totals,
+)
+
+# url names served by this module under ASGI
+ASYNC_VIEW_NAMES = ('owner_dashboard', 'inspector_dashboard', 'admin_dashboard', 'inbox', 'view_report')
+
+
+async def _astatus_totals(requests):
+    return {status: total async for status, total in _status_totals(requests)}
+
+
+@login_required
+@role_required('Owner')
+async def owner_dashboard(request):
+    """Async owner_dashboard: the owner's requests, newest first and paginated."""
+    owned = _owner_requests(request.user)
+    status_totals = await _astatus_totals(owned)
+    status_counts = [(value, status_totals[value]) for value, _ in InspectionRequest.STATUS_CHOICES if value in status_totals]
+    requests, next_cursor = await akeyset_page(
+        owned,
+        'created_at',
+        request.GET.get('cursor'),
+        descending=True,
+    )
+    _attach_reports(requests)
+    return render(request, 'owner/dashboard.html', {
+        'data': requests,
+        'next_cursor': next_cursor,
+        'status_counts': status_counts,
+    })
+
+
+@login_required
+@role_required('Inspector')
+async def inspector_dashboard(request):
+    """Async inspector_dashboard: requests assigned to the inspector."""
+    requests = [r async for r in _inspector_requests(request.user)]
+    return render(request, 'inspector/dashboard.html', {'data': requests})
+
+
+@login_required
+@role_required('Admin')
+async def admin_dashboard(request):
+    """Async admin_dashboard: filtered, cursor-paginated requests with balance info."""
+    filters, requests = _admin_filtered_requests(request)
+    status_totals = await _astatus_totals(requests)
+    status_counts = [(value, status_totals.get(value, 0)) for value, _ in InspectionRequest.STATUS_CHOICES]
+    page, next_cursor = await akeyset_page(
+        requests,
+        'created_at',
+        request.GET.get('cursor'),
+        descending=True,
+    )
+    admin_balance = await sync_to_async(admin_balance_total)()
+    pending_inspectors = [p async for p in _pending_inspectors()]
+    return render(request, 'admin/dashboard.html', {
+        'data': page,
+        'next_cursor': next_cursor,
+        'filters': filters,
+        'status_counts': status_counts,
+        'status_choices': InspectionRequest.STATUS_CHOICES,
+        'req_types': InspectionRequest.REQ_TYPES,
+        'places': place_names(),
+        'admin_balance': admin_balance,
+        'pending_inspectors': pending_inspectors,
+    })
+
+
+@login_required
+async def inbox(request):
+    """Async inbox: messages received by the user, newest first and paginated."""
+    received, next_cursor = await akeyset_page(
+        _received_messages(request.user),
+        'sent_at',
+        request.GET.get('cursor'),
+        descending=True,
+    )
+    return render(request, 'messages/inbox.html', {
+        'inbox_messages': received,
+        'next_cursor': next_cursor,
+        'unread_count': unread_count(request.user),
+    })
+
+
+@login_required
+async def view_report(request, pk):
+    """Async view_report, with the same ETag/Last-Modified handling as @condition."""
+    meta = await sync_to_async(report_meta)(pk)
+    if meta is None:
+        raise Http404('No InspectionReport matches the given query.')
+    if not can_view_report(request.user, meta):
+        messages.error(request, 'Permission denied.')
+        return redirect('dashboard_redirect')
+    etag = quote_etag(_report_etag_value('html', pk, meta, request.user))
+    last_modified = int(meta['updated_at'].timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        body = await sync_to_async(cached_render)('html', pk, render_report_body)
+        response = render(request, 'inspector/report.html', {
+            'report_body': mark_safe(body),
+            'report_pk': pk,
+            'report_owner_id': meta['owner_id'],
+        })
+        patch_cache_control(response, private=True, no_cache=True)
+    if request.method in ('GET', 'HEAD'):
+        if not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        response.headers.setdefault('ETag', etag)
+    return response
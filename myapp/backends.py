@@ -0,0 +1,170 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.db.models import CharField, Func
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
+
+from .bans import BAN_CACHE_TIMEOUT, ban_cache_key
+from .models import Profile
+
+UserModel = get_user_model()
+
+# get_user() results are cached this long; saves below invalidate them in
+# this process, the timeout bounds staleness elsewhere (e.g. the inbox badge)
+USER_CACHE_TIMEOUT = 30
+
+
+def email_key(email=None):
+    """Lower-cased email, '' as NULL: what the auth_user_email_ci_uniq index covers.
+
+    Without an argument returns the expression, for annotating querysets.
+    """
+    if email is None:
+        return Func(Lower('email'), template="NULLIF(%(expressions)s, '')", output_field=CharField())
+    return email.strip().lower() or None
+
+
+def user_cache_key(user_id):
+    return f'myapp:auth-user:{user_id}'
+
+
+def user_hash_key(user_id):
+    # the session auth hash of the cached user, i.e. of its password
+    return f'myapp:auth-user-hash:{user_id}'
+
+
+def _user_cache_entries(user):
+    return {user_cache_key(user.pk): user, user_hash_key(user.pk): user.get_session_auth_hash()}
+
+
+def _fresh_ban_flag(user):
+    """(key, flag) to seed myapp.bans with from a user just read from the database."""
+    try:
+        return ban_cache_key(user.pk), user.profile.is_banned
+    except Profile.DoesNotExist:
+        return ban_cache_key(user.pk), False
+
+
+def forget_user(user_id):
+    """Drop the cached session user, e.g. after a silent .update() of its rows."""
+    cache.delete_many([user_cache_key(user_id), user_hash_key(user_id)])
+
+
+def _stale(cached_hash, session_hash):
+    return cached_hash is not None and cached_hash != session_hash
+
+
+def forget_stale_user(session):
+    """Drop the cached session user if it has another password than the session was signed with.
+
+    After a password change in another process, this process may still cache
+    the user with the old password. django.contrib.auth would check the
+    session against it and log the user out; reloading the user avoids that,
+    and a session signed with an old password is still logged out.
+    """
+    user_id = session.get(SESSION_KEY)
+    if user_id is not None and _stale(cache.get(user_hash_key(user_id)), session.get(HASH_SESSION_KEY)):
+        forget_user(user_id)
+
+
+async def aforget_stale_user(session):
+    user_id = await session.aget(SESSION_KEY)
+    if user_id is not None and _stale(await cache.aget(user_hash_key(user_id)), await session.aget(HASH_SESSION_KEY)):
+        await cache.adelete_many([user_cache_key(user_id), user_hash_key(user_id)])
+
+
+_dummy_hash = None
+
+
+def _dummy_password_check(password):
+    # a real hash check, with the current hasher and work factor, so a login
+    # for an unknown account takes as long as one with a wrong password
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = make_password('dummy password')
+    check_password(password, _dummy_hash)
+
+
+class ProfileBackend(ModelBackend):
+    """ModelBackend that logs in by username or email and caches the session user.
+
+    Email lookups are case-insensitive and go through the unique index on
+    LOWER(email) (migration 0008). A login for an unknown account still runs
+    a full password hash, so failed logins cannot be told apart by timing.
+
+    `get_user` runs on every authenticated request to rehydrate the session
+    user. It joins the profile, so role checks further down the stack read
+    `request.user.profile` without another query, and the mailbox counter for
+    the navbar unread badge; the result is cached for USER_CACHE_TIMEOUT
+    seconds and dropped whenever the user, its profile or its counter
+    changes, or when the session's password hash no longer matches it (see
+    `forget_stale_user`). Ban checks do not trust the cached profile; they go
+    through `myapp.bans`, whose flag a fresh load seeds when it is missing.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = self._find_user(username)
+        if user is None:
+            _dummy_password_check(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        # the password hash is CPU bound; keep it off the event loop
+        return await sync_to_async(self.authenticate)(request, username, password, **kwargs)
+
+    def _find_user(self, login):
+        users = UserModel._default_manager.all()
+        if '@' in login:
+            user = users.alias(email_key=email_key()).filter(email_key=email_key(login)).first()
+            if user is not None:
+                return user
+        # usernames may contain '@' too
+        return users.filter(**{UserModel.USERNAME_FIELD: login}).first()
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = UserModel._default_manager.select_related('profile', 'mailbox').get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            cache.set_many(_user_cache_entries(user), USER_CACHE_TIMEOUT)
+            cache.add(*_fresh_ban_flag(user), BAN_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            try:
+                user = await UserModel._default_manager.select_related('profile', 'mailbox').aget(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            await cache.aset_many(_user_cache_entries(user), USER_CACHE_TIMEOUT)
+            await cache.aadd(*_fresh_ban_flag(user), BAN_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+def _user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+def _profile_changed(sender, instance, **kwargs):
+    forget_user(instance.user_id)
+
+
+post_save.connect(_user_changed, sender=UserModel, dispatch_uid='auth-cache-user-save')
+post_delete.connect(_user_changed, sender=UserModel, dispatch_uid='auth-cache-user-delete')
+post_save.connect(_profile_changed, sender=Profile, dispatch_uid='auth-cache-profile-save')
+post_delete.connect(_profile_changed, sender=Profile, dispatch_uid='auth-cache-profile-delete')
@@ -0,0 +1,46 @@
+"""Cached per-user ban flags used by BannedUserMiddleware.
+
+Every authenticated request needs to know whether the user is banned, but the
+flag only changes when an admin bans or unbans someone. Caching it (including
+the common "not banned" answer) means ordinary traffic does no extra query.
+Saving or deleting a Profile updates the flag (see the receivers below); code
+that toggles `Profile.is_banned` with .update() must call `set_user_banned`.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .models import Profile
+
+BAN_CACHE_TIMEOUT = 60 * 60  # seconds; writes below keep the value fresh
+
+
+def ban_cache_key(user_id):
+    return f'myapp:banned:{user_id}'
+
+
+def is_user_banned(user_id):
+    """Return the ban flag for `user_id`, hitting the database only on a cache miss."""
+    key = ban_cache_key(user_id)
+    banned = cache.get(key)
+    if banned is None:
+        banned = Profile.objects.filter(user_id=user_id, is_banned=True).exists()
+        cache.set(key, banned, BAN_CACHE_TIMEOUT)
+    return banned
+
+
+def set_user_banned(user_id, banned):
+    """Record a ban/unban so the next request sees it without a query."""
+    cache.set(ban_cache_key(user_id), bool(banned), BAN_CACHE_TIMEOUT)
+
+
+def _profile_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        set_user_banned(instance.user_id, instance.is_banned)
+
+
+def _profile_deleted(sender, instance, **kwargs):
+    cache.delete(ban_cache_key(instance.user_id))
+
+
+post_save.connect(_profile_saved, sender=Profile, dispatch_uid='bans-profile-save')
+post_delete.connect(_profile_deleted, sender=Profile, dispatch_uid='bans-profile-delete')
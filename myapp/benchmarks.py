@@ -0,0 +1,405 @@
+"""View benchmarks with per-view query, latency and memory budgets.
+
+Every URL in myapp/urls.py has a case below. The suite seeds data with
+seed_load_data at increasing scales and, at each scale, drives every case with
+the test client as a user of the right role, picking the users and rows with
+the most history so list views see the most data. For each view it records:
+
+- wall time (best of `repeat` warm runs),
+- SQL queries issued,
+- peak Python memory allocated while handling the request.
+
+The results are compared with the committed budgets in benchmark_budgets.json.
+A view fails when it goes over a budget, or when its query count is higher at
+the largest scale than at the smallest one (an N+1 somewhere), unless the
+budget marks it as a bulk endpoint whose query count is allowed to grow.
+
+Run it with `manage.py benchmark_views`; tests.py runs a small query-only pass.
+
+The session benchmark (`manage.py benchmark_sessions`) drives the dashboards
+under each SESSION_MODES configuration and reports requests per second and
+SQL queries per request, separating the django_session ones.
+"""
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections, reset_queries
+from django.db.backends.signals import connection_created
+from django.db.models import Count, Q
+from django.db.utils import load_backend
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .dbpool import discard_pool
+from .loadtest import percentile
+from .models import InspectionReport, InspectionRequest, Message, Thread
+
+BUDGETS_PATH = Path(__file__).resolve().parent / 'benchmark_budgets.json'
+ADMIN_USERNAME = 'bench-admin'
+
+# url name -> (role, args, query string); args/query are keys into fixtures()
+VIEW_CASES = {
+    'home': (None, (), {}),
+    'banned': (None, (), {}),
+    'signup': (None, (), {}),
+    'login': (None, (), {}),
+    'logout': ('owner', (), {}),
+    'dashboard_redirect': ('owner', (), {}),
+    'owner_dashboard': ('owner', (), {}),
+    'request_inspection': ('owner', (), {}),
+    'owner_complaint': ('owner', (), {}),
+    'inbox': ('owner', (), {}),
+    'send_message': ('owner', (), {}),
+    'view_message': ('owner', ('message',), {}),
+    'view_thread': ('owner', ('thread',), {}),
+    'owner_payments': ('owner', (), {}),
+    'payment': ('owner', ('owner_request',), {}),
+    'view_report': ('owner', ('report',), {}),
+    'download_report': ('owner', ('report',), {}),
+    'inspector_dashboard': ('inspector', (), {}),
+    'inspector_inspection': ('inspector', ('inspector_request',), {}),
+    'edit_profile': ('inspector', (), {}),
+    'admin_dashboard': ('admin', (), {}),
+    'admin_approve_inspectors': ('admin', (), {}),
+    'admin_manage_complaints': ('admin', (), {}),
+    'admin_set_fee': ('admin', ('owner_request',), {}),
+    'admin_view_users': ('admin', (), {}),
+    'admin_export': ('admin', (), {'format': 'csv'}),
+    'admin_search': ('admin', (), {'q': 'dhaka'}),
+    'admin_assign_inspector': ('admin', ('owner_request',), {}),
+    'admin_assign_inspector_list': ('admin', (), {}),
+    'admin_download_reports': ('admin', (), {'inspector': 'inspector'}),
+    'metrics': ('admin', (), {}),
+}
+
+
+def url_names():
+    from . import urls
+    return {pattern.name for pattern in urls.urlpatterns if pattern.name}
+
+
+def fixtures():
+    """Users and rows with the most history, so list views see the most data."""
+    owner = (
+        User.objects.filter(profile__user_type='Owner', profile__is_banned=False)
+        .annotate(n=Count('owner_requests')).order_by('-n', 'pk').first()
+    )
+    inspector = (
+        User.objects.filter(profile__user_type='Inspector', profile__is_banned=False, profile__is_approved=True)
+        .annotate(n=Count('assigned_inspections')).order_by('-n', 'pk').first()
+    )
+    admin, created = User.objects.get_or_create(username=ADMIN_USERNAME, defaults={'is_staff': True})
+    owner_requests = InspectionRequest.objects.filter(owner=owner).order_by('-created_at')
+    report = InspectionReport.objects.filter(inspection_request__owner=owner).order_by('pk').first()
+    message = Message.objects.filter(Q(recipient=owner) | Q(sender=owner)).order_by('pk').first()
+    thread = Thread.objects.filter(participants=owner).annotate(n=Count('messages')).order_by('-n', 'pk').first()
+    return {
+        'users': {'owner': owner, 'inspector': inspector, 'admin': admin},
+        'owner_request': owner_requests.values_list('pk', flat=True).first(),
+        'inspector_request': InspectionRequest.objects.filter(inspector=inspector).values_list('pk', flat=True).first(),
+        'report': report.pk if report else None,
+        'message': message.pk if message else None,
+        'thread': thread.pk if thread else None,
+        'inspector': inspector.pk,
+    }
+
+
+def _consume(response):
+    # drain streamed bodies chunk by chunk, as a client socket would
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+
+
+def measure_view(name, fixture, repeat=3, track_memory=True):
+    """Return {'status', 'ms', 'queries', 'kb'} for one case."""
+    role, args, query = VIEW_CASES[name]
+    url = reverse(name, args=[fixture[arg] for arg in args])
+    data = {key: fixture.get(value, value) for key, value in query.items()}
+    client = Client()
+    user = fixture['users'][role] if role else None
+
+    def get():
+        # logging in is not part of the view, so it happens before measuring
+        if user:
+            client.force_login(user)
+        started = time.perf_counter()
+        response = client.get(url, data)
+        _consume(response)
+        return response, time.perf_counter() - started
+
+    # first run: cold caches, count queries and peak memory
+    if user:
+        client.force_login(user)
+    # the handler resets the query log when a request starts; start from empty
+    reset_queries()
+    if track_memory:
+        tracemalloc.start()
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, data)
+        _consume(response)
+    peak = tracemalloc.get_traced_memory()[1] if track_memory else 0
+    if track_memory:
+        tracemalloc.stop()
+
+    best = min(get()[1] for _ in range(max(repeat, 1)))
+    return {
+        'status': response.status_code,
+        'ms': round(best * 1000, 2),
+        'queries': len(ctx.captured_queries),
+        'kb': peak // 1024,
+    }
+
+
+def run_benchmarks(scales, repeat=3, track_memory=True, seed_options=None, log=None):
+    """Seed up to each scale (cumulatively) and measure every view.
+
+    Returns {scale: {url name: measurement}}.
+    """
+    results = {}
+    seeded = 0
+    for scale in sorted(scales):
+        if scale > seeded:
+            call_command('seed_load_data', users=scale - seeded, prefix=f'bench{seeded}-', **(seed_options or {}))
+            call_command('rebuild_search_index', stdout=(seed_options or {}).get('stdout'))
+            seeded = scale
+        cache.clear()
+        fixture = fixtures()
+        results[scale] = {}
+        for name in VIEW_CASES:
+            results[scale][name] = measure_view(name, fixture, repeat=repeat, track_memory=track_memory)
+            if log:
+                log(scale, name, results[scale][name])
+    return results
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def check_budgets(results, budgets, checks=('queries', 'ms', 'kb', 'scaling')):
+    """Return a list of human-readable budget violations (empty when all pass)."""
+    failures = []
+    scales = sorted(results)
+    for name in VIEW_CASES:
+        budget = budgets.get(name)
+        if budget is None:
+            failures.append(f'{name}: no budget in {BUDGETS_PATH.name}')
+            continue
+        for scale in scales:
+            measured = results[scale][name]
+            if measured['status'] >= 500:
+                failures.append(f'{name}: HTTP {measured["status"]} at {scale} users')
+            for metric in ('queries', 'ms', 'kb'):
+                # bulk endpoints issue one query per batch of rows by design
+                if metric == 'queries' and budget.get('bulk'):
+                    continue
+                if metric in checks and measured[metric] > budget[metric]:
+                    failures.append(f'{name}: {measured[metric]} {metric} > budget {budget[metric]} at {scale} users')
+        if 'scaling' in checks and not budget.get('bulk') and len(scales) > 1:
+            low, high = results[scales[0]][name]['queries'], results[scales[-1]][name]['queries']
+            if high > low:
+                failures.append(f'{name}: query count grows with data ({low} at {scales[0]} users, {high} at {scales[-1]})')
+    return failures
+
+
+def budgets_from(results, previous=None, headroom=2.0):
+    """Budgets that the measured results pass with some slack on time/memory."""
+    budgets = {}
+    for name in VIEW_CASES:
+        measured = [results[scale][name] for scale in results]
+        budgets[name] = {
+            'queries': max(m['queries'] for m in measured),
+            'ms': round(max(m['ms'] for m in measured) * headroom + 5, 1),
+            'kb': int(max(m['kb'] for m in measured) * headroom) + 64,
+        }
+        if (previous or {}).get(name, {}).get('bulk'):
+            budgets[name]['bulk'] = True
+    return budgets
+
+
+# session modes compared by benchmark_sessions: (SESSION_ENGINE, MESSAGE_STORAGE);
+# 'db' is Django's default configuration
+SESSION_MODES = {
+    'db': ('django.contrib.sessions.backends.db', 'django.contrib.messages.storage.fallback.FallbackStorage'),
+    'cached_db': ('django.contrib.sessions.backends.cached_db', 'django.contrib.messages.storage.cookie.CookieStorage'),
+    'cache': ('django.contrib.sessions.backends.cache', 'django.contrib.messages.storage.cookie.CookieStorage'),
+    'signed_cookies': ('django.contrib.sessions.backends.signed_cookies',
+                       'django.contrib.messages.storage.cookie.CookieStorage'),
+}
+# dashboards hit by each user role, plus a form post that flashes a message
+SESSION_CASES = {
+    'owner_dashboard': ('owner', 'get', {}),
+    'inspector_dashboard': ('inspector', 'get', {}),
+    'admin_dashboard': ('admin', 'get', {}),
+    'edit_profile': ('inspector', 'post', {'phone': '01700000000', 'location': 'Dhaka'}),
+}
+
+
+class _QueryCounter:
+    """execute_wrapper counting queries across requests (the handler resets the query log)."""
+
+    def __init__(self):
+        self.total = 0
+        self.session = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        if 'django_session' in sql:
+            self.session += 1
+        return execute(sql, params, many, context)
+
+
+def measure_session_mode(mode, fixture, requests=50):
+    """Return {case: {'rps', 'queries', 'session_queries'}} for one session mode.
+
+    Each case logs in once, warms up with one request, then issues
+    `requests` more; query counts are per request.
+    """
+    engine, storage = SESSION_MODES[mode]
+    results = {}
+    with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=storage):
+        for name, (role, method, data) in SESSION_CASES.items():
+            client = Client()
+            client.force_login(fixture['users'][role])
+            url = reverse(name)
+            getattr(client, method)(url, data)
+            counter = _QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                for _ in range(requests):
+                    response = getattr(client, method)(url, data)
+                    _consume(response)
+                elapsed = time.perf_counter() - started
+            results[name] = {
+                'status': response.status_code,
+                'rps': round(requests / elapsed, 1),
+                'queries': round(counter.total / requests, 2),
+                'session_queries': round(counter.session / requests, 2),
+            }
+    return results
+
+
+def run_session_benchmarks(modes, users=200, requests=50, seed_options=None, log=None):
+    """Seed `users` users and measure the dashboards under each session mode.
+
+    Returns {mode: {case: measurement}}.
+    """
+    call_command('seed_load_data', users=users, prefix='sessions-', **(seed_options or {}))
+    fixture = fixtures()
+    results = {}
+    for mode in modes:
+        cache.clear()
+        results[mode] = measure_session_mode(mode, fixture, requests=requests)
+        if log:
+            for name, measured in results[mode].items():
+                log(mode, name, measured)
+    return results
+
+
+# database profiles compared by benchmark_connections; 'per_request' is
+# Django's default (CONN_MAX_AGE=0)
+CONNECTION_MODES = {
+    'per_request': {'CONN_MAX_AGE': 0},
+    'persistent': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True},
+    'pooled': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'POOL': {'SIZE': 4}},
+}
+POOLED_ENGINES = {
+    'django.db.backends.mysql': 'myapp.db.mysql',
+    'django.db.backends.sqlite3': 'myapp.db.sqlite3',
+}
+CONNECTION_CASES = {
+    'owner_dashboard': 'owner',
+    'inspector_dashboard': 'inspector',
+    'admin_dashboard': 'admin',
+}
+
+
+def connection_settings(mode, settings_dict):
+    """`settings_dict` with the CONNECTION_MODES[mode] profile applied."""
+    plain = {pooled: engine for engine, pooled in POOLED_ENGINES.items()}
+    engine = plain.get(settings_dict['ENGINE'], settings_dict['ENGINE'])
+    profile = {key: value for key, value in settings_dict.items() if key != 'POOL'}
+    profile.update(CONNECTION_MODES[mode])
+    profile['ENGINE'] = POOLED_ENGINES[engine] if 'POOL' in profile else engine
+    return profile
+
+
+def measure_connection_mode(mode, fixture, requests=100):
+    """Return {case: {'status', 'p50', 'p95', 'mean' (ms), 'connects'}} for one profile.
+
+    The default connection is swapped for one built from the profile. The
+    test client skips the end-of-request connection cleanup an app server
+    does, so the loop runs it after each request. `connects` is new database
+    connections per request; a pooled checkout only counts when the pool had
+    to open one.
+    """
+    original = connections[DEFAULT_DB_ALIAS]
+    settings_dict = connection_settings(mode, original.settings_dict)
+    wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, DEFAULT_DB_ALIAS)
+    original.close()
+    connections[DEFAULT_DB_ALIAS] = wrapper
+    connects = []
+    counter = lambda sender, connection, **kwargs: connects.append(1)  # noqa: E731
+    connection_created.connect(counter)
+    pooled = 'POOL' in settings_dict
+
+    def opened():
+        return wrapper.pool.connects if pooled else len(connects)
+
+    results = {}
+    try:
+        for name, role in CONNECTION_CASES.items():
+            client = Client()
+            client.force_login(fixture['users'][role])
+            url = reverse(name)
+            _consume(client.get(url))
+            close_old_connections()
+            before = opened()
+            latencies = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = client.get(url)
+                _consume(response)
+                close_old_connections()
+                latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            results[name] = {
+                'status': response.status_code,
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p95': round(percentile(latencies, 95) * 1000, 2),
+                'mean': round(sum(latencies) / requests * 1000, 2),
+                'connects': round((opened() - before) / requests, 2),
+            }
+    finally:
+        connection_created.disconnect(counter)
+        wrapper.close()
+        discard_pool(DEFAULT_DB_ALIAS)
+        connections[DEFAULT_DB_ALIAS] = original
+    return results
+
+
+def run_connection_benchmarks(modes, users=200, requests=100, seed_options=None, log=None):
+    """Seed `users` users and measure the dashboards under each connection profile.
+
+    Returns {mode: {case: measurement}}.
+    """
+    call_command('seed_load_data', users=users, prefix='connections-', **(seed_options or {}))
+    fixture = fixtures()
+    results = {}
+    for mode in modes:
+        cache.clear()
+        results[mode] = measure_connection_mode(mode, fixture, requests=requests)
+        if log:
+            for name, measured in results[mode].items():
+                log(mode, name, measured)
+    return results
@@ -0,0 +1,23 @@
+"""Cache timeouts that depend on whether every worker process sees the same cache.
+
+Code here invalidates cached values when the data behind them changes, but with
+the default per-process LocMemCache only the process that made the change drops
+its copy; the other workers keep serving theirs until it expires. Values that
+must not stay stale for long therefore get a short timeout unless a shared
+cache (REDIS_URL in ubr/settings.py) is configured.
+"""
+from django.conf import settings
+
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_is_shared(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def invalidated_timeout(shared, local):
+    """`shared` seconds when invalidation reaches every process, else `local`."""
+    return shared if cache_is_shared() else local
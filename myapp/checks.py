@@ -0,0 +1,153 @@
+"""System checks for the database connection profile (see ubr/settings.py).
+
+`check_connection_profile` only reads settings and runs with every
+`manage.py check` and runserver. `check_connection_capacity` needs the
+database, so Django runs it only for `check --database default`. Both also run
+as each app server worker starts, via `startup_self_check()` in ubr/wsgi.py
+and ubr/asgi.py.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import checks
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+TAG = 'connections'
+
+
+def _per_worker(settings_dict):
+    """Connections one worker process may hold at once."""
+    pool = settings_dict.get('POOL')
+    return pool['SIZE'] if pool else getattr(settings, 'WEB_THREADS', 1)
+
+
+@checks.register(TAG)
+def check_connection_profile(app_configs, **kwargs):
+    issues = []
+    for alias, settings_dict in settings.DATABASES.items():
+        issues += profile_issues(alias, settings_dict)
+    return issues
+
+
+def profile_issues(alias, settings_dict):
+    """Problems with one DATABASES entry's connection settings."""
+    issues = []
+    max_age = settings_dict.get('CONN_MAX_AGE', 0)
+    pool = settings_dict.get('POOL')
+    if pool:
+        if pool.get('SIZE', 1) < 1:
+            issues.append(checks.Error(
+                f"DATABASES['{alias}']['POOL']['SIZE'] must be at least 1.", id='myapp.E001',
+            ))
+        if max_age != 0:
+            issues.append(checks.Warning(
+                f"Database '{alias}' is pooled with CONN_MAX_AGE={max_age}.",
+                hint='Threads keep their connection instead of returning it to the pool; set CONN_MAX_AGE to 0.',
+                id='myapp.W004',
+            ))
+        elif not settings.ASYNC_VIEWS and pool.get('SIZE', 1) < getattr(settings, 'WEB_THREADS', 1):
+            issues.append(checks.Warning(
+                f"Database '{alias}' pools {pool['SIZE']} connections for {settings.WEB_THREADS} threads per worker.",
+                hint='Busy threads will wait for a connection; raise DB_POOL_SIZE or lower WEB_THREADS.',
+                id='myapp.W005',
+            ))
+        return issues
+    # opening an SQLite file costs no network round trip
+    if max_age == 0 and not settings.DEBUG and 'sqlite' not in settings_dict.get('ENGINE', ''):
+        issues.append(checks.Warning(
+            f"Database '{alias}' opens a new connection for every request.",
+            hint='Set DB_CONN_MAX_AGE, or DB_POOL_SIZE under ASGI.',
+            id='myapp.W001',
+        ))
+    if max_age != 0 and not settings_dict.get('CONN_HEALTH_CHECKS'):
+        issues.append(checks.Warning(
+            f"Database '{alias}' keeps connections without CONN_HEALTH_CHECKS.",
+            hint='A connection the server has dropped fails the next request that uses it.',
+            id='myapp.W002',
+        ))
+    if max_age != 0 and settings.ASYNC_VIEWS:
+        issues.append(checks.Warning(
+            f"Database '{alias}' keeps connections per thread under ASGI.",
+            hint="Threads come and go under ASGI and leave their connections open; "
+                 "set DB_CONN_MAX_AGE=0 and use DB_POOL_SIZE instead.",
+            id='myapp.W003',
+        ))
+    return issues
+
+
+@checks.register(TAG, checks.Tags.database)
+def check_connection_capacity(app_configs, databases=None, **kwargs):
+    """The database is reachable and has room for every worker's connections."""
+    issues = []
+    for alias in databases or []:
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            if connection.vendor != 'mysql':
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT @@max_connections')
+                max_connections = cursor.fetchone()[0]
+        except DatabaseError as exc:
+            issues.append(checks.Error(f"Cannot connect to database '{alias}': {exc}", id='myapp.E002'))
+            continue
+        workers = getattr(settings, 'WEB_CONCURRENCY', 1)
+        wanted = workers * _per_worker(connection.settings_dict)
+        if wanted > max_connections:
+            issues.append(checks.Warning(
+                f"{workers} workers may open {wanted} connections to '{alias}'; "
+                f"the server allows {max_connections}.",
+                hint='Lower WEB_CONCURRENCY, WEB_THREADS or DB_POOL_SIZE, or raise max_connections.',
+                id='myapp.W006',
+            ))
+    return issues
+
+
+def startup_self_check():
+    """Connect once as a worker starts, run the checks above and log what they find.
+
+    Problems are logged rather than raised, so a database that is down for a
+    moment does not keep workers from starting. DB_STARTUP_CHECK=0 skips it.
+
+    ASGI servers such as uvicorn import the application inside their event
+    loop, where Django refuses synchronous database access; the check then
+    runs in a worker thread.
+    """
+    if os.environ.get('DB_STARTUP_CHECK', '1') == '0':
+        return []
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        run = _self_check
+    else:
+        def run():
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                return executor.submit(_self_check).result()
+    try:
+        return run()
+    except Exception:
+        logger.exception('Database startup check failed')
+        return []
+
+
+def _self_check():
+    aliases = list(settings.DATABASES)
+    for alias in aliases:
+        started = time.perf_counter()
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            continue  # reported by check_connection_capacity
+        logger.info("Connected to database '%s' in %.1f ms", alias, (time.perf_counter() - started) * 1000)
+    issues = checks.run_checks(tags=[TAG], databases=aliases)
+    for issue in issues:
+        logger.log(logging.ERROR if issue.is_serious() else logging.WARNING, '%s', issue)
+    # hand the startup connection back (to the pool, when there is one)
+    connections.close_all()
+    return issues
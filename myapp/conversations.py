@@ -0,0 +1,70 @@
+"""Message threads: starting, replying to and paging through conversations.
+
+Every message belongs to a Thread. A conversation's history is read newest
+first in keyset pages straight off the (thread, sent_at) index, with the
+senders joined and the participants prefetched once per thread, so opening a
+long back-and-forth costs the same few queries as a short one.
+"""
+import re
+
+from django.db import transaction
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_save
+
+from .models import Message, Thread
+from .pagination import keyset_page
+
+THREAD_PAGE_SIZE = 30
+_REPLY_PREFIX_RE = re.compile(r'^(\s*re:\s*)+', re.IGNORECASE)
+
+
+def base_subject(subject):
+    """Subject without any leading "Re:" prefixes."""
+    return _REPLY_PREFIX_RE.sub('', subject or '').strip()
+
+
+def start_thread(sender, recipient, subject, body):
+    """Create a two-person thread with its first message; returns the message."""
+    with transaction.atomic():
+        thread = Thread.objects.create(subject=base_subject(subject))
+        thread.participants.add(sender, recipient)
+        return Message.objects.create(thread=thread, sender=sender, recipient=recipient, subject=subject, body=body)
+
+
+def thread_for(message):
+    """The message's thread, creating one for a message that predates threads."""
+    if message.thread_id is None:
+        with transaction.atomic():
+            thread = Thread.objects.create(subject=base_subject(message.subject), last_message_at=message.sent_at)
+            thread.participants.add(message.sender_id, message.recipient_id)
+            Message.objects.filter(pk=message.pk).update(thread=thread)
+        message.thread = thread
+    return message.thread
+
+
+def reply(thread, sender, body):
+    """Send `body` from `sender` to the thread's other participants."""
+    recipients = [user for user in thread.participants.all() if user.pk != sender.pk]
+    subject = f'Re: {thread.subject}' if thread.subject else 'Re:'
+    with transaction.atomic():
+        return [
+            Message.objects.create(thread=thread, sender=sender, recipient=recipient, subject=subject, body=body)
+            for recipient in recipients
+        ]
+
+
+def thread_page(thread, cursor=None, page_size=THREAD_PAGE_SIZE):
+    """(messages newest first, next_cursor) for one page of a thread."""
+    return keyset_page(
+        thread.messages.select_related('sender'), 'sent_at', cursor, page_size=page_size, descending=True,
+    )
+
+
+def _message_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.thread_id is not None:
+        Thread.objects.filter(pk=instance.thread_id).update(
+            last_message_at=Greatest(Coalesce('last_message_at', instance.sent_at), instance.sent_at),
+        )
+
+
+post_save.connect(_message_saved, sender=Message, dispatch_uid='conversations-message-save')
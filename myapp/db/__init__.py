@@ -0,0 +1 @@
+"""Pooled variants of Django's database backends (see myapp/dbpool.py)."""
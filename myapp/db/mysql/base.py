@@ -0,0 +1,14 @@
+from django.db.backends.mysql import base
+
+from myapp.dbpool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """MySQL backend whose connections come from myapp.dbpool."""
+
+    def connection_is_alive(self, conn):
+        try:
+            conn.ping()
+        except self.Database.Error:
+            return False
+        return True
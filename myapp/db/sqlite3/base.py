@@ -0,0 +1,10 @@
+from django.db.backends.sqlite3 import base
+
+from myapp.dbpool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite backend whose connections come from myapp.dbpool.
+
+    A stand-in for the pooled MySQL backend when benchmarking locally.
+    """
@@ -0,0 +1,156 @@
+"""An in-process database connection pool for the MySQL and SQLite backends.
+
+Django closes a request's connection when the request finishes (with
+CONN_MAX_AGE=0) or keeps one open per thread (with CONN_MAX_AGE > 0). Django
+only ships a pool for PostgreSQL, so the backends in myapp/db/ wrap the stock
+MySQL and SQLite ones: "closing" a connection hands it back to a per-process
+pool and "connecting" takes an idle one from it. Only a pool miss pays for
+TCP setup and authentication.
+
+The pool holds at most POOL['SIZE'] connections per worker process. A request
+that finds them all in use waits up to POOL['TIMEOUT'] seconds, then fails
+with OperationalError. Connections older than POOL['RECYCLE'] seconds are
+closed instead of reused, to stay under the server's wait_timeout. With
+CONN_HEALTH_CHECKS on, an idle connection is pinged before it is handed out.
+
+Enable it with DB_POOL_SIZE (see ubr/settings.py).
+"""
+import os
+import threading
+import time
+
+from django.db import OperationalError
+
+POOL_DEFAULTS = {'SIZE': 10, 'TIMEOUT': 10.0, 'RECYCLE': 3600}
+
+
+class ConnectionPool:
+    """At most `size` DB-API connections, reused most-recently-released first."""
+
+    def __init__(self, size, timeout=10.0, recycle=3600):
+        if size < 1:
+            raise ValueError('pool size must be at least 1')
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []  # (connection, created_at), newest last
+        self._created_at = {}  # id(connection) -> created_at, for checked-out ones
+        self.connects = 0  # new connections opened over the pool's lifetime
+
+    def acquire(self, connect, is_alive=None):
+        """Return an idle connection, or one from `connect()` if none is usable."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f'No database connection free within {self.timeout}s (pool size {self.size}).'
+            )
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn, created_at = self._idle.pop()
+                if self._expired(created_at) or (is_alive is not None and not is_alive(conn)):
+                    self._discard(conn)
+                    continue
+                self._created_at[id(conn)] = created_at
+                return conn
+            conn = connect()
+            self._created_at[id(conn)] = time.monotonic()
+            self.connects += 1
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, reusable=True):
+        """Give back a connection from acquire(); close it unless `reusable`."""
+        created_at = self._created_at.pop(id(conn), None)
+        try:
+            if reusable and created_at is not None and not self._expired(created_at):
+                with self._lock:
+                    self._idle.append((conn, created_at))
+            else:
+                self._discard(conn)
+        finally:
+            if created_at is not None:
+                self._slots.release()
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def in_use(self):
+        return len(self._created_at)
+
+    def _expired(self, created_at):
+        return self.recycle is not None and time.monotonic() - created_at > self.recycle
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_for(alias, settings_dict):
+    """The pool for a database alias in this process (a forked worker gets its own)."""
+    key = (alias, os.getpid())
+    with _pools_lock:
+        if key not in _pools:
+            options = {**POOL_DEFAULTS, **settings_dict.get('POOL', {})}
+            _pools[key] = ConnectionPool(options['SIZE'], options['TIMEOUT'], options['RECYCLE'])
+        return _pools[key]
+
+
+def discard_pool(alias):
+    """Close and forget this process's pool for `alias`."""
+    with _pools_lock:
+        pool = _pools.pop((alias, os.getpid()), None)
+    if pool is not None:
+        pool.close_idle()
+
+
+class PooledDatabaseWrapperMixin:
+    """Mix in before a backend's DatabaseWrapper to draw connections from a pool."""
+
+    @property
+    def pool(self):
+        return pool_for(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        parent = super()
+        return self.pool.acquire(
+            lambda: parent.get_new_connection(conn_params),
+            self.connection_is_alive if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+        )
+
+    def connection_is_alive(self, conn):
+        return True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # whatever the request left uncommitted must not leak into the next
+        # one; connect() resets autocommit and session state on checkout
+        reusable = not self.errors_occurred
+        if reusable:
+            try:
+                self.connection.rollback()
+            except self.Database.Error:
+                reusable = False
+        with self.wrap_database_errors:
+            self.pool.release(self.connection, reusable)
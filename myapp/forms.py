@@ -2,6 +2,8 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from django.db import transaction
+from .backends import email_key
 from .models import Profile  # <- correct usage
 
 
@@ -16,17 +18,40 @@ class SignUpForm(UserCreationForm):
         model = User
         fields = ('username', 'email', 'password1', 'password2', 'user_type', 'nid', 'phone', 'location')
 
+    def clean_email(self):
+        # emails are unique ignoring case (they can be used to log in)
+        email = self.cleaned_data.get('email', '')
+        key = email_key(email)
+        if key and User.objects.alias(email_key=email_key()).filter(email_key=key).exists():
+            raise forms.ValidationError('An account with this email already exists.')
+        return email
+
     def save(self, commit=True):
+        """Create the User and its Profile together, in one transaction.
+
+        With commit=False only the unsaved User is returned and the
+        ensure_user_profile signal gives it a default Profile when saved.
+        """
         user = super().save(commit=False)
         if commit:
-            user.save()
             user_type = self.cleaned_data.get('user_type')
-            nid = self.cleaned_data.get('nid')
-            phone = self.cleaned_data.get('phone')
-            location = self.cleaned_data.get('location')
-            # Inspectors require admin approval by default
-            is_approved = False if user_type == 'Inspector' else True
-            Profile.objects.create(user=user, user_type=user_type, nid=nid, phone=phone, location=location, is_approved=is_approved)
+            # If the user selected `Admin` during signup, grant Django admin privileges.
+            # WARNING: this makes any signup selecting Admin a true superuser.
+            if user_type == 'Admin':
+                user.is_staff = True
+                user.is_superuser = True
+            # the Profile is created below, so the post_save signal can skip it
+            user._profile_provisioned = True
+            with transaction.atomic():
+                user.save()
+                Profile.objects.create(
+                    user=user, user_type=user_type,
+                    nid=self.cleaned_data.get('nid'),
+                    phone=self.cleaned_data.get('phone'),
+                    location=self.cleaned_data.get('location'),
+                    # Inspectors require admin approval by default
+                    is_approved=user_type != 'Inspector',
+                )
         return user
 
 
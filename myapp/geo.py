@@ -0,0 +1,254 @@
+"""Offline geocoding and spatial lookups for building and inspector locations.
+
+`InspectionRequest.building_location` and `Profile.location` are free text.
+On save they are geocoded against a local gazetteer (a CSV of place names and
+coordinates, `GAZETTEER_PATH`, no network calls) and the coordinates and a
+geohash are stored next to the text:
+
+- requests in an area are found through the indexed geohash column: a
+  bounding box is covered by a few geohash cells and each cell is one
+  `LIKE 'prefix%'` range on that index;
+- nearest inspectors come from an in-memory KD-tree, which answers k-nearest
+  and bounding-box queries in microseconds for thousands of inspectors.
+"""
+import csv
+import heapq
+import itertools
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .models import InspectionRequest, Profile
+
+DEFAULT_GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+GEOHASH_PRECISION = 9
+GEOHASH_MAX_CELLS = 32
+KM_PER_DEGREE = 111.32
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+# --- gazetteer -------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def gazetteer():
+    """Return ({lowercase name: (lat, lon)}, compiled name matcher) from GAZETTEER_PATH."""
+    path = getattr(settings, 'GAZETTEER_PATH', None) or DEFAULT_GAZETTEER_PATH
+    places = {}
+    with open(path, newline='', encoding='utf-8') as fh:
+        for row in csv.DictReader(fh):
+            places[row['name'].strip().lower()] = (float(row['latitude']), float(row['longitude']))
+    # longest names first so "old dhaka" wins over "dhaka"
+    names = sorted(places, key=len, reverse=True)
+    matcher = re.compile(r'\b(' + '|'.join(re.escape(name) for name in names) + r')\b')
+    return places, matcher
+
+
+def place_names():
+    return sorted(name.title() for name in gazetteer()[0])
+
+
+def geocode(location):
+    """Return (lat, lon) for a free-text location, or None if no known place is named.
+
+    Parts are comma separated and usually run from most to least specific
+    ("House 5, Road 2, Dhanmondi, Dhaka"), so the leftmost part naming a place wins.
+    """
+    if not location:
+        return None
+    places, matcher = gazetteer()
+    for part in location.lower().split(','):
+        match = matcher.search(part)
+        if match:
+            return places[match.group(1)]
+    return None
+
+
+# --- distances and geohashes -------------------------------------------------
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def bbox_around(lat, lon, radius_km):
+    """(south, west, north, east) of a box enclosing a circle of `radius_km`."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def _cell_size(precision):
+    """(height, width) in degrees of a geohash cell of `precision` characters."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def geohash_cells(south, west, north, east, max_cells=GEOHASH_MAX_CELLS):
+    """Geohash prefixes that together cover the bounding box (at most `max_cells`)."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        cols = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * cols <= max_cells:
+            break
+    cells = set()
+    lat = south
+    while True:
+        lon = west
+        while True:
+            cells.add(geohash_encode(min(lat, north), min(lon, east), precision))
+            if lon >= east:
+                break
+            lon += width
+        if lat >= north:
+            break
+        lat += height
+    return sorted(cells)
+
+
+def in_bbox(queryset, south, west, north, east):
+    """Filter a queryset with latitude/longitude/geohash columns to a bounding box."""
+    cells = Q()
+    for cell in geohash_cells(south, west, north, east):
+        cells |= Q(geohash__startswith=cell)
+    return queryset.filter(cells).filter(
+        latitude__gte=south, latitude__lte=north, longitude__gte=west, longitude__lte=east,
+    )
+
+
+# --- in-memory KD-tree -------------------------------------------------------
+
+class KDTree:
+    """Static 2-d tree over (lat, lon, payload) items.
+
+    Longitudes are scaled by cos(mean latitude) so plain Euclidean distance is
+    a good stand-in for ground distance at city/country scale; reported
+    distances are exact haversine kilometres.
+    """
+
+    def __init__(self, items):
+        items = [(lat, lon, payload) for lat, lon, payload in items if lat is not None and lon is not None]
+        mean_lat = sum(lat for lat, _, _ in items) / len(items) if items else 0.0
+        self.scale = math.cos(math.radians(mean_lat))
+        self.size = len(items)
+        self._root = self._build([((lat, lon * self.scale), (lat, lon, payload)) for lat, lon, payload in items], 0)
+
+    def __len__(self):
+        return self.size
+
+    def _build(self, points, axis):
+        if not points:
+            return None
+        points.sort(key=lambda point: point[0][axis])
+        mid = len(points) // 2
+        return (
+            points[mid], axis,
+            self._build(points[:mid], 1 - axis),
+            self._build(points[mid + 1:], 1 - axis),
+        )
+
+    def nearest(self, lat, lon, k=1):
+        """Return up to k (distance_km, payload) pairs, nearest first."""
+        target = (lat, lon * self.scale)
+        best = []  # max-heap on squared distance via negation
+        tie = itertools.count()
+
+        def visit(node):
+            if node is None:
+                return
+            (key, item), axis, left, right = node
+            d2 = (key[0] - target[0]) ** 2 + (key[1] - target[1]) ** 2
+            if len(best) < k:
+                heapq.heappush(best, (-d2, next(tie), item))
+            elif d2 < -best[0][0]:
+                heapq.heapreplace(best, (-d2, next(tie), item))
+            diff = target[axis] - key[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(best) < k or diff * diff < -best[0][0]:
+                visit(far)
+
+        visit(self._root)
+        found = [item for _, _, item in best]
+        return sorted(
+            ((haversine_km(lat, lon, item_lat, item_lon), payload) for item_lat, item_lon, payload in found),
+            key=lambda pair: pair[0],
+        )
+
+    def within(self, south, west, north, east):
+        """Return payloads whose coordinates fall inside the bounding box."""
+        low, high = (south, west * self.scale), (north, east * self.scale)
+        found = []
+
+        def visit(node):
+            if node is None:
+                return
+            (key, (lat, lon, payload)), axis, left, right = node
+            if low[0] <= key[0] <= high[0] and low[1] <= key[1] <= high[1]:
+                found.append(payload)
+            if low[axis] <= key[axis]:
+                visit(left)
+            if key[axis] <= high[axis]:
+                visit(right)
+
+        visit(self._root)
+        return found
+
+
+# --- keep coordinates in step with the text --------------------------------
+
+def apply_geocode(instance, location):
+    """Set latitude/longitude/geohash on `instance` from `location`."""
+    point = geocode(location)
+    if point is None:
+        instance.latitude = instance.longitude = None
+        instance.geohash = ''
+    else:
+        instance.latitude, instance.longitude = point
+        instance.geohash = geohash_encode(*point)
+
+
+def _location_saved(field, raw, update_fields):
+    # a save(update_fields=[...]) that leaves the text alone, e.g. a status
+    # change, keeps its coordinates; one that saves the text should list
+    # latitude, longitude and geohash too, or the new ones are not written
+    return not raw and (update_fields is None or field in update_fields)
+
+
+@receiver(pre_save, sender=InspectionRequest)
+def geocode_request(sender, instance, raw=False, update_fields=None, **kwargs):
+    if _location_saved('building_location', raw, update_fields):
+        apply_geocode(instance, instance.building_location)
+
+
+@receiver(pre_save, sender=Profile)
+def geocode_profile(sender, instance, raw=False, update_fields=None, **kwargs):
+    if _location_saved('location', raw, update_fields):
+        apply_geocode(instance, instance.location)
@@ -0,0 +1,292 @@
+"""Per-request SQL/template timing and Prometheus metrics.
+
+InstrumentationMiddleware (middleware.py) collects a RequestStats for every
+request, sync or async:
+
+- SQL: an execute wrapper installed on every database connection counts and
+  times every query and keeps a fingerprint (the SQL text with placeholders,
+  before parameters are bound) so repeated identical queries, the usual N+1
+  symptom, can be counted;
+- templates: InstrumentedDjangoTemplates (the TEMPLATES backend) times each
+  top-level template render. Querysets evaluated lazily inside a template
+  count towards both SQL and template time.
+
+The numbers go out on the response as a `Server-Timing` header (visible in
+the browser's network panel) and into process-local histograms labelled with
+the URL name, which the `metrics` view serves in Prometheus text format. Each
+process exports its own series; Prometheus sums them per instance label.
+
+Everything on the hot path is a few perf_counter() calls and dict updates, so
+it is cheap enough to leave on in production.
+
+In development and tests, TemplateQueryDetector also watches the queries
+issued while a template renders. When the same query shape runs more than
+TEMPLATE_QUERY_THRESHOLD times in one response (a template looping over rows
+and touching a relation that was not select_related), it logs or raises,
+naming the template line and the model relation responsible. The test
+runner (testing.py) turns it into an error for the whole suite.
+"""
+import logging
+import re
+import sys
+import threading
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor, ReverseOneToOneDescriptor
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.base import Node
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+
+_current_stats = ContextVar('myapp_request_stats', default=None)
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateQueryError(Exception):
+    """A template ran the same query shape too often (TEMPLATE_QUERY_CHECK = 'raise')."""
+
+
+def query_shape(sql):
+    """SQL with placeholders, IN (...) lists of any length folded together."""
+    return _IN_LIST_RE.sub('IN (%s...)', sql)
+
+
+def _culprit(frame):
+    """(template:line, Model.relation) of the query being executed, from the call stack."""
+    template = relation = None
+    while frame is not None and (template is None or relation is None):
+        obj = frame.f_locals.get('self')
+        if relation is None:
+            if isinstance(obj, ForwardManyToOneDescriptor):
+                relation = f'{obj.field.model.__name__}.{obj.field.name}'
+            elif isinstance(obj, ReverseOneToOneDescriptor):
+                relation = f'{obj.related.model.__name__}.{obj.related.get_accessor_name()}'
+            elif hasattr(obj, 'core_filters') and hasattr(obj, 'field'):  # reverse FK manager
+                rel = obj.field.remote_field
+                relation = f'{rel.model.__name__}.{rel.get_accessor_name()}'
+        if template is None and frame.f_code.co_name == 'render_annotated' and isinstance(obj, Node):
+            origin = getattr(obj, 'origin', None)
+            name = getattr(origin, 'template_name', None) or getattr(origin, 'name', '?')
+            template = f'{name}:{obj.token.lineno}'
+        frame = frame.f_back
+    return template or 'unknown template', relation or 'unknown relation'
+
+
+class TemplateQueryDetector:
+    """Count query shapes issued while templates render; complain past a threshold."""
+
+    __slots__ = ('mode', 'threshold', 'shapes')
+
+    def __init__(self, mode, threshold):
+        self.mode = mode
+        self.threshold = threshold
+        self.shapes = Counter()
+
+    @classmethod
+    def from_settings(cls):
+        mode = getattr(settings, 'TEMPLATE_QUERY_CHECK', '')
+        if not mode:
+            return None
+        return cls(mode, getattr(settings, 'TEMPLATE_QUERY_THRESHOLD', 3))
+
+    def observe(self, sql):
+        shape = query_shape(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] != self.threshold + 1:
+            return
+        template, relation = _culprit(sys._getframe(2))
+        message = (
+            f'{template}: query repeated more than {self.threshold} times while rendering, '
+            f'via {relation} (add select_related/prefetch_related in the view): {shape}'
+        )
+        if self.mode == 'raise':
+            raise DuplicateQueryError(message)
+        logger.warning(message)
+
+
+class RequestStats:
+    """SQL and template timings of one request. Also the SQL execute wrapper."""
+
+    __slots__ = ('queries', 'sql_time', 'template_time', 'fingerprints', 'detector', '_rendering')
+
+    def __init__(self, detector=None):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.fingerprints = Counter()
+        self.detector = detector
+        self._rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._rendering and self.detector is not None:
+            self.detector.observe(sql)
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.queries += 1
+            self.fingerprints[sql] += 1
+
+    @property
+    def duplicate_queries(self):
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    def server_timing(self, total):
+        parts = [
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if self.duplicate_queries:
+            parts.append(f'dup;desc="{self.duplicate_queries} duplicate queries"')
+        return ', '.join(parts)
+
+    def activate(self):
+        return _current_stats.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_stats.reset(token)
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    # installed once on every connection; reports to the current request's
+    # RequestStats, including from sync_to_async threads, which copy the context
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def _install_execute_wrapper(sender, connection, **kwargs):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute_wrapper)
+
+
+connection_created.connect(_install_execute_wrapper, dispatch_uid='instrumentation-execute-wrapper')
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current_stats.get()
+        # includes/nested renders are part of the outer render
+        if stats is None or stats._rendering:
+            return super().render(context, request)
+        stats._rendering = True
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += perf_counter() - started
+            stats._rendering = False
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time recorded per request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-local histograms per URL name, rendered in Prometheus text format."""
+
+    HISTOGRAMS = {
+        'myapp_request_duration_seconds': ('Time spent handling the request', DURATION_BUCKETS),
+        'myapp_request_sql_queries': ('SQL queries issued per request', QUERY_BUCKETS),
+        'myapp_request_sql_duration_seconds': ('Time spent in SQL per request', DURATION_BUCKETS),
+        'myapp_request_template_duration_seconds': ('Time spent rendering templates per request', DURATION_BUCKETS),
+        'myapp_response_size_bytes': ('Response body size (non-streaming responses)', SIZE_BUCKETS),
+    }
+    DUPLICATES = 'myapp_duplicate_queries_total'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._duplicates = Counter()
+
+    def observe(self, view, stats, duration, size=None):
+        values = {
+            'myapp_request_duration_seconds': duration,
+            'myapp_request_sql_queries': stats.queries,
+            'myapp_request_sql_duration_seconds': stats.sql_time,
+            'myapp_request_template_duration_seconds': stats.template_time,
+            'myapp_response_size_bytes': size,
+        }
+        with self._lock:
+            for name, value in values.items():
+                if value is None:
+                    continue
+                key = (name, view)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+                histogram.observe(value)
+            if stats.duplicate_queries:
+                self._duplicates[view] += stats.duplicate_queries
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._duplicates.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    label = f'view="{_escape(view)}"'
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+            lines.append(f'# HELP {self.DUPLICATES} Queries repeated verbatim within one request')
+            lines.append(f'# TYPE {self.DUPLICATES} counter')
+            for view, count in sorted(self._duplicates.items()):
+                lines.append(f'{self.DUPLICATES}{{view="{_escape(view)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
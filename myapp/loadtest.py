@@ -0,0 +1,133 @@
+"""A small asyncio HTTP/1.1 load generator for comparing app servers.
+
+`run_load` keeps `connections` keep-alive connections busy against one URL
+for `duration` seconds, each sending its next request as soon as the last
+response has been read, and reports throughput and latency percentiles.
+It only speaks plain HTTP/1.1 (Content-Length or chunked bodies), which is
+all the app servers in front of this project need, so it has no
+dependencies and can hold thousands of connections from one process.
+
+Used by `manage.py benchmark_concurrency`.
+"""
+import asyncio
+import math
+import time
+from urllib.parse import urlsplit
+
+
+class LoadResult:
+    __slots__ = ('latencies', 'statuses', 'errors', 'elapsed', 'connections')
+
+    def __init__(self, connections):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.elapsed = 0.0
+        self.connections = connections
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    def summary(self):
+        """{'requests', 'rps', 'p50', 'p95', 'p99', 'max' (ms), 'errors', 'statuses'}."""
+        latencies = sorted(self.latencies)
+        return {
+            'connections': self.connections,
+            'requests': self.requests,
+            'rps': round(self.requests / self.elapsed, 1) if self.elapsed else 0.0,
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round((latencies[-1] if latencies else 0) * 1000, 1),
+            'errors': self.errors,
+            'statuses': dict(sorted(self.statuses.items())),
+        }
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (0 when empty)."""
+    if not sorted_values:
+        return 0
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def build_request(url, headers=None):
+    parts = urlsplit(url)
+    target = parts.path or '/'
+    if parts.query:
+        target += f'?{parts.query}'
+    lines = [f'GET {target} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: keep-alive']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def _read_response(reader):
+    """Read one response; return (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    version, status = status_line.split(None, 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = headers.get('connection', '').lower() != 'close' and version == b'HTTP/1.1'
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)  # chunk and its CRLF
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        keep_alive = False
+    return int(status), keep_alive
+
+
+async def _client(host, port, request, deadline, result):
+    reader = writer = None
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request)
+                await writer.drain()
+                status, keep_alive = await _read_response(reader)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                result.errors += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                await asyncio.sleep(0.01)
+                continue
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def run_load(url, connections=100, duration=10.0, headers=None):
+    """Drive `url` with `connections` concurrent keep-alive clients; return a LoadResult."""
+    parts = urlsplit(url)
+    request = build_request(url, headers)
+    result = LoadResult(connections)
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _client(parts.hostname, parts.port or 80, request, deadline, result) for _ in range(connections)
+    ))
+    result.elapsed = time.perf_counter() - started
+    return result
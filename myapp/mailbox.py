@@ -0,0 +1,76 @@
+"""Per-user unread counters for the inbox badge.
+
+MailboxCounter holds each user's unread count and latest message time. It
+changes only through atomic `UPDATE ... SET unread_count = unread_count + n`
+statements: a new message adds one for its recipient, marking a message read
+takes one away (only for messages this request actually flipped), and
+deleting an unread message takes one away. Rows are created on first use,
+by a new message only: a missing row has nothing to take away from, and
+while a user is being deleted their counter may already be gone.
+Code that bulk-creates messages must maintain the counters itself (see
+seed_load_data).
+"""
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+
+from .backends import forget_user
+from .models import MailboxCounter, Message
+
+
+def adjust_counter(user_id, delta, message_at=None):
+    """Add `delta` to a user's unread count (and move last_message_at forward)."""
+    updates = {'unread_count': F('unread_count') + delta}
+    if message_at is not None:
+        updates['last_message_at'] = Greatest(Coalesce('last_message_at', message_at), message_at)
+    if not MailboxCounter.objects.filter(pk=user_id).update(**updates):
+        if delta < 0:
+            return
+        MailboxCounter.objects.get_or_create(user_id=user_id)
+        MailboxCounter.objects.filter(pk=user_id).update(**updates)
+    # the counter is cached with the session user for the navbar badge
+    forget_user(user_id)
+
+
+def unread_count(user):
+    """Unread messages for `user`; no query when the counter was joined to the session user."""
+    try:
+        return user.mailbox.unread_count
+    except MailboxCounter.DoesNotExist:
+        return 0
+
+
+def mark_read(message, user):
+    """Mark `message` read for its recipient `user`; returns False if it already was."""
+    message.is_read = True
+    return mark_many_read([message.pk], user) == 1
+
+
+def mark_many_read(message_ids, user):
+    """Mark the unread ones of `message_ids` sent to `user` read; returns how many flipped."""
+    flipped = Message.objects.filter(pk__in=message_ids, recipient=user, is_read=False).update(is_read=True)
+    if not flipped:
+        return 0
+    adjust_counter(user.pk, -flipped)
+    # keep the counter joined to request.user in step for this response's badge
+    if User.mailbox.is_cached(user):
+        try:
+            user.mailbox.unread_count -= flipped
+        except MailboxCounter.DoesNotExist:
+            pass
+    return flipped
+
+
+def _message_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not instance.is_read:
+        adjust_counter(instance.recipient_id, 1, instance.sent_at)
+
+
+def _message_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_counter(instance.recipient_id, -1)
+
+
+post_save.connect(_message_saved, sender=Message, dispatch_uid='mailbox-message-save')
+post_delete.connect(_message_deleted, sender=Message, dispatch_uid='mailbox-message-delete')
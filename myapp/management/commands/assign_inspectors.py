@@ -0,0 +1,69 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myapp.assignment import ASSIGN_BATCH_SIZE, InspectorPool, assign_pending, plan_assignments
+from myapp.geo import geocode
+
+AREAS = ['Dhanmondi', 'Gulshan', 'Mirpur', 'Uttara', 'Banani', 'Mohammadpur', 'Motijheel', 'Badda']
+
+
+class Command(BaseCommand):
+    help = ('Assign pending inspection requests to inspectors by open load, location and '
+            'recent complaints. Use --watch to keep running as a background worker.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ASSIGN_BATCH_SIZE)
+        parser.add_argument('--limit', type=int, help='Assign at most this many requests per run')
+        parser.add_argument('--max-load', type=int, help='Skip inspectors with this many open inspections')
+        parser.add_argument('--dry-run', action='store_true', help='Plan assignments without saving them')
+        parser.add_argument('--watch', action='store_true', help='Run forever, every --interval seconds')
+        parser.add_argument('--interval', type=float, default=30.0)
+        parser.add_argument('--benchmark', type=int, metavar='N',
+                            help='Time the in-memory engine on N synthetic pending requests and exit')
+        parser.add_argument('--inspectors', type=int, default=500, help='Inspectors for --benchmark')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options['benchmark'], options['inspectors'])
+        while True:
+            started = time.perf_counter()
+            assigned = assign_pending(
+                batch_size=options['batch_size'],
+                limit=options['limit'],
+                max_load=options['max_load'],
+                dry_run=options['dry_run'],
+            )
+            verb = 'Would assign' if options['dry_run'] else 'Assigned'
+            self.stdout.write(self.style.SUCCESS(
+                f'{verb} {assigned} request(s) in {time.perf_counter() - started:.2f}s'
+            ))
+            if not options['watch']:
+                break
+            # drop connections the database may have timed out while we slept
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def benchmark(self, requests, inspectors):
+        rng = random.Random(0)
+
+        def place():
+            # a geocoded area, scattered over a couple of kilometres
+            location = f'House {rng.randint(1, 99)}, {rng.choice(AREAS)}, Dhaka'
+            lat, lon = geocode(location)
+            return location, lat + rng.uniform(-0.01, 0.01), lon + rng.uniform(-0.01, 0.01)
+
+        pool = InspectorPool(
+            (i, location, rng.randint(0, 10), rng.randint(0, 3), lat, lon)
+            for i, (location, lat, lon) in enumerate(place() for _ in range(inspectors))
+        )
+        pending = [(i, *place()) for i in range(requests)]
+        started = time.perf_counter()
+        planned = sum(1 for _ in plan_assignments(pending, pool))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{planned} assignments across {inspectors} inspectors in {elapsed:.2f}s '
+            f'({planned / elapsed:.0f} assignments/sec)'
+        ))
@@ -0,0 +1,77 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = ('Sign up and log in users through the real views and report SQL queries, time '
+            'and throughput per step: signup, login by username and by email, failed logins '
+            '(unknown email, wrong password; these should take as long as a successful one) '
+            'and an authenticated page view. Runs in a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--user-type', default='Owner', choices=['Owner', 'Inspector', 'Admin'])
+        parser.add_argument('--show-sql', action='store_true', help='Print the queries of the last signup/login')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(options['users'], options['user_type'], options['show_sql'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        for step, samples in results.items():
+            queries = [q for q, _ in samples]
+            times = [t for _, t in samples]
+            self.stdout.write(
+                f'{step:<14} {statistics.mean(queries):5.1f} queries (max {max(queries)})  '
+                f'{statistics.median(times) * 1000:7.1f} ms median  {len(times) / sum(times):7.1f}/s'
+            )
+
+    def run(self, users, user_type, show_sql):
+        password = 'Load-test-pass-42'
+        results = {step: [] for step in ('signup', 'login', 'login-email', 'login-unknown', 'login-wrong', 'page')}
+        for i in range(users):
+            client = Client()
+            username = f'bench-auth-{i}'
+            email = f'{username}@example.com'
+            signup = {
+                'username': username, 'email': email, 'password1': password,
+                'password2': password, 'user_type': user_type, 'phone': '01700000000', 'location': 'Dhaka',
+            }
+            steps = (
+                ('signup', 'post', reverse('signup'), signup, 302),
+                ('login', 'post', reverse('login'), {'username': username, 'password': password}, 302),
+                ('login-email', 'post', reverse('login'), {'username': email.upper(), 'password': password}, 302),
+                ('login-unknown', 'post', reverse('login'), {'username': f'nobody-{i}@example.com', 'password': password}, 200),
+                ('login-wrong', 'post', reverse('login'), {'username': email, 'password': 'wrong'}, 200),
+                ('page', 'get', reverse('inbox'), None, 200),
+            )
+            for step, method, url, data, expected in steps:
+                if step.startswith('login'):
+                    client.logout()
+                elif step == 'page':
+                    # log in and load the session user once; measure a warm request
+                    client.login(username=username, password=password)
+                    client.get(url)
+                # the handler resets the query log when a request starts
+                reset_queries()
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(url, data)
+                    elapsed = time.perf_counter() - started
+                if response.status_code != expected:
+                    raise RuntimeError(f'{step} returned HTTP {response.status_code}, expected {expected}')
+                results[step].append((len(ctx.captured_queries), elapsed))
+                if show_sql and i == users - 1:
+                    self.stdout.write(f'-- {step}')
+                    for query in ctx.captured_queries:
+                        self.stdout.write(f"   {query['sql'][:160]}")
+        return results
@@ -0,0 +1,83 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from myapp.async_views import ASYNC_VIEW_NAMES
+from myapp.benchmarks import VIEW_CASES, fixtures
+from myapp.loadtest import run_load
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+
+class Command(BaseCommand):
+    help = ('Hold many simultaneous keep-alive connections against running app servers and '
+            'report requests/sec and latency percentiles per view, e.g. the sync views under '
+            'a WSGI server against the async views under an ASGI server:\n'
+            '  gunicorn ubr.wsgi -w 4 --threads 8 -b 127.0.0.1:8001\n'
+            '  uvicorn ubr.asgi:application --workers 4 --port 8002\n'
+            '  manage.py benchmark_concurrency --target wsgi=http://127.0.0.1:8001 '
+            '--target asgi=http://127.0.0.1:8002\n'
+            'Uses the configured database (seed it with seed_load_data first); the servers '
+            'must share it and the session store.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                            help='Server to load, e.g. asgi=http://127.0.0.1:8002 (repeatable)')
+        parser.add_argument('--connections', type=int, default=1000, help='Simultaneous connections (default: 1000)')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds per view and target')
+        parser.add_argument('--views', nargs='+', default=list(ASYNC_VIEW_NAMES), choices=sorted(VIEW_CASES))
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, sep, url = target.partition('=')
+            if not sep or not url.startswith('http://'):
+                raise CommandError(f'--target must look like NAME=http://host:port, got {target!r}')
+            targets.append((name, url.rstrip('/')))
+        self.raise_open_file_limit(options['connections'])
+
+        try:
+            fixture = fixtures()
+        except AttributeError:
+            raise CommandError('No owners/inspectors to log in as; run seed_load_data first.')
+        cookies = {}
+        for view in options['views']:
+            role, arg_names, query = VIEW_CASES[view]
+            path = reverse(view, args=[fixture[arg] for arg in arg_names])
+            if query:
+                path += '?' + '&'.join(f'{key}={fixture.get(value, value)}' for key, value in query.items())
+            headers = {}
+            if role:
+                if role not in cookies:
+                    client = Client()
+                    client.force_login(fixture['users'][role])
+                    cookies[role] = client.cookies[settings.SESSION_COOKIE_NAME].value
+                headers['Cookie'] = f'{settings.SESSION_COOKIE_NAME}={cookies[role]}'
+            for name, base in targets:
+                result = asyncio.run(run_load(base + path, options['connections'], options['duration'], headers))
+                self.log(name, view, result.summary())
+
+    def raise_open_file_limit(self, connections):
+        if resource is None:
+            return
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = connections + 64
+        if soft < wanted:
+            limit = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+            if limit < wanted:
+                self.stderr.write(f'Open file limit is {limit}; some of {connections} connections will fail.')
+
+    def log(self, target, view, s):
+        statuses = ' '.join(f'{code}:{count}' for code, count in s['statuses'].items())
+        self.stdout.write(
+            f"{target:<8} {view:<22} {s['connections']:>5} conns  {s['rps']:>8.1f} req/s  "
+            f"p50 {s['p50']:>7.1f}  p95 {s['p95']:>7.1f}  p99 {s['p99']:>7.1f}  max {s['max']:>7.1f} ms  "
+            f"errors {s['errors']}  [{statuses}]"
+        )
@@ -0,0 +1,55 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from myapp.benchmarks import CONNECTION_MODES, run_connection_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Drive the dashboards under each database connection profile (a new connection '
+            'per request, persistent connections, the in-process pool) and report latency '
+            'percentiles and new connections per request. Runs in a throwaway test database '
+            'on the configured server, so point it at a local MySQL to see real connect costs; '
+            'SQLite works as a stand-in.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', default=list(CONNECTION_MODES), choices=list(CONNECTION_MODES))
+        parser.add_argument('--users', type=int, default=200, help='Users to seed (default: 200)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per dashboard and mode')
+        parser.add_argument('--workers', type=int, default=None, help='Seeder processes')
+
+    def handle(self, *args, **options):
+        seed_options = {'stdout': StringIO()}
+        if options['workers'] is not None:
+            seed_options['workers'] = options['workers']
+
+        test_settings = connection.settings_dict['TEST']
+        scratch = None
+        if connection.vendor == 'sqlite' and connection.creation.is_in_memory_db(test_settings['NAME'] or ':memory:'):
+            # closing an in-memory database drops it; use a file instead
+            scratch = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(scratch, 'benchmark_connections.sqlite3')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            run_connection_benchmarks(
+                options['modes'], users=options['users'], requests=options['requests'],
+                seed_options=seed_options, log=self.log,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if scratch:
+                os.rmdir(scratch)
+
+    def log(self, mode, name, measured):
+        self.stdout.write(
+            f"{mode:<12} {name:<22} {measured['status']}  p50 {measured['p50']:>7.2f}  "
+            f"p95 {measured['p95']:>7.2f}  mean {measured['mean']:>7.2f} ms  "
+            f"{measured['connects']:>5.2f} connects/request"
+        )
@@ -0,0 +1,48 @@
+import time
+from functools import reduce
+from operator import or_
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from myapp.search import SEARCH_SOURCES, search
+
+DEFAULT_QUERIES = ['dhaka', 'gulsh', 'crack beam', 'fire exit', 'late']
+
+
+class Command(BaseCommand):
+    help = ('Compare admin search (inverted index) with icontains scans on the current data. '
+            'Seed a large data set first, e.g. with seed_load_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=50)
+
+    def handle(self, *args, **options):
+        for query in options['queries']:
+            indexed, hits = self.time(lambda: search(query, limit=options['limit']), options['repeat'])
+            scanned, matches = self.time(lambda: self.icontains(query, options['limit']), options['repeat'])
+            self.stdout.write(
+                f'{query!r:<16} index {indexed * 1000:8.1f} ms ({len(hits)} hits)   '
+                f'icontains {scanned * 1000:8.1f} ms ({matches} hits)   '
+                f'speed-up x{scanned / indexed if indexed else 0:.1f}'
+            )
+
+    def time(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def icontains(self, query, limit):
+        """What the Django admin would do: every word in any field, per model."""
+        found = 0
+        words = query.split()
+        for model, fields in SEARCH_SOURCES.values():
+            conditions = [reduce(or_, (Q(**{f'{field}__icontains': word}) for field in fields)) for word in words]
+            found += len(model.objects.filter(*conditions).values_list('pk', flat=True)[:limit])
+        return found
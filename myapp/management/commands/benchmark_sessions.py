@@ -0,0 +1,41 @@
+from io import StringIO
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from myapp.benchmarks import SESSION_MODES, run_session_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Load-test the dashboards under each session/message storage mode and report '
+            'requests per second and SQL queries per request (django_session ones '
+            'separately). Runs in a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', default=list(SESSION_MODES), choices=list(SESSION_MODES))
+        parser.add_argument('--users', type=int, default=200, help='Users to seed (default: 200)')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per dashboard and mode')
+        parser.add_argument('--workers', type=int, default=None, help='Seeder processes')
+
+    def handle(self, *args, **options):
+        seed_options = {'stdout': StringIO()}
+        if options['workers'] is not None:
+            seed_options['workers'] = options['workers']
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            run_session_benchmarks(
+                options['modes'], users=options['users'], requests=options['requests'],
+                seed_options=seed_options, log=self.log,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def log(self, mode, name, measured):
+        self.stdout.write(
+            f"{mode:<15} {name:<22} {measured['status']}  {measured['rps']:>8.1f} req/s  "
+            f"{measured['queries']:>6.2f} queries  {measured['session_queries']:>5.2f} session queries"
+        )
@@ -0,0 +1,65 @@
+import json
+from io import StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from myapp.benchmarks import BUDGETS_PATH, budgets_from, check_budgets, load_budgets, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Drive every URL with the test client against seeded data at several scales, '
+            'record time, SQL queries and memory per view and compare them with '
+            'benchmark_budgets.json. Runs in a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[200, 2000],
+                            help='Number of seeded users at each step (default: 200 2000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per view; the best one counts')
+        parser.add_argument('--budgets', default=str(BUDGETS_PATH))
+        parser.add_argument('--skip', nargs='*', default=[], choices=['queries', 'ms', 'kb', 'scaling'],
+                            help='Budget checks to skip, e.g. ms on a slow CI runner')
+        parser.add_argument('--write-budgets', action='store_true',
+                            help='Write budgets from this run instead of checking them')
+        parser.add_argument('--workers', type=int, default=None, help='Seeder processes')
+
+    def handle(self, *args, **options):
+        seed_options = {'stdout': StringIO()}
+        if options['workers'] is not None:
+            seed_options['workers'] = options['workers']
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmarks(
+                options['scales'], repeat=options['repeat'], seed_options=seed_options, log=self.log,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['write_budgets']:
+            try:
+                previous = load_budgets(options['budgets'])
+            except FileNotFoundError:
+                previous = {}
+            with open(options['budgets'], 'w', encoding='utf-8') as fh:
+                json.dump(budgets_from(results, previous), fh, indent=2, sort_keys=True)
+                fh.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['budgets']}"))
+            return
+
+        checks = [c for c in ('queries', 'ms', 'kb', 'scaling') if c not in options['skip']]
+        failures = check_budgets(results, load_budgets(options['budgets']), checks)
+        for failure in failures:
+            self.stderr.write(failure)
+        if failures:
+            raise CommandError(f'{len(failures)} view budget(s) exceeded')
+        self.stdout.write(self.style.SUCCESS('All views within budget.'))
+
+    def log(self, scale, name, measured):
+        self.stdout.write(
+            f"{scale:>7} users  {name:<28} {measured['status']}  {measured['queries']:>3} queries  "
+            f"{measured['ms']:>8.1f} ms  {measured['kb']:>6} KiB"
+        )
@@ -0,0 +1,93 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+
+from myapp.pagination import encode_cursor, page_queryset
+from myapp.views import (
+    USER_SORT_FIELDS, _admin_filtered_requests, _admin_users, _inspector_requests, _owner_requests,
+    _pending_inspectors, _received_messages, _status_totals,
+)
+
+
+def _pages(label, queryset, order_field, descending=True):
+    """The first-page and next-page queries keyset_page() runs for a list."""
+    later = encode_cursor(timezone.now() if order_field.endswith('_at') else '', 0)
+    return [
+        (label, page_queryset(queryset, order_field, descending=descending)),
+        (f'{label} next page', page_queryset(queryset, order_field, later, descending=descending)),
+    ]
+
+
+def dashboard_queries(user_id=1):
+    """The list queries behind each dashboard, as (label, queryset) pairs.
+
+    Built from the same helpers the views use, so the plans are the ones
+    production runs; any user id will do.
+    """
+    _, admin_requests = _admin_filtered_requests(RequestFactory().get('/'))
+    _, pending_requests = _admin_filtered_requests(RequestFactory().get('/', {'status': 'Pending'}))
+    return [
+        *_pages('owner_dashboard', _owner_requests(user_id), 'created_at'),
+        ('owner_dashboard totals', _status_totals(_owner_requests(user_id))),
+        ('inspector_dashboard', _inspector_requests(user_id)),
+        *_pages('admin_dashboard', admin_requests, 'created_at'),
+        *_pages('admin_dashboard status', pending_requests, 'created_at'),
+        ('admin_dashboard totals', _status_totals(admin_requests)),
+        ('admin_dashboard pending inspectors', _pending_inspectors()),
+        *_pages('inbox', _received_messages(user_id), 'sent_at'),
+        *_pages('admin_view_users', _admin_users(), USER_SORT_FIELDS['username'], descending=False),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Run EXPLAIN on every dashboard query and fail if any plan falls back to a full '
+            'table scan. Run it against a database with realistic data: planners may '
+            'prefer a scan on near-empty tables.')
+
+    def handle(self, *args, **options):
+        full_scans = []
+        for label, queryset in dashboard_queries():
+            plan = self.explain(queryset)
+            scanned = self.full_scan_tables(plan)
+            if scanned:
+                full_scans.append(label)
+                self.stdout.write(self.style.ERROR(f'FULL SCAN  {label}: {", ".join(scanned)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'indexed    {label}'))
+            if options['verbosity'] > 1:
+                for row in plan:
+                    self.stdout.write(f'    {row}')
+        if full_scans:
+            raise CommandError(f'{len(full_scans)} dashboard query plan(s) use a full table scan')
+
+    def explain(self, queryset):
+        """Return the plan rows as dicts keyed by the EXPLAIN column names."""
+        sql, params = queryset.query.sql_with_params()
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def full_scan_tables(self, plan):
+        """Return the tables the plan reads without an index."""
+        tables = []
+        for row in plan:
+            if connection.vendor == 'sqlite':
+                # "SCAN inspection_request" vs "SEARCH ... USING INDEX" / "SCAN ... USING INDEX"
+                match = re.match(r'SCAN (?:TABLE )?(\w+)(.*)', row.get('detail', ''))
+                if match and 'USING' not in match.group(2):
+                    tables.append(match.group(1))
+            elif connection.vendor == 'mysql':
+                if row.get('type') == 'ALL':
+                    tables.append(row.get('table'))
+            else:
+                # PostgreSQL returns one text column per plan line
+                line = str(next(iter(row.values())))
+                match = re.search(r'Seq Scan on (\w+)', line)
+                if match:
+                    tables.append(match.group(1))
+        return tables
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from myapp.geo import apply_geocode
+from myapp.models import InspectionRequest, Profile
+
+
+class Command(BaseCommand):
+    help = 'Fill in latitude/longitude/geohash for requests and profiles from the local gazetteer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, field in ((InspectionRequest, 'building_location'), (Profile, 'location')):
+            updated = self.backfill(model, field, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Geocoded {updated} {model._meta.verbose_name_plural}'))
+
+    def backfill(self, model, field, batch_size):
+        located = 0
+        last_pk = 0
+        while True:
+            batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', field)[:batch_size])
+            if not batch:
+                return located
+            for obj in batch:
+                apply_geocode(obj, getattr(obj, field))
+                located += obj.latitude is not None
+            model.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+            last_pk = batch[-1].pk
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from myapp.models import SearchPosting
+from myapp.search import SEARCH_SOURCES, postings_for
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the admin search inverted index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        for doc_type, (model, fields) in SEARCH_SOURCES.items():
+            SearchPosting.objects.filter(doc_type=doc_type).delete()
+            indexed = 0
+            last_pk = 0
+            while True:
+                batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:options['batch_size']])
+                if not batch:
+                    break
+                postings = []
+                for obj in batch:
+                    postings.extend(postings_for(doc_type, obj))
+                with transaction.atomic():
+                    SearchPosting.objects.bulk_create(postings, batch_size=5000)
+                indexed += len(batch)
+                last_pk = batch[-1].pk
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} {doc_type} document(s)'))
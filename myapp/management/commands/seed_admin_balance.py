@@ -1,12 +1,12 @@
 from django.core.management.base import BaseCommand
-from myapp.models import AdminBalance
+from myapp.ledger import ADMIN_BALANCE_SHARDS, admin_balance_total, ensure_balance_shards
 
 class Command(BaseCommand):
-    help = 'Create initial AdminBalance row if missing'
+    help = 'Create the AdminBalance shard rows if missing'
 
     def handle(self, *args, **options):
-        obj, created = AdminBalance.objects.get_or_create(pk=1, defaults={'balance': 0})
+        created = ensure_balance_shards()
         if created:
-            self.stdout.write(self.style.SUCCESS('AdminBalance row created with balance=0'))
+            self.stdout.write(self.style.SUCCESS(f'Created {created} of {ADMIN_BALANCE_SHARDS} AdminBalance shards'))
         else:
-            self.stdout.write(self.style.WARNING(f'AdminBalance already exists with balance={obj.balance}'))
+            self.stdout.write(self.style.WARNING(f'AdminBalance shards already exist with balance={admin_balance_total()}'))
@@ -0,0 +1,274 @@
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from myapp.geo import apply_geocode, place_names
+from myapp.ledger import ADMIN_BALANCE_SHARDS, BALANCE_CACHE_KEY, ensure_balance_shards
+from myapp.models import (
+    AdminBalance, Complaint, InspectionReport, InspectionRequest, MailboxCounter, Message, Payment, Profile, Thread,
+)
+from myapp.roster import bump_roster_version
+
+# Roughly what production looks like: most requests are finished, a steady
+# trickle is waiting for an inspector or a decision.
+STATUS_WEIGHTS = {
+    'Pending': 8, 'Assigned': 10, 'Approved': 12, 'Rejected': 5, 'Completed': 25, 'Paid': 40,
+}
+USER_TYPE_WEIGHTS = {'Owner': 85, 'Inspector': 14, 'Admin': 1}
+REPORTED_STATUSES = ('Approved', 'Rejected', 'Completed', 'Paid')
+FEES = {'New Construction': Decimal('5000.00'), 'Reinspection': Decimal('2500.00')}
+HISTORY_DAYS = 730
+
+EVALUATIONS = [
+    'Columns and beams show no visible cracks.', 'Hairline cracks in the ground floor slab.',
+    'Load bearing walls are plumb and intact.', 'Rebar exposed at the parking level beam.',
+    'Foundation settlement within tolerance.', 'Water seepage near the roof parapet.',
+]
+CHECKLIST = [
+    'Fire exits clear and signed.', 'Fire extinguishers missing on upper floors.',
+    'Electrical panel earthed.', 'Stair railing below code height.', 'Setback from road respected.',
+]
+COMPLAINTS = [
+    'The inspector arrived late and left early.', 'The report does not match the building.',
+    'Inspector asked for an extra fee.', 'No one showed up for the scheduled inspection.',
+]
+MESSAGES = [
+    'When can you visit the site?', 'The documents are attached, please review.',
+    'Inspection rescheduled to next week.', 'Please confirm the building location.',
+    'Payment has been made, thanks.', 'Report is ready for download.',
+]
+
+
+@contextmanager
+def backdated(*models):
+    """Let bulk_create keep the created_at/updated_at values we set instead of now()."""
+    fields = [f for model in models for f in model._meta.concrete_fields if getattr(f, 'auto_now_add', False) or getattr(f, 'auto_now', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _init_worker():
+    if not django.apps.apps.ready:
+        django.setup()
+    # never share a connection inherited from the parent process
+    for conn in connections.all(initialized_only=True):
+        conn.close()
+
+
+def seed_chunk(chunk, first, count, options):
+    """Create `count` users (numbered from `first`) and everything they own.
+
+    bulk_create sends no signals, so Profiles are created here instead of by
+    ensure_user_profile, and coordinates are geocoded explicitly because the
+    pre_save geocoding receivers do not run either. Returns per-model counts
+    and the total paid amount.
+    """
+    rng = random.Random(options['seed'] * 1_000_003 + chunk)
+    places = place_names()
+    now = timezone.now()
+    batch_size = options['batch_size']
+    prefix = options['prefix']
+
+    def created_at():
+        return now - timedelta(days=rng.random() * HISTORY_DAYS)
+
+    def location():
+        return f'House {rng.randint(1, 200)}, Road {rng.randint(1, 40)}, {rng.choice(places)}'
+
+    with backdated(User, InspectionRequest, InspectionReport, Complaint, Thread, Message, Payment), transaction.atomic():
+        usernames = [f'{prefix}{n}' for n in range(first, first + count)]
+        User.objects.bulk_create([
+            User(username=name, email=f'{name}@example.com', password=options['password_hash'], date_joined=created_at())
+            for name in usernames
+        ], batch_size=batch_size)
+        user_ids = list(User.objects.filter(username__in=usernames).order_by('pk').values_list('pk', flat=True))
+
+        types = rng.choices(list(USER_TYPE_WEIGHTS), weights=list(USER_TYPE_WEIGHTS.values()), k=len(user_ids))
+        profiles = []
+        for user_id, user_type in zip(user_ids, types):
+            profile = Profile(
+                user_id=user_id, user_type=user_type, location=location(),
+                phone=f'01{rng.randint(300000000, 999999999)}', nid=str(rng.randint(10 ** 9, 10 ** 10 - 1)),
+                is_approved=user_type != 'Inspector' or rng.random() > 0.05,
+                is_banned=rng.random() < 0.01,
+            )
+            apply_geocode(profile, profile.location)
+            profiles.append(profile)
+        Profile.objects.bulk_create(profiles, batch_size=batch_size)
+        owners = [p.user_id for p in profiles if p.user_type == 'Owner']
+        inspectors = [p.user_id for p in profiles if p.user_type == 'Inspector' and p.is_approved] or [None]
+
+        requests = []
+        statuses = list(STATUS_WEIGHTS)
+        status_weights = list(STATUS_WEIGHTS.values())
+        for owner_id in owners:
+            for _ in range(rng.randint(0, 2 * options['requests_per_owner'])):
+                req_type = 'New Construction' if rng.random() < 0.7 else 'Reinspection'
+                status = rng.choices(statuses, weights=status_weights)[0]
+                req = InspectionRequest(
+                    owner_id=owner_id, req_type=req_type, building_location=location(), fee=FEES[req_type],
+                    status=status, inspector_id=None if status == 'Pending' else rng.choice(inspectors),
+                    created_at=created_at(),
+                )
+                apply_geocode(req, req.building_location)
+                requests.append(req)
+        InspectionRequest.objects.bulk_create(requests, batch_size=batch_size)
+        # MySQL does not return pks from bulk inserts, so read the rows back
+        rows = InspectionRequest.objects.filter(owner_id__in=owners).values_list(
+            'pk', 'owner_id', 'inspector_id', 'status', 'fee', 'created_at')
+
+        reports, payments, complaints = [], [], []
+        paid = Decimal('0')
+        for pk, owner_id, inspector_id, status, fee, created in rows.iterator(chunk_size=batch_size):
+            if status in REPORTED_STATUSES:
+                inspected = created + timedelta(days=rng.randint(1, 20))
+                reports.append(InspectionReport(
+                    inspection_request_id=pk, inspector_id=inspector_id, inspection_date=inspected,
+                    structural_evaluation=' '.join(rng.sample(EVALUATIONS, 2)),
+                    compliance_checklist=' '.join(rng.sample(CHECKLIST, 2)),
+                    decision='Rejected' if status == 'Rejected' else 'Approved',
+                    remarks=rng.choice(['', 'Follow-up recommended.', 'All clear.']),
+                    updated_at=inspected,
+                ))
+            if status == 'Paid':
+                payments.append(Payment(payer_id=owner_id, inspection_request_id=pk, amount=fee,
+                                        created_at=created + timedelta(days=rng.randint(21, 40))))
+                paid += fee
+            if inspector_id and rng.random() < options['complaint_rate']:
+                complaints.append(Complaint(
+                    reporter_id=owner_id, against_inspector_id=inspector_id, message=rng.choice(COMPLAINTS),
+                    resolved=rng.random() < 0.6, created_at=created + timedelta(days=rng.randint(1, 30)),
+                ))
+        InspectionReport.objects.bulk_create(reports, batch_size=batch_size)
+        Payment.objects.bulk_create(payments, batch_size=batch_size)
+        Complaint.objects.bulk_create(complaints, batch_size=batch_size)
+
+        # conversations of one to three messages going back and forth
+        conversations = []
+        for sender_id in user_ids:
+            for _ in range(rng.randint(0, options['messages_per_user'])):
+                recipient_id = rng.choice(user_ids)
+                first = created_at()
+                sent = [first + timedelta(hours=12 * i * rng.random()) for i in range(rng.randint(1, 3))]
+                thread = Thread(subject=rng.choice(MESSAGES)[:40], created_at=first, last_message_at=sent[-1])
+                conversations.append((thread, (sender_id, recipient_id), sent))
+        threads = [thread for thread, _, _ in conversations]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Thread.objects.bulk_create(threads, batch_size=batch_size)
+        else:
+            for thread in threads:  # MySQL does not return pks from bulk inserts
+                thread.save()
+        Participant = Thread.participants.through
+        Participant.objects.bulk_create([
+            Participant(thread_id=thread.pk, user_id=user_id)
+            for thread, pair, _ in conversations for user_id in set(pair)
+        ], batch_size=batch_size)
+        messages = []
+        for thread, pair, sent in conversations:
+            for i, sent_at in enumerate(sent):
+                sender_id, recipient_id = pair if i % 2 == 0 else pair[::-1]
+                messages.append(Message(
+                    thread_id=thread.pk, sender_id=sender_id, recipient_id=recipient_id,
+                    subject=thread.subject if i == 0 else f'Re: {thread.subject}', body=rng.choice(MESSAGES),
+                    sent_at=sent_at, is_read=sent_at < now - timedelta(days=7) or rng.random() < 0.5,
+                ))
+        Message.objects.bulk_create(messages, batch_size=batch_size)
+        # bulk_create skips the mailbox.py receivers; every recipient is a user of this chunk
+        counters = {}
+        for msg in messages:
+            counter = counters.setdefault(msg.recipient_id, MailboxCounter(user_id=msg.recipient_id))
+            if not msg.is_read:
+                counter.unread_count += 1
+            counter.last_message_at = max(filter(None, (counter.last_message_at, msg.sent_at)))
+        MailboxCounter.objects.bulk_create(counters.values(), batch_size=batch_size)
+
+        # keep the sharded admin balance equal to the sum of seeded payments
+        if paid:
+            shard = rng.randint(1, ADMIN_BALANCE_SHARDS)
+            AdminBalance.objects.filter(pk=shard).update(balance=F('balance') + paid)
+
+    return {
+        'users': len(user_ids), 'requests': len(requests), 'reports': len(reports), 'payments': len(payments),
+        'complaints': len(complaints), 'messages': len(messages), 'paid': paid,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Generate a production-sized data set (users, profiles, requests, reports, '
+            'complaints, messages, payments) for load testing, using batched bulk inserts '
+            'spread over a process pool. Run rebuild_search_index afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--requests-per-owner', type=int, default=3, help='Average requests per owner')
+        parser.add_argument('--messages-per-user', type=int, default=2,
+                            help='Average messages per user, in conversations of one to three')
+        parser.add_argument('--complaint-rate', type=float, default=0.03,
+                            help='Share of assigned requests that get a complaint')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Users per worker job (one transaction)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT statement')
+        parser.add_argument('--workers', type=int, default=min(multiprocessing.cpu_count(), 8))
+        parser.add_argument('--prefix', default='load', help='Username prefix; must not be in use yet')
+        parser.add_argument('--password', default='loadtest', help='Password of every seeded user')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Users named {options['prefix']}* already exist; pick another --prefix.")
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            workers = 0  # other processes cannot see an in-memory database
+        # hashing is deliberately slow, so hash once and share it
+        options['password_hash'] = make_password(options['password'])
+        ensure_balance_shards()
+
+        jobs = [
+            (chunk, first, min(options['chunk_size'], options['users'] - first), options)
+            for chunk, first in enumerate(range(0, options['users'], options['chunk_size']))
+        ]
+        totals = {}
+        started = time.perf_counter()
+        for done, result in enumerate(self.run(jobs, workers), 1):
+            for key, value in result.items():
+                totals[key] = totals.get(key, 0) + value
+            self.stdout.write(f'  {done}/{len(jobs)} chunks, {totals["users"]} users, {totals["requests"]} requests')
+        elapsed = time.perf_counter() - started
+
+        # bulk_create() skips the receivers that keep these caches current
+        cache.delete(BALANCE_CACHE_KEY)
+        bump_roster_version()
+        rows = sum(v for k, v in totals.items() if k != 'paid') + totals.get('users', 0)  # + one profile per user
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded ' + ', '.join(f'{v} {k}' for k, v in totals.items() if k != 'paid')
+            + f' ({rows} rows in {elapsed:.1f}s, {rows / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
+
+    def run(self, jobs, workers):
+        if workers <= 1:
+            for job in jobs:
+                yield seed_chunk(*job)
+            return
+        # forked children must not reuse the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for future in as_completed([pool.submit(seed_chunk, *job) for job in jobs]):
+                yield future.result()
@@ -0,0 +1,84 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Sum
+
+from myapp.ledger import BALANCE_CACHE_KEY, ensure_balance_shards, record_payment
+from myapp.models import AdminBalance, InspectionRequest, Payment
+
+
+class Command(BaseCommand):
+    help = ('Pay concurrently from several threads, check no balance update was lost '
+            'and report payments/sec. Use against a load-test database: the rows it '
+            'creates are removed and the balance restored afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payers', type=int, nargs='+', default=[1, 8, 32],
+                            help='Concurrency levels to run (default: 1 8 32)')
+        parser.add_argument('--payments', type=int, default=50,
+                            help='Payments made by each payer thread')
+        parser.add_argument('--amount', default='500.00')
+
+    def handle(self, *args, **options):
+        amount = Decimal(options['amount'])
+        ensure_balance_shards()
+        payer, self.created_payer = User.objects.get_or_create(username='stress-payer')
+        req = InspectionRequest.objects.create(owner=payer, building_location='stress test')
+        try:
+            for threads in options['payers']:
+                self.run_level(threads, options['payments'], payer, req, amount)
+        finally:
+            self.cleanup(payer, req)
+
+    def run_level(self, threads, per_thread, payer, req, amount):
+        before = self.balance()
+        errors = []
+
+        def pay():
+            try:
+                for _ in range(per_thread):
+                    record_payment(payer, req, amount)
+            except Exception as exc:  # reported below, thread must not die silently
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=pay) for _ in range(threads)]
+        started = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise CommandError(f'{len(errors)} payer thread(s) failed: {errors[0]!r}')
+        expected = amount * threads * per_thread
+        credited = self.balance() - before
+        if credited != expected:
+            raise CommandError(f'Lost updates at {threads} payers: expected {expected}, credited {credited}')
+        total = threads * per_thread
+        self.stdout.write(self.style.SUCCESS(
+            f'{threads:>3} payers: {total} payments in {elapsed:.2f}s '
+            f'({total / elapsed:.0f} payments/sec), no lost updates'
+        ))
+
+    def balance(self):
+        return AdminBalance.objects.aggregate(total=Sum('balance'))['total'] or Decimal('0')
+
+    def cleanup(self, payer, req):
+        # only the sum of the shards matters, so take the credit back from one shard
+        payments = Payment.objects.filter(inspection_request=req)
+        paid = payments.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        AdminBalance.objects.filter(pk=1).update(balance=F('balance') - paid)
+        # record_payment() also added every credit to the cached total
+        cache.delete(BALANCE_CACHE_KEY)
+        payments.delete()
+        req.delete()
+        if self.created_payer:
+            payer.delete()
@@ -1,27 +1,146 @@
+import logging
+import re
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
 from django.shortcuts import redirect
-from django.contrib.auth import logout
+from django.contrib.auth import alogout, logout
 from django.urls import reverse
 
+from .backends import aforget_stale_user, forget_stale_user
+from .bans import is_user_banned
+from .instrumentation import RequestStats, TemplateQueryDetector, registry
+from .models import Profile
 
-class BannedUserMiddleware:
-    """Middleware that logs out and redirects banned users to a 'banned' page.
+logger = logging.getLogger(__name__)
 
-    It ignores static/media/admin and the banned page itself to avoid redirect loops.
+
+class AsyncCapableMiddleware:
+    """Base for middleware that runs natively under both WSGI and ASGI.
+
+    Subclasses implement `__call__` for sync requests and `__acall__` for
+    async ones; Django picks the mode from the next handler in the chain, so
+    async views behind this middleware are not pushed onto a thread.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # Allow unauthenticated users
-        if not request.user.is_authenticated:
-            return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class InstrumentationMiddleware(AsyncCapableMiddleware):
+    """Record SQL, template and total time per request (see instrumentation.py).
+
+    Adds a `Server-Timing` header and feeds the per-view histograms served by
+    the `metrics` view. Sits just before UserRoleMiddleware so the lazy
+    session/user/profile load is counted too. Queries a streaming response
+    makes after the view returns are not counted. With TEMPLATE_QUERY_CHECK
+    set, N+1 queries from templates are logged or raised.
+    """
 
-        path = request.path
+    def handle(self, request):
+        stats = RequestStats(TemplateQueryDetector.from_settings())
+        token = stats.activate()
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stats.deactivate(token)
+        return self.record(request, response, stats, perf_counter() - started)
+
+    async def __acall__(self, request):
+        # queries run in sync_to_async threads, which inherit the context
+        # and so report to the same RequestStats
+        stats = RequestStats(TemplateQueryDetector.from_settings())
+        token = stats.activate()
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stats.deactivate(token)
+        return self.record(request, response, stats, perf_counter() - started)
+
+    @staticmethod
+    def record(request, response, stats, duration):
+        response['Server-Timing'] = stats.server_timing(duration)
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        registry.observe(view, stats, duration, size)
+        if stats.duplicate_queries:
+            sql, count = stats.fingerprints.most_common(1)[0]
+            logger.debug('%s: %d duplicate queries, e.g. %dx %s', view, stats.duplicate_queries, count, sql)
+        return response
+
+
+class UserRoleMiddleware(AsyncCapableMiddleware):
+    """Attach the logged-in user's Profile and role to the request once.
+
+    Sets `request.profile` (or None) and `request.role` (the profile's
+    user_type, or None). With `myapp.backends.ProfileBackend` the profile was
+    already joined when the session user was loaded, so this adds no query.
+    Decorators and views read these attributes instead of looking the
+    profile up again.
+
+    For async requests the session user is loaded with `request.auser()` and
+    stored as `request.user`, so async views, templates and the middleware
+    below never trigger the lazy, synchronous user lookup.
+
+    A cached session user with another password than the session's is dropped
+    before the user is loaded (see `myapp.backends.forget_stale_user`).
+    """
 
+    def handle(self, request):
+        forget_stale_user(request.session)
+        self.attach(request, request.user)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        await aforget_stale_user(request.session)
+        request.user = await request.auser()
+        self.attach(request, request.user)
+        return await self.get_response(request)
+
+    @staticmethod
+    def attach(request, user):
+        profile = None
+        if user.is_authenticated:
+            try:
+                profile = user.profile
+            except Profile.DoesNotExist:
+                profile = None
+        request.profile = profile
+        request.role = profile.user_type if profile else None
+
+
+class BannedUserMiddleware(AsyncCapableMiddleware):
+    """Middleware that logs out and redirects banned users to a 'banned' page.
+
+    It ignores static/media/admin and the banned page itself to avoid redirect loops.
+    The ignore list is compiled once at startup. The ban flag comes from the
+    cached flag in `myapp.bans`, which bans and unbans keep current, so requests
+    from users who are not banned cost no extra query. The profile cached with
+    the session user is not used for this; it can be stale.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.ignored_paths = self.compile_ignored_paths()
+
+    @staticmethod
+    def compile_ignored_paths():
         # Safe paths to ignore
-        static_url = getattr(settings, 'STATIC_URL', '/static/')
+        static_url = getattr(settings, 'STATIC_URL', None) or '/static/'
         ignore_prefixes = [static_url, '/media/', '/admin/']
 
         try:
@@ -30,19 +149,30 @@ class BannedUserMiddleware:
             banned_path = '/banned/'
 
         ignore_prefixes.append(banned_path)
+        return re.compile('|'.join(re.escape(p) for p in ignore_prefixes))
 
-        if any(path.startswith(p) for p in ignore_prefixes):
-            return self.get_response(request)
+    def needs_check(self, request, user):
+        # Allow unauthenticated users and the ignored paths
+        return user.is_authenticated and not self.ignored_paths.match(request.path)
 
-        # Check profile ban flag
-        try:
-            profile = request.user.profile
-        except Exception:
-            profile = None
+    def handle(self, request):
+        if not self.needs_check(request, request.user):
+            return self.get_response(request)
 
-        if profile and getattr(profile, 'is_banned', False):
+        if is_user_banned(request.user.pk):
             # Logout user and redirect to banned page
             logout(request)
             return redirect('banned')
 
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        user = await request.auser()
+        if not self.needs_check(request, user):
+            return await self.get_response(request)
+
+        if await sync_to_async(is_user_banned)(user.pk):
+            await alogout(request)
+            return redirect('banned')
+
+        return await self.get_response(request)
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['-created_at'], name='complaint_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspectionrequest',
+            index=models.Index(fields=['owner', '-created_at'], name='inspreq_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspectionrequest',
+            index=models.Index(fields=['owner', 'status', '-created_at'], name='inspreq_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspectionrequest',
+            index=models.Index(fields=['inspector', '-created_at'], name='inspreq_insp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspectionrequest',
+            index=models.Index(fields=['inspector', 'status', '-created_at'], name='inspreq_insp_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspectionrequest',
+            index=models.Index(fields=['status', '-created_at'], name='inspreq_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspectionrequest',
+            index=models.Index(fields=['-created_at'], name='inspreq_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', '-sent_at'], name='message_recipient_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['user_type', 'is_approved'], name='profile_type_approved_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0002_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
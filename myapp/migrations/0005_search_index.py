@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_geocoded_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('doc_type', models.CharField(max_length=16)),
+                ('doc_id', models.BigIntegerField()),
+                ('weight', models.FloatField(default=1.0)),
+            ],
+            options={
+                'db_table': 'search_posting',
+                'indexes': [models.Index(fields=['term', 'doc_type'], name='search_term_idx'), models.Index(fields=['doc_type', 'doc_id'], name='search_doc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Message = apps.get_model('myapp', 'Message')
+    MailboxCounter = apps.get_model('myapp', 'MailboxCounter')
+    summaries = (
+        Message.objects.order_by().values('recipient')
+        .annotate(unread=Count('pk', filter=Q(is_read=False)), last=Max('sent_at'))
+        .values_list('recipient', 'unread', 'last')
+    )
+    MailboxCounter.objects.bulk_create(
+        (MailboxCounter(user_id=user_id, unread_count=unread, last_message_at=last)
+         for user_id, unread, last in summaries.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('myapp', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='mailbox', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_count', models.IntegerField(default=0)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'mailbox_counter',
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
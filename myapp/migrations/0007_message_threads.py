@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def group_into_threads(apps, schema_editor):
+    """One thread per pair of users and subject (without Re: prefixes)."""
+    import re
+
+    Message = apps.get_model('myapp', 'Message')
+    Thread = apps.get_model('myapp', 'Thread')
+    Participant = Thread.participants.through
+    reply_prefix = re.compile(r'^(\s*re:\s*)+', re.IGNORECASE)
+    threads = {}
+    rows = Message.objects.order_by('sent_at', 'pk').values_list('pk', 'sender_id', 'recipient_id', 'subject', 'sent_at')
+    for pk, sender_id, recipient_id, subject, sent_at in rows.iterator(chunk_size=2000):
+        base = reply_prefix.sub('', subject or '').strip()
+        key = (min(sender_id, recipient_id), max(sender_id, recipient_id), base.lower())
+        if key not in threads:
+            thread = Thread.objects.create(subject=base)
+            Participant.objects.bulk_create([
+                Participant(thread_id=thread.pk, user_id=user_id) for user_id in set(key[:2])
+            ])
+            threads[key] = {'pk': thread.pk, 'first': sent_at, 'messages': []}
+        threads[key]['last'] = sent_at
+        threads[key]['messages'].append(pk)
+    for thread in threads.values():
+        Thread.objects.filter(pk=thread['pk']).update(created_at=thread['first'], last_message_at=thread['last'])
+        ids = thread['messages']
+        for start in range(0, len(ids), 500):
+            Message.objects.filter(pk__in=ids[start:start + 500]).update(thread_id=thread['pk'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_mailbox_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Thread',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('participants', models.ManyToManyField(related_name='threads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'message_thread',
+            },
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='myapp.thread'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['thread', '-sent_at'], name='message_thread_sent_idx'),
+        ),
+        migrations.RunPython(group_into_threads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import CharField, Count, Func
+from django.db.models.functions import Lower
+
+# the same expression as myapp.backends.email_key(); '' is inlined rather than
+# bound so that queries match the index expression on every backend
+EMAIL_KEY = Func(Lower('email'), template="NULLIF(%(expressions)s, '')", output_field=CharField())
+CONSTRAINT = models.UniqueConstraint(EMAIL_KEY, name='auth_user_email_ci_uniq')
+
+
+def add_email_index(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.annotate(key=EMAIL_KEY).exclude(key=None)
+        .values('key').annotate(n=Count('pk')).filter(n__gt=1).values_list('key', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Cannot add a unique case-insensitive index on auth_user.email; '
+            f'these addresses belong to more than one user: {", ".join(duplicates)}'
+        )
+    schema_editor.add_constraint(User, CONSTRAINT)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_constraint(apps.get_model('auth', 'User'), CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+    """Email logins look users up by LOWER(email); index it, unique, ignoring blank emails.
+
+    auth.User belongs to another app, so the index is created here directly
+    rather than declared in the model's Meta.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('myapp', '0007_message_threads'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
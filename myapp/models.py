@@ -17,6 +17,10 @@ class Profile(models.Model):
     nid = models.CharField(max_length=50, blank=True, null=True)
     phone = models.CharField(max_length=30, blank=True, null=True)
     location = models.CharField(max_length=255, blank=True, null=True)
+    # geocoded from `location` on save, see geo.py
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
     is_approved = models.BooleanField(default=True)  # Inspectors require admin approval
     is_banned = models.BooleanField(default=False)
 
@@ -24,6 +28,10 @@ class Profile(models.Model):
         return f"{self.user.username} ({self.user_type})"
     class Meta:
         db_table = 'profile'
+        indexes = [
+            # admin_approve_inspectors / admin dashboard pending approvals
+            models.Index(fields=['user_type', 'is_approved'], name='profile_type_approved_idx'),
+        ]
 
 
 class InspectionRequest(models.Model):
@@ -43,6 +51,10 @@ class InspectionRequest(models.Model):
     inspector = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_inspections')
     req_type = models.CharField(max_length=30, choices=REQ_TYPES, default='New Construction')
     building_location = models.CharField(max_length=255)
+    # geocoded from `building_location` on save, see geo.py
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
     fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -51,6 +63,16 @@ class InspectionRequest(models.Model):
         return f"{self.owner.username} - {self.building_location} ({self.status})"
     class Meta:
         db_table = 'inspection_request'
+        indexes = [
+            # owner / inspector dashboards: filter by user (+ status), newest first
+            models.Index(fields=['owner', '-created_at'], name='inspreq_owner_created_idx'),
+            models.Index(fields=['owner', 'status', '-created_at'], name='inspreq_owner_status_idx'),
+            models.Index(fields=['inspector', '-created_at'], name='inspreq_insp_created_idx'),
+            models.Index(fields=['inspector', 'status', '-created_at'], name='inspreq_insp_status_idx'),
+            # admin dashboard: status filter / per-status totals, newest first
+            models.Index(fields=['status', '-created_at'], name='inspreq_status_created_idx'),
+            models.Index(fields=['-created_at'], name='inspreq_created_idx'),
+        ]
 
 
 class InspectionReport(models.Model):
@@ -61,6 +83,8 @@ class InspectionReport(models.Model):
     compliance_checklist = models.TextField(blank=True)
     decision = models.CharField(max_length=20, choices=(('Approved','Approved'),('Rejected','Rejected')), blank=True)
     remarks = models.TextField(blank=True)
+    # version stamp for the render cache and ETag/Last-Modified (see reports.py)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Report for {self.inspection_request}"
@@ -80,9 +104,27 @@ class Complaint(models.Model):
         return f"Complaint by {self.reporter.username} against {self.against_inspector.username if self.against_inspector else 'N/A'}"
     class Meta:
         db_table = 'complaint'
+        indexes = [
+            models.Index(fields=['-created_at'], name='complaint_created_idx'),
+        ]
+
+
+class Thread(models.Model):
+    # A conversation; its messages load newest first through the
+    # (thread, sent_at) index on Message. See conversations.py.
+    subject = models.CharField(max_length=200, blank=True)
+    participants = models.ManyToManyField(User, related_name='threads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.subject or f"Thread {self.pk}"
+    class Meta:
+        db_table = 'message_thread'
 
 
 class Message(models.Model):
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, null=True, blank=True, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
     subject = models.CharField(max_length=200, blank=True)
@@ -94,6 +136,26 @@ class Message(models.Model):
         return f"Message from {self.sender.username} to {self.recipient.username}"
     class Meta:
         db_table = 'message'
+        indexes = [
+            # inbox: a recipient's messages, newest first
+            models.Index(fields=['recipient', '-sent_at'], name='message_recipient_sent_idx'),
+            # a conversation's history, newest first
+            models.Index(fields=['thread', '-sent_at'], name='message_thread_sent_idx'),
+        ]
+
+
+class MailboxCounter(models.Model):
+    # Denormalised inbox summary per user, kept in step with Message by
+    # mailbox.py, so the unread badge is a primary-key read (joined to the
+    # session user, see backends.py) however big the mailbox gets.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='mailbox')
+    unread_count = models.IntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count} unread"
+    class Meta:
+        db_table = 'mailbox_counter'
 
 
 class Payment(models.Model):
@@ -109,7 +171,8 @@ class Payment(models.Model):
 
 
 class AdminBalance(models.Model):
-    # Single-row table to track demo admin balance
+    # Demo admin balance, split across several rows (shards) so concurrent
+    # payments do not contend on one row; the balance is the sum. See ledger.py.
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     def __str__(self):
@@ -118,6 +181,26 @@ class AdminBalance(models.Model):
         db_table = 'admin_balance'
 
 
+class SearchPosting(models.Model):
+    # One row per (term, document) of the admin search inverted index; kept
+    # up to date from post_save/post_delete signals in search.py.
+    term = models.CharField(max_length=64)
+    doc_type = models.CharField(max_length=16)
+    doc_id = models.BigIntegerField()
+    weight = models.FloatField(default=1.0)
+
+    def __str__(self):
+        return f"{self.term} -> {self.doc_type}:{self.doc_id}"
+    class Meta:
+        db_table = 'search_posting'
+        indexes = [
+            # prefix lookups: term LIKE 'abc%'
+            models.Index(fields=['term', 'doc_type'], name='search_term_idx'),
+            # reindex / delete one document
+            models.Index(fields=['doc_type', 'doc_id'], name='search_doc_idx'),
+        ]
+
+
 # Ensure a Profile exists for every User. This creates a Profile when a User
 # is created and also ensures one exists if the signal fires for an existing
 # user without a Profile (get_or_create is idempotent).
@@ -126,11 +209,19 @@ from django.dispatch import receiver
 
 
 @receiver(post_save, sender=User)
-def ensure_user_profile(sender, instance, created, **kwargs):
+def ensure_user_profile(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Saves limited to some fields (last_login on every login, password
+    # changes) cannot change the role, and SignUpForm.save() creates the
+    # Profile itself in the same transaction as the User.
+    if raw or update_fields is not None or getattr(instance, '_profile_provisioned', False):
+        return
+    is_admin = instance.is_staff or instance.is_superuser
+    if created:
+        Profile.objects.create(user=instance, user_type='Admin' if is_admin else 'Owner')
+        return
     profile, _ = Profile.objects.get_or_create(user=instance)
-    # If the User has admin/staff flags (e.g. created via createsuperuser),
+    # If the User has admin/staff flags (e.g. set in the Django admin),
     # ensure their Profile reflects that role so dashboard routing works.
-    if instance.is_staff or instance.is_superuser:
-        if profile.user_type != 'Admin':
-            profile.user_type = 'Admin'
-            profile.save()
+    if is_admin and profile.user_type != 'Admin':
+        profile.user_type = 'Admin'
+        profile.save()
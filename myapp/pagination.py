@@ -0,0 +1,76 @@
+"""Keyset (cursor) pagination helpers shared by the list views.
+
+OFFSET pagination gets slower the deeper you page because the database still
+has to walk every skipped row. Keyset pagination instead remembers the sort
+value and pk of the last row on the page and asks for rows strictly after it,
+which the database can answer straight from an index.
+"""
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'myapp.pagination'
+DEFAULT_PAGE_SIZE = 50
+
+
+def encode_cursor(value, pk):
+    """Return an opaque, tamper-proof cursor for (sort value, pk)."""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return signing.dumps([value, pk], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """Return (value, pk) from a cursor, or None if it is missing/invalid."""
+    if not cursor:
+        return None
+    try:
+        value, pk = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return value, pk
+
+
+def page_queryset(queryset, order_field, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=False):
+    """The query keyset_page() runs for one page (page_size + 1 rows)."""
+    position = decode_cursor(cursor)
+    if position is not None:
+        value, pk = position
+        if descending:
+            after = Q(**{f'{order_field}__lt': value}) | Q(**{order_field: value, 'pk__lt': pk})
+        else:
+            after = Q(**{f'{order_field}__gt': value}) | Q(**{order_field: value, 'pk__gt': pk})
+        queryset = queryset.filter(after)
+
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}{order_field}', f'{prefix}pk')
+    # fetch one extra row to learn whether another page exists
+    return queryset[:page_size + 1]
+
+
+def _page_result(rows, order_field, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        value = last
+        for part in order_field.split('__'):
+            value = getattr(value, part)
+        next_cursor = encode_cursor(value, last.pk)
+    return rows, next_cursor
+
+
+def keyset_page(queryset, order_field, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=False):
+    """Return (rows, next_cursor) for one page of `queryset`.
+
+    Rows are ordered by `order_field` with pk as a tie breaker so the order is
+    total even when the sort column has duplicates. `next_cursor` is None on
+    the last page.
+    """
+    rows = list(page_queryset(queryset, order_field, cursor, page_size, descending))
+    return _page_result(rows, order_field, page_size)
+
+
+async def akeyset_page(queryset, order_field, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=False):
+    """Async keyset_page(), for async views."""
+    rows = [row async for row in page_queryset(queryset, order_field, cursor, page_size, descending)]
+    return _page_result(rows, order_field, page_size)
@@ -0,0 +1,16 @@
+"""Query expressions shared by the views and the batch jobs."""
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def related_count(model, field, **filters):
+    """Count of `model` rows (matching `filters`) pointing at the outer row, as a correlated subquery.
+
+    Unlike Count() over a reverse relation this joins nothing into the outer
+    query, so several counts on one queryset do not multiply its rows.
+    """
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')}, **filters)
+        .order_by().values(field).annotate(n=Count('pk')).values('n')
+    )
+    return Coalesce(Subquery(counts), 0)
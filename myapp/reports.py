@@ -0,0 +1,244 @@
+"""Rendering of inspection reports: cached per version, singly or as a streamed zip.
+
+The text layout lives in templates/reports/report.txt and the HTML body in
+templates/inspector/report_body.html. Both are compiled once per process.
+
+Reports are effectively immutable once decided, but owners reload them a lot,
+so rendered output is kept in an in-process LRU keyed by (pk, updated_at).
+Saving a report bumps `updated_at`, and so does editing anything else a report
+renders (its request's location, its owner's name or email), so an edited
+report never matches an old entry; stale entries simply age out of the LRU.
+The small per-report metadata needed for permission checks and
+ETag/Last-Modified lives in Django's cache and is dropped on save, so a
+browser revalidation is answered with a 304 without loading the report or
+rendering anything.
+"""
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.db import models
+from django.db.models import Count, Max, Sum
+from django.dispatch import receiver
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .caching import invalidated_timeout
+from .models import InspectionReport, InspectionRequest
+
+# With a per-process cache other workers keep their copy of a report's
+# metadata (owner, version) until it expires, so it must expire soon.
+REPORT_META_TIMEOUT = 24 * 60 * 60
+REPORT_META_LOCAL_TIMEOUT = 5 * 60
+# what the report templates show of the request and of its owner
+RENDERED_REQUEST_FIELDS = {'building_location', 'owner', 'owner_id'}
+RENDERED_OWNER_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+REPORT_RENDER_CACHE_SIZE = 512
+ZIP_CACHE_TIMEOUT = 60 * 60
+# Archives larger than this are streamed but not cached.
+ZIP_CACHE_MAX_BYTES = 10 * 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def report_template():
+    return get_template('reports/report.txt')
+
+
+@lru_cache(maxsize=None)
+def report_body_template():
+    return get_template('inspector/report_body.html')
+
+
+def render_report_text(report):
+    """Render one report as the text used by the downloads."""
+    return report_template().render({'report': report, 'inspection_date': str(report.inspection_date)})
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered report output."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+render_cache = RenderCache(REPORT_RENDER_CACHE_SIZE)
+
+
+def report_meta_key(pk):
+    return f'myapp:report-meta:{pk}'
+
+
+def report_meta(pk):
+    """Return {'updated_at', 'owner_id', 'inspector_id'} for a report, or None if it doesn't exist."""
+    key = report_meta_key(pk)
+    meta = cache.get(key)
+    if meta is None:
+        meta = (
+            InspectionReport.objects.filter(pk=pk)
+            .values('updated_at', 'inspector_id', owner_id=models.F('inspection_request__owner_id'))
+            .first()
+        )
+        if meta is None:
+            return None
+        cache.set(key, meta, invalidated_timeout(REPORT_META_TIMEOUT, REPORT_META_LOCAL_TIMEOUT))
+    return meta
+
+
+def can_view_report(user, meta):
+    """Owner, inspector or staff may see a report."""
+    return user.pk in (meta['owner_id'], meta['inspector_id']) or user.is_staff
+
+
+def report_version(pk):
+    """Return the report's updated_at if it exists, else None."""
+    meta = report_meta(pk)
+    return meta['updated_at'] if meta else None
+
+
+def cached_render(kind, pk, render):
+    """Return the `kind` rendering of report `pk`, calling render(report) on a miss."""
+    key = (kind, pk, report_version(pk))
+    output = render_cache.get(key)
+    if output is None:
+        report = InspectionReport.objects.select_related('inspection_request__owner').get(pk=pk)
+        output = render(report)
+        render_cache.set(key, output)
+    return output
+
+
+def render_report_body(report):
+    return report_body_template().render({'report': report})
+
+
+@receiver(post_save, sender=InspectionReport)
+@receiver(post_delete, sender=InspectionReport)
+def invalidate_report_meta(sender, instance, **kwargs):
+    cache.delete(report_meta_key(instance.pk))
+
+
+def touch_reports(reports):
+    """Bump `updated_at` on `reports`: their renderings, ETags and cached zips go stale."""
+    pks = list(reports.values_list('pk', flat=True))
+    if pks:
+        InspectionReport.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+        cache.delete_many([report_meta_key(pk) for pk in pks])
+
+
+def _renders_changed(fields, created, raw, update_fields):
+    return not (created or raw) and (update_fields is None or bool(fields & set(update_fields)))
+
+
+@receiver(post_save, sender=InspectionRequest)
+def _request_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if _renders_changed(RENDERED_REQUEST_FIELDS, created, raw, update_fields):
+        touch_reports(InspectionReport.objects.filter(inspection_request=instance))
+
+
+@receiver(post_save, sender=User)
+def _owner_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if _renders_changed(RENDERED_OWNER_FIELDS, created, raw, update_fields):
+        touch_reports(InspectionReport.objects.filter(inspection_request__owner=instance))
+
+
+def report_filename(pk):
+    return f'inspection_report_{pk}.txt'
+
+
+def batch_reports(date_from=None, date_to=None, inspector_id=None):
+    """Reports inspected in [date_from, date_to) by the given inspector (all optional)."""
+    reports = InspectionReport.objects.select_related('inspection_request__owner').order_by('pk')
+    if date_from:
+        reports = reports.filter(inspection_date__gte=date_from)
+    if date_to:
+        reports = reports.filter(inspection_date__lt=date_to)
+    if inspector_id:
+        reports = reports.filter(inspector_id=inspector_id)
+    return reports
+
+
+def selection_digest(reports):
+    """Identify the archive for `reports` without reading the report rows.
+
+    The selection's query, row count, pk sum and latest updated_at change
+    whenever a report is added, removed or edited; edits to a request or owner
+    a report renders bump its updated_at too (see touch_reports). Code that
+    changes rendered fields with a queryset .update() must bump updated_at
+    itself.
+    """
+    version = reports.order_by().aggregate(count=Count('pk'), pks=Sum('pk'), latest=Max('updated_at'))
+    sql, params = reports.query.sql_with_params()
+    return hashlib.sha256(repr((sql, params, sorted(version.items()))).encode()).hexdigest()
+
+
+def zip_cache_key(digest):
+    return f'myapp:reports-zip:{digest}'
+
+
+class _ZipBuffer:
+    """Write-only file object that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_reports_zip(reports, digest=None):
+    """Yield a zip archive of the rendered reports chunk by chunk.
+
+    Only one report is held in memory at a time. When `digest` is given and
+    the finished archive is small enough, it is cached under that digest.
+    """
+    buffer = _ZipBuffer()
+    kept = [] if digest else None
+    size = 0
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for report in reports.iterator(chunk_size=500):
+            archive.writestr(report_filename(report.pk), render_report_text(report))
+            chunk = buffer.drain()
+            size += len(chunk)
+            if kept is not None:
+                if size <= ZIP_CACHE_MAX_BYTES:
+                    kept.append(chunk)
+                else:
+                    kept = None
+            yield chunk
+    chunk = buffer.drain()
+    yield chunk
+    if kept is not None and size + len(chunk) <= ZIP_CACHE_MAX_BYTES:
+        cache.set(zip_cache_key(digest), b''.join(kept) + chunk, ZIP_CACHE_TIMEOUT)
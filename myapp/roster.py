@@ -0,0 +1,170 @@
+"""Cached roster of inspectors (and admins) for the pick-a-person forms.
+
+The assign-inspector, complaint and send-message forms all list approved,
+unbanned inspectors; send-message also lists admins. The list changes rarely
+but is read on every GET, so it is built with one aggregate query and cached
+as compact RosterEntry tuples under a version number. Anything that changes
+who is on the roster or their load bumps the version (see the receivers
+below and `bump_roster_version`), which orphans the old entry instead of
+racing to delete it.
+
+Each process also keeps the last roster it loaded, and a KD-tree over its
+geocoded inspectors, so a warm read is a single cache lookup of the version
+number and no database query.
+
+With a per-process cache a bump only reaches the process that made it, so the
+version number then expires after ROSTER_VERSION_LOCAL_TIMEOUT and every
+process starts over from the database at least that often.
+"""
+import time
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .assignment import OPEN_STATUSES
+from .caching import invalidated_timeout
+from .geo import KDTree
+from .models import InspectionRequest, Profile
+
+ROSTER_VERSION_KEY = 'myapp:roster-version'
+ROSTER_TIMEOUT = 60 * 60
+ROSTER_VERSION_LOCAL_TIMEOUT = 60
+# fields of InspectionRequest that move load between inspectors
+LOAD_FIELDS = {'inspector', 'inspector_id', 'status'}
+# User saves that only touch these do not change the roster (e.g. logins)
+IGNORED_USER_FIELDS = {'last_login', 'password'}
+
+RosterEntry = namedtuple('RosterEntry', 'id username name location open_load latitude longitude')
+
+# (version, roster) this process loaded last; replaced as a whole, so thread safe
+_loaded = (None, None)
+# (version, KDTree of the geocoded inspectors) built from it, likewise
+_tree = (None, None)
+
+
+def _fresh_version():
+    # never restart from a number a process may still have loaded, e.g. after
+    # the cache was flushed
+    return time.time_ns() // 1000
+
+
+def _version_timeout():
+    return invalidated_timeout(None, ROSTER_VERSION_LOCAL_TIMEOUT)
+
+
+def roster_version():
+    version = cache.get(ROSTER_VERSION_KEY)
+    if version is None:
+        cache.add(ROSTER_VERSION_KEY, _fresh_version(), _version_timeout())
+        version = cache.get(ROSTER_VERSION_KEY)
+    return version
+
+
+def bump_roster_version():
+    """Invalidate every cached roster (call after bulk .update()s that bypass signals)."""
+    try:
+        cache.incr(ROSTER_VERSION_KEY)
+    except ValueError:
+        cache.set(ROSTER_VERSION_KEY, _fresh_version(), _version_timeout())
+
+
+def _build_roster():
+    users = (
+        User.objects.filter(
+            Q(profile__user_type='Inspector', profile__is_approved=True, profile__is_banned=False)
+            | Q(profile__user_type='Admin')
+        )
+        .annotate(open_load=Count('assigned_inspections', filter=Q(assigned_inspections__status__in=OPEN_STATUSES)))
+        .order_by('username')
+        .values_list('pk', 'username', 'first_name', 'last_name', 'profile__user_type', 'profile__location',
+                     'open_load', 'profile__latitude', 'profile__longitude')
+    )
+    roster = {'Inspector': [], 'Admin': []}
+    for pk, username, first, last, user_type, location, load, lat, lon in users:
+        name = f'{first} {last}'.strip() or username
+        roster[user_type].append(RosterEntry(pk, username, name, location or '', load, lat, lon))
+    return {user_type: tuple(entries) for user_type, entries in roster.items()}
+
+
+def _roster():
+    global _loaded
+    version = roster_version()
+    loaded_version, roster = _loaded
+    if loaded_version == version:
+        return roster
+    key = f'myapp:roster:{version}'
+    roster = cache.get(key)
+    if roster is None:
+        roster = _build_roster()
+        cache.set(key, roster, ROSTER_TIMEOUT)
+    _loaded = (version, roster)
+    return roster
+
+
+def inspector_roster():
+    """Approved, unbanned inspectors as RosterEntry tuples, ordered by username."""
+    return _roster()['Inspector']
+
+
+def admin_roster():
+    return _roster()['Admin']
+
+
+def inspector_tree():
+    """KDTree of the roster's geocoded inspectors, with RosterEntry payloads."""
+    global _tree
+    _roster()
+    loaded_version, roster = _loaded
+    version, tree = _tree
+    if version != loaded_version:
+        tree = KDTree((entry.latitude, entry.longitude, entry) for entry in roster['Inspector'])
+        _tree = (loaded_version, tree)
+    return tree
+
+
+def _profile_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_roster_version()
+
+
+def _user_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and set(update_fields) <= IGNORED_USER_FIELDS):
+        return
+    bump_roster_version()
+
+
+def _saves_load(raw, update_fields):
+    return not raw and (update_fields is None or bool(set(update_fields) & LOAD_FIELDS))
+
+
+def _request_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    # remember the (inspector, status) being replaced, to compare after the save
+    if instance.pk is not None and _saves_load(raw, update_fields):
+        instance._roster_load = sender.objects.filter(pk=instance.pk).values_list('inspector_id', 'status').first()
+
+
+def _request_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not _saves_load(raw, update_fields):
+        return
+    before = instance.__dict__.pop('_roster_load', None)
+    after = (instance.inspector_id, instance.status)
+    # an unassignment (inspector set to None) moves load as much as an assignment
+    if before != after and (after[0] is not None or (before is not None and before[0] is not None)):
+        bump_roster_version()
+
+
+def _request_deleted(sender, instance, **kwargs):
+    if instance.inspector_id is not None:
+        bump_roster_version()
+
+
+post_save.connect(_profile_changed, sender=Profile, dispatch_uid='roster-profile-save')
+post_delete.connect(_profile_changed, sender=Profile, dispatch_uid='roster-profile-delete')
+post_save.connect(_user_changed, sender=User, dispatch_uid='roster-user-save')
+post_delete.connect(_profile_changed, sender=User, dispatch_uid='roster-user-delete')
+pre_save.connect(_request_saving, sender=InspectionRequest, dispatch_uid='roster-request-saving')
+post_save.connect(_request_saved, sender=InspectionRequest, dispatch_uid='roster-request-save')
+post_delete.connect(_request_deleted, sender=InspectionRequest, dispatch_uid='roster-request-delete')
@@ -0,0 +1,113 @@
+"""Inverted-index search over requests, reports, complaints and messages.
+
+Each indexed text field is split into lowercase word tokens and stored as
+SearchPosting rows (term, document, weight), where weight is the number of
+occurrences times a per-field weight. A query matches documents containing a
+term that starts with every query word (AND of prefixes), ranked by the summed
+weight of the matching postings with a bonus for whole-word matches. The whole
+query is one indexed `term LIKE 'word%'` lookup per word, grouped by document,
+instead of `icontains` scans over every text column.
+
+Postings are rewritten whenever an indexed model is saved or deleted; the
+`rebuild_search_index` command rebuilds everything from scratch.
+"""
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+
+from .models import Complaint, InspectionReport, InspectionRequest, Message, SearchPosting
+
+# doc_type -> (model, {field: weight})
+SEARCH_SOURCES = {
+    'request': (InspectionRequest, {'building_location': 2.0}),
+    'report': (InspectionReport, {'structural_evaluation': 1.0, 'compliance_checklist': 1.0, 'remarks': 1.5}),
+    'complaint': (Complaint, {'message': 1.0}),
+    'message': (Message, {'body': 1.0}),
+}
+DOC_TYPES = {model: doc_type for doc_type, (model, _) in SEARCH_SOURCES.items()}
+MAX_TERM_LENGTH = 64
+MIN_PREFIX_LENGTH = 2
+EXACT_MATCH_BONUS = 1.0
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercase word tokens of `text`, skipping one-letter words."""
+    return [token[:MAX_TERM_LENGTH] for token in _TOKEN_RE.findall((text or '').lower()) if len(token) > 1]
+
+
+def postings_for(doc_type, obj):
+    """Unsaved SearchPosting rows for one document."""
+    weights = Counter()
+    for field, field_weight in SEARCH_SOURCES[doc_type][1].items():
+        for term, count in Counter(tokenize(getattr(obj, field))).items():
+            weights[term] += count * field_weight
+    return [SearchPosting(term=term, doc_type=doc_type, doc_id=obj.pk, weight=weight) for term, weight in weights.items()]
+
+
+def index_document(doc_type, obj):
+    with transaction.atomic():
+        SearchPosting.objects.filter(doc_type=doc_type, doc_id=obj.pk).delete()
+        SearchPosting.objects.bulk_create(postings_for(doc_type, obj))
+
+
+def search(query, limit=50, doc_types=None):
+    """Return [(doc_type, doc_id, score)] best first for a prefix query."""
+    words = [word for word in dict.fromkeys(tokenize(query)) if len(word) >= MIN_PREFIX_LENGTH]
+    if not words:
+        return []
+    any_word = Q()
+    for word in words:
+        any_word |= Q(term__startswith=word)
+    postings = SearchPosting.objects.filter(any_word)
+    if doc_types:
+        postings = postings.filter(doc_type__in=doc_types)
+    per_word = {f'match_{i}': Count('pk', filter=Q(term__startswith=word)) for i, word in enumerate(words)}
+    rows = (
+        postings.values('doc_type', 'doc_id')
+        .annotate(
+            score=Sum('weight') + EXACT_MATCH_BONUS * Sum('weight', filter=Q(term__in=words), default=0),
+            **per_word,
+        )
+        .filter(**{f'{name}__gt': 0 for name in per_word})
+        .order_by('-score', 'doc_type', 'doc_id')[:limit]
+    )
+    return [(row['doc_type'], row['doc_id'], row['score']) for row in rows]
+
+
+def load_hits(hits):
+    """Attach the model instances to search hits: [(doc_type, obj, score)], skipping deleted ones."""
+    ids = {}
+    for doc_type, doc_id, _ in hits:
+        ids.setdefault(doc_type, []).append(doc_id)
+    objects = {
+        doc_type: SEARCH_SOURCES[doc_type][0].objects.in_bulk(doc_ids)
+        for doc_type, doc_ids in ids.items()
+    }
+    return [
+        (doc_type, objects[doc_type][doc_id], score)
+        for doc_type, doc_id, score in hits
+        if doc_id in objects[doc_type]
+    ]
+
+
+def reindex_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    doc_type = DOC_TYPES[sender]
+    # e.g. marking a message read does not touch any indexed text
+    if update_fields is not None and not set(update_fields) & set(SEARCH_SOURCES[doc_type][1]):
+        return
+    index_document(doc_type, instance)
+
+
+def unindex_on_delete(sender, instance, **kwargs):
+    SearchPosting.objects.filter(doc_type=DOC_TYPES[sender], doc_id=instance.pk).delete()
+
+
+for _model in DOC_TYPES:
+    post_save.connect(reindex_on_save, sender=_model, dispatch_uid=f'search-save-{DOC_TYPES[_model]}')
+    post_delete.connect(unindex_on_delete, sender=_model, dispatch_uid=f'search-delete-{DOC_TYPES[_model]}')
@@ -0,0 +1,39 @@
+"""Streaming responses that stay streamed under ASGI.
+
+Django's ASGI handler cannot iterate a synchronous StreamingHttpResponse
+without blocking the event loop, so it collects the whole iterator with
+`sync_to_async(list)` first: a CSV export or a reports zip would sit in
+memory in full before the first byte goes out. `streaming_response` hands
+ASGI an async iterator instead, which pulls the sync iterator (and the
+database queries behind it) through `sync_to_async` a batch of chunks at a
+time. Under WSGI the sync iterator is used as is.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+# chunks pulled per trip to the sync thread
+STREAM_BATCH_SIZE = 100
+
+
+async def aiter_batches(iterator, batch_size=STREAM_BATCH_SIZE):
+    """Async iterator over the sync `iterator`, advanced `batch_size` items per thread hop."""
+    iterator = iter(iterator)
+    take = sync_to_async(lambda: list(islice(iterator, batch_size)))
+    try:
+        while batch := await take():
+            for chunk in batch:
+                yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, iterator, **kwargs):
+    """StreamingHttpResponse over the sync `iterator`, async when served over ASGI."""
+    if isinstance(request, ASGIRequest):
+        iterator = aiter_batches(iterator)
+    return StreamingHttpResponse(iterator, **kwargs)
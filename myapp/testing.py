@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryCheckingTestRunner(DiscoverRunner):
+    """Test runner that makes template N+1 queries fail the test that caused them.
+
+    Every view the tests render runs with TEMPLATE_QUERY_CHECK = 'raise', so a
+    template touching an un-joined relation in a loop raises
+    DuplicateQueryError naming the template line and relation.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.TEMPLATE_QUERY_CHECK = 'raise'
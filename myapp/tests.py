@@ -1,3 +1,1315 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import types
+import zipfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, reset_queries, transaction
+from django.db.models import Sum
+from django.db.utils import load_backend
+from django.template import engines
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import async_views, urls as myapp_urls
+from .assignment import COMPLAINT_WEIGHT, InspectorPool, assign_pending, load_inspector_pool, plan_assignments
+from .backends import ProfileBackend, forget_user
+from .bans import set_user_banned
+from .benchmarks import (
+    SESSION_MODES, VIEW_CASES, check_budgets, load_budgets, measure_session_mode, run_benchmarks, url_names,
+)
+from .checks import profile_issues, startup_self_check
+from .conversations import base_subject, reply, start_thread
+from .dbpool import ConnectionPool, discard_pool
+from .exports import iter_export_rows
+from .forms import SignUpForm
+from .geo import KDTree, bbox_around, geocode, geohash_encode, haversine_km, in_bbox
+from .instrumentation import DuplicateQueryError, RequestStats, TemplateQueryDetector, registry
+from .loadtest import percentile, run_load
+from .management.commands.check_query_plans import dashboard_queries
+from .management.commands.stress_payments import Command as StressPaymentsCommand
+from .ledger import ADMIN_BALANCE_SHARDS, admin_balance_total, ensure_balance_shards, record_payment
+from .models import (
+    Profile, InspectionRequest, InspectionReport, Complaint, Payment, AdminBalance, Message, SearchPosting, MailboxCounter,
+    Thread,
+)
+from .reports import (
+    REPORT_META_LOCAL_TIMEOUT, REPORT_META_TIMEOUT, RenderCache, render_cache, report_meta, report_meta_key,
+)
+from .roster import ROSTER_VERSION_LOCAL_TIMEOUT, inspector_roster, inspector_tree, roster_version
+from .search import search, tokenize
+
+
+def make_user(username, user_type='Owner', **extra):
+    """Create a User and set the role on the Profile the signal provisions."""
+    user = User.objects.create_user(username=username, **extra)
+    Profile.objects.filter(user=user).update(user_type=user_type)
+    return user
+
+
+def profile_queries(ctx):
+    """Queries that read the profile table on its own (not joined to the user)."""
+    return [q['sql'] for q in ctx.captured_queries if 'FROM "profile"' in q['sql']]
+
+
+class AdminViewUsersTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 'Admin', is_staff=True)
+        self.client.force_login(self.admin)
+
+    def seed(self, count):
+        inspector = make_user(f'insp{User.objects.count()}', 'Inspector')
+        for _ in range(count):
+            owner = make_user(f'owner{User.objects.count()}')
+            InspectionRequest.objects.create(owner=owner, inspector=inspector, building_location='Dhaka')
+
+    def count_queries(self):
+        forget_user(self.admin.pk)  # both passes load the session user from the database
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin_view_users'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_query_count_does_not_grow_with_users(self):
+        self.seed(3)
+        small = self.count_queries()
+        self.seed(30)
+        self.assertEqual(self.count_queries(), small)
+
+    def test_counts_are_annotated(self):
+        self.seed(2)
+        response = self.client.get(reverse('admin_view_users'), {'user_type': 'Inspector'})
+        rows = response.context['users']
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['assigned_count'], 2)
+        self.assertEqual(rows[0]['inspections_count'], 0)
+
+    def test_counts_do_not_multiply_across_joins(self):
+        user = make_user('both')
+        other = make_user('other')
+        for _ in range(2):
+            InspectionRequest.objects.create(owner=user, inspector=other, building_location='Dhaka')
+        for _ in range(3):
+            InspectionRequest.objects.create(owner=other, inspector=user, building_location='Dhaka')
+        rows = {row['user']: row for row in self.client.get(reverse('admin_view_users')).context['users']}
+        self.assertEqual((rows[user]['inspections_count'], rows[user]['assigned_count']), (2, 3))
+
+    def test_sort_by_type_pages_past_users_without_a_profile(self):
+        self.seed(3)
+        for i in range(3):
+            Profile.objects.filter(user=make_user(f'bare{i}')).delete()
+        seen = []
+        params = {'sort': 'type'}
+        while True:
+            response = self.client.get(reverse('admin_view_users'), params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['user'].pk for row in response.context['users'])
+            if not response.context['next_cursor']:
+                break
+            params['cursor'] = response.context['next_cursor']
+        self.assertEqual(sorted(seen), sorted(User.objects.values_list('pk', flat=True)))
+
+    def test_next_page_link_encodes_filters(self):
+        self.seed(60)
+        response = self.client.get(reverse('admin_view_users'), {'user_type': 'a&cursor=x', 'banned': 'no'})
+        # an unknown type is dropped rather than echoed into the link
+        self.assertContains(response, '?user_type=&banned=no&sort=username')
+
+    def test_filter_by_banned(self):
+        self.seed(2)
+        banned = User.objects.get(username='owner2')
+        Profile.objects.filter(user=banned).update(is_banned=True)
+        response = self.client.get(reverse('admin_view_users'), {'banned': 'yes'})
+        self.assertEqual([row['user'] for row in response.context['users']], [banned])
+
+    def test_keyset_pagination_visits_every_user_once(self):
+        self.seed(120)
+        seen = []
+        params = {'sort': 'joined', 'dir': 'desc'}
+        while True:
+            response = self.client.get(reverse('admin_view_users'), params)
+            seen.extend(row['user'].pk for row in response.context['users'])
+            cursor = response.context['next_cursor']
+            if not cursor:
+                break
+            params['cursor'] = cursor
+        self.assertEqual(sorted(seen), sorted(User.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+
+class AdminDashboardTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 'Admin', is_staff=True)
+        self.client.force_login(self.admin)
+        self.owner = make_user('owner')
+        self.inspector = make_user('insp', 'Inspector')
+
+    def seed(self, count, **fields):
+        InspectionRequest.objects.bulk_create([
+            InspectionRequest(owner=self.owner, inspector=self.inspector, building_location=f'Road {i}', **fields)
+            for i in range(count)
+        ])
+
+    def count_queries(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin_dashboard'), params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response
+
+    def test_query_count_does_not_grow_with_requests(self):
+        self.seed(3)
+        self.count_queries()  # first hit creates the AdminBalance row
+        small, _ = self.count_queries()
+        self.seed(40)
+        large, _ = self.count_queries()
+        self.assertEqual(large, small)
+
+    def test_status_totals_and_filter(self):
+        self.seed(3, status='Pending')
+        self.seed(2, status='Paid')
+        _, response = self.count_queries(status='Paid')
+        self.assertEqual(len(response.context['data']), 2)
+        totals = dict(response.context['status_counts'])
+        self.assertEqual(totals['Paid'], 2)
+        self.assertEqual(totals['Pending'], 0)
+
+    def test_date_range_filter(self):
+        self.seed(2)
+        today = timezone.localdate().isoformat()
+        _, response = self.count_queries(date_from=today, date_to=today)
+        self.assertEqual(len(response.context['data']), 2)
+        _, response = self.count_queries(date_to='2000-01-01')
+        self.assertEqual(len(response.context['data']), 0)
+
+
+class BannedUserMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.admin = make_user('admin', 'Admin', is_staff=True)
+
+    def test_warm_ban_check_does_not_query_profile(self):
+        self.client.force_login(self.owner)
+        self.client.get(reverse('owner_payments'))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('owner_payments'))
+        self.assertEqual(profile_queries(ctx), [])
+
+    def test_ban_from_admin_users_takes_effect_immediately(self):
+        self.client.force_login(self.owner)
+        self.client.get(reverse('home'))  # caches "not banned"
+        admin_client = self.client_class()
+        admin_client.force_login(self.admin)
+        admin_client.post(reverse('admin_view_users'), {'action': 'ban', 'user_id': self.owner.pk})
+        response = self.client.get(reverse('home'))
+        self.assertRedirects(response, reverse('banned'))
+
+    def test_ban_is_not_read_from_the_cached_session_user(self):
+        self.client.force_login(self.owner)
+        self.client.get(reverse('home'))  # caches the user with an unbanned profile
+        # a ban made by another worker, whose save did not reach this process's cache
+        Profile.objects.filter(user=self.owner).update(is_banned=True)
+        set_user_banned(self.owner.pk, True)
+        self.assertRedirects(self.client.get(reverse('home')), reverse('banned'))
+
+    def test_unban_from_complaints_takes_effect_immediately(self):
+        complaint = Complaint.objects.create(reporter=self.admin, against_inspector=self.owner, message='late')
+        admin_client = self.client_class()
+        admin_client.force_login(self.admin)
+        admin_client.post(reverse('admin_manage_complaints'), {'action': 'ban', 'complaint_id': complaint.pk})
+        admin_client.post(reverse('admin_manage_complaints'), {'action': 'unban', 'complaint_id': complaint.pk})
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+
+class RoleResolutionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.inspector = make_user('insp', 'Inspector')
+
+    def get(self, user, name):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(name))
+        return response, ctx
+
+    def test_role_required_reads_attached_role(self):
+        response, ctx = self.get(self.owner, 'owner_dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(profile_queries(ctx), [])
+
+    def test_role_required_forbids_other_roles(self):
+        response, ctx = self.get(self.owner, 'inspector_dashboard')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(profile_queries(ctx), [])
+
+    def test_dashboard_redirect_uses_attached_role(self):
+        response, ctx = self.get(self.inspector, 'dashboard_redirect')
+        self.assertRedirects(response, reverse('inspector_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(profile_queries(ctx), [])
+
+    def test_edit_profile_uses_attached_profile(self):
+        response, ctx = self.get(self.inspector, 'edit_profile')
+        self.assertEqual(response.context['profile'].user, self.inspector)
+        self.assertEqual(profile_queries(ctx), [])
+
+    def test_user_and_profile_load_in_one_query(self):
+        _, ctx = self.get(self.owner, 'owner_dashboard')
+        user_loads = [q['sql'] for q in ctx.captured_queries if 'FROM "auth_user"' in q['sql']]
+        self.assertEqual(len(user_loads), 1)
+        self.assertIn('JOIN "profile"', user_loads[0])
+
+
+class PaymentLedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.req = InspectionRequest.objects.create(owner=self.owner, building_location='Dhaka', fee=Decimal('750.00'))
+
+    def test_payment_credits_a_shard_and_the_cached_total(self):
+        self.assertEqual(admin_balance_total(), Decimal('0'))  # warms the cache
+        self.client.force_login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('payment', args=[self.req.pk]), {'method': 'Card'})
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, 'Paid')
+        self.assertEqual(Payment.objects.get().amount, Decimal('750.00'))
+        self.assertEqual(AdminBalance.objects.aggregate(total=Sum('balance'))['total'], Decimal('750.00'))
+        with self.assertNumQueries(0):
+            self.assertEqual(admin_balance_total(), Decimal('750.00'))
+
+    def test_legacy_balance_row_is_kept(self):
+        AdminBalance.objects.create(pk=1, balance=Decimal('100.00'))
+        record_payment(self.owner, self.req, Decimal('50.00'))
+        self.assertEqual(admin_balance_total(), Decimal('150.00'))
+
+    def test_missing_shards_are_created(self):
+        self.assertEqual(ensure_balance_shards(), ADMIN_BALANCE_SHARDS)
+        self.assertEqual(ensure_balance_shards(), 0)
+
+    def test_stress_cleanup_restores_the_cached_total(self):
+        cache.clear()
+        before = admin_balance_total()
+        with self.captureOnCommitCallbacks(execute=True):
+            record_payment(self.owner, self.req, Decimal('25.00'))
+        command = StressPaymentsCommand()
+        command.created_payer = False
+        command.cleanup(self.owner, self.req)
+        self.assertEqual(admin_balance_total(), before)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class PaymentStressTests(TransactionTestCase):
+    def test_concurrent_payments_lose_no_updates(self):
+        out = StringIO()
+        cache.clear()
+        before = admin_balance_total()
+        call_command('stress_payments', payers=[1, 8, 32], payments=5, stdout=out)
+        self.assertEqual(out.getvalue().count('no lost updates'), 3)
+        self.assertEqual(Payment.objects.count(), 0)
+        self.assertEqual(admin_balance_total(), before)  # the cached total is back too
+
+
+class QueryPlanTests(TestCase):
+    def test_dashboard_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertNotIn('FULL SCAN', out.getvalue())
+
+    def test_checked_queries_are_the_ones_the_views_run(self):
+        owner = make_user('owner')
+        self.client.force_login(owner)
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('owner_dashboard'))
+        checked = dict(dashboard_queries(owner.pk))
+        for label in ('owner_dashboard', 'owner_dashboard totals'):
+            self.assertIn(str(checked[label].query), [q['sql'] for q in ctx.captured_queries], label)
+
+
+class OwnerDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.inspector = make_user('insp', 'Inspector')
+        self.client.force_login(self.owner)
+
+    def seed(self, count):
+        for i in range(count):
+            req = InspectionRequest.objects.create(
+                owner=self.owner, inspector=self.inspector, building_location=f'Road {i}',
+                req_type='Reinspection', status='Approved',
+            )
+            InspectionReport.objects.create(inspection_request=req, inspector=self.inspector, decision='Approved')
+        InspectionRequest.objects.create(owner=self.owner, building_location='Unreported')
+
+    def count_queries(self):
+        forget_user(self.owner.pk)  # both passes load the session user from the database
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('owner_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.seed(1)
+        small, _ = self.count_queries()
+        self.seed(60)
+        large, response = self.count_queries()
+        self.assertEqual(large, small)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_reports_and_status_counts(self):
+        self.seed(2)
+        _, response = self.count_queries()
+        self.assertEqual(dict(response.context['status_counts']), {'Pending': 1, 'Approved': 2})
+        reported = [r for r in response.context['data'] if r.report_obj]
+        self.assertEqual(len(reported), 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = make_user('admin', 'Admin', is_staff=True)
+        owner = make_user('owner')
+        self.paid = InspectionRequest.objects.create(owner=owner, building_location='Road 1', status='Paid')
+        Payment.objects.create(payer=owner, inspection_request=self.paid, amount=Decimal('100.00'))
+        Payment.objects.create(payer=owner, inspection_request=self.paid, amount=Decimal('50.00'))
+        self.pending = InspectionRequest.objects.create(owner=owner, building_location='Road 2')
+
+    def stream(self, **params):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_export'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_one_row_per_payment(self):
+        lines = self.stream().splitlines()
+        self.assertEqual(lines[0].split(',')[0], 'request_id')
+        self.assertEqual(len(lines), 4)  # header + 2 payments + unpaid request
+
+    def test_jsonl_status_filter(self):
+        rows = [json.loads(line) for line in self.stream(format='jsonl', status='Pending').splitlines()]
+        self.assertEqual([row['request_id'] for row in rows], [self.pending.pk])
+        self.assertIsNone(rows[0]['payment_id'])
+
+    def test_asgi_gets_an_async_stream(self):
+        # a sync iterator would be collected whole before anything is sent
+        self.async_client.force_login(self.admin)
+
+        async def stream():
+            response = await self.async_client.get(reverse('admin_export'))
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        response, body = async_to_sync(stream)()
+        self.assertTrue(response.streaming)
+        self.assertTrue(response.is_async)
+        self.assertEqual(body.decode(), self.stream())
+
+    def test_batches_do_not_split_payments(self):
+        rows = list(iter_export_rows(InspectionRequest.objects.all(), chunk_size=1))
+        self.assertEqual([row[0] for row in rows], [self.paid.pk, self.paid.pk, self.pending.pk])
+
+    def test_command_writes_file(self):
+        err = StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'export.jsonl')
+            call_command('export_inspections', format='jsonl', output=path, stats=True, stderr=err)
+            with open(path) as fh:
+                self.assertEqual(len(fh.readlines()), 3)
+        self.assertIn('3 rows', err.getvalue())
+
+
+class ReportDownloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = make_user('admin', 'Admin', is_staff=True)
+        self.owner = make_user('owner', email='owner@example.com')
+        self.inspectors = [make_user('insp1', 'Inspector'), make_user('insp2', 'Inspector')]
+        self.reports = []
+        for i, inspector in enumerate(self.inspectors * 2):
+            req = InspectionRequest.objects.create(owner=self.owner, inspector=inspector, building_location=f'Road {i}')
+            self.reports.append(InspectionReport.objects.create(
+                inspection_request=req, inspector=inspector, decision='Approved', remarks=f'remark {i}',
+            ))
+        self.client.force_login(self.admin)
+
+    def test_single_download_text(self):
+        report = self.reports[0]
+        response = self.client.get(reverse('download_report', args=[report.pk]))
+        self.assertEqual(response.content.decode(), '\n'.join([
+            f'Inspection Report #{report.pk}',
+            'Owner: owner (owner@example.com)',
+            'Building location: Road 0',
+            f'Inspection date: {report.inspection_date}',
+            '',
+            'Structural safety evaluation:',
+            '(none)',
+            '',
+            'Compliance checklist:',
+            '(none)',
+            '',
+            'Decision: Approved',
+            '',
+            'Remarks:',
+            'remark 0',
+        ]))
+
+    def download_zip(self, **params):
+        response = self.client.get(reverse('admin_download_reports'), params)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, zipfile.ZipFile(BytesIO(body))
+
+    def test_zip_contains_filtered_reports(self):
+        _, archive = self.download_zip(inspector=self.inspectors[1].pk)
+        self.assertEqual(sorted(archive.namelist()), sorted(
+            f'inspection_report_{r.pk}.txt' for r in self.reports if r.inspector == self.inspectors[1]
+        ))
+        self.assertIn('remark 1', archive.read(f'inspection_report_{self.reports[1].pk}.txt').decode())
+
+    def test_asgi_streams_the_zip(self):
+        self.async_client.force_login(self.admin)
+
+        async def stream():
+            response = await self.async_client.get(reverse('admin_download_reports'))
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        response, body = async_to_sync(stream)()
+        self.assertTrue(response.is_async)
+        self.assertEqual(len(zipfile.ZipFile(BytesIO(body)).namelist()), 4)
+
+    def test_repeated_pull_served_from_cache(self):
+        first, archive = self.download_zip()
+        self.assertTrue(first.streaming)
+        self.assertEqual(len(archive.namelist()), 4)
+        second, archive = self.download_zip()
+        self.assertFalse(second.streaming)
+        self.assertEqual(len(archive.namelist()), 4)
+        # a cache hit costs one aggregate, not a read of every report
+        with CaptureQueriesContext(connection) as ctx:
+            self.download_zip()
+        self.assertEqual([q['sql'] for q in ctx.captured_queries if 'remarks' in q['sql']], [])
+        # an edited report, or an edited owner it renders, is a new archive
+        self.reports[0].remarks = 'edited'
+        self.reports[0].save()
+        third, archive = self.download_zip()
+        self.assertTrue(third.streaming)
+        self.assertIn('edited', archive.read(f'inspection_report_{self.reports[0].pk}.txt').decode())
+        self.owner.email = 'moved@example.com'
+        self.owner.save()
+        fourth, archive = self.download_zip()
+        self.assertTrue(fourth.streaming)
+        self.assertIn('moved@example.com', archive.read(f'inspection_report_{self.reports[0].pk}.txt').decode())
+
+
+class ReportRenderCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        render_cache.clear()
+        self.owner = make_user('owner')
+        self.stranger = make_user('stranger')
+        req = InspectionRequest.objects.create(owner=self.owner, building_location='Road 1')
+        self.report = InspectionReport.objects.create(inspection_request=req, decision='Approved', remarks='first')
+        self.client.force_login(self.owner)
+        self.url = reverse('view_report', args=[self.report.pk])
+
+    def report_queries(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "report"' in q['sql']]
+
+    def test_warm_view_does_not_query_report(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'first')
+        self.assertEqual(self.report_queries(ctx), [])
+
+    def test_revalidation_returns_304(self):
+        first = self.client.get(self.url)
+        self.assertTrue(first.has_header('ETag'))
+        self.assertTrue(first.has_header('Last-Modified'))
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(self.report_queries(ctx), [])
+
+    def test_save_invalidates(self):
+        first = self.client.get(self.url)
+        self.report.remarks = 'second'
+        self.report.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, 'second')
+
+    def test_request_and_owner_edits_invalidate(self):
+        first = self.client.get(self.url)
+        req = self.report.inspection_request
+        req.building_location = 'Road 2'
+        req.save()
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(second, 'Road 2')
+        self.owner.email = 'new@example.com'
+        self.owner.save()
+        third = self.client.get(self.url, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertContains(third, 'new@example.com')
+        # saves that cannot change the rendering keep the ETag
+        self.owner.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=third['ETag']).status_code, 304)
+
+    def test_meta_expires_soon_with_a_per_process_cache(self):
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        for caches, timeout in ((settings.CACHES, REPORT_META_LOCAL_TIMEOUT), (shared, REPORT_META_TIMEOUT)):
+            with mock.patch('myapp.reports.cache') as fake_cache, override_settings(CACHES=caches):
+                fake_cache.get.return_value = None
+                report_meta(self.report.pk)
+            self.assertEqual(fake_cache.set.call_args.args[2], timeout)
+
+    def test_download_conditional(self):
+        url = reverse('download_report', args=[self.report.pk])
+        first = self.client.get(url)
+        self.assertIn('first', first.content.decode())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_strangers_get_no_304(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.stranger)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertRedirects(response, reverse('dashboard_redirect'), fetch_redirect_response=False)
+
+    def test_lru_eviction(self):
+        lru = RenderCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+
+
+class AssignmentTests(TestCase):
+    def test_pool_balances_load(self):
+        pool = InspectorPool([(1, 'Gulshan, Dhaka', 0, 0), (2, 'Mirpur, Dhaka', 5, 0)])
+        chosen = [inspector for _, inspector in plan_assignments([(n, 'Uttara') for n in range(6)], pool)]
+        self.assertEqual(chosen.count(1), 5)  # 1 catches up with 2's load first
+        self.assertEqual(pool.load, {1: 5, 2: 6})
+
+    def test_pool_prefers_nearby_and_penalises_complaints(self):
+        pool = InspectorPool([(1, 'Gulshan, Dhaka', 1, 0), (2, 'Mirpur', 2, 0), (3, 'Mirpur', 0, 3)])
+        self.assertEqual(pool.choose('Road 4, Mirpur'), 2)
+        self.assertEqual(pool.choose('Road 4, Banani'), 1)
+
+    def test_pool_prefers_the_nearer_inspector_in_the_same_city(self):
+        # both in Dhaka and equally busy; the text match points the wrong way
+        far = (1, 'Gulshan, Dhaka', 0, 0, 23.7925, 90.4078)
+        near = (2, 'Dhaka', 0, 0, 23.7465, 90.3760)
+        pool = InspectorPool([far, near])
+        self.assertEqual(pool.choose('Road 2, Gulshan, Dhaka', (23.7461, 90.3742)), 2)
+        self.assertEqual(pool.choose('Road 2, Gulshan, Dhaka', (23.7900, 90.4050)), 1)
+        # a closer band wins over a farther one at the same load
+        pool = InspectorPool([(1, '', 0, 0, 23.7461, 90.4100), (2, '', 0, 0, 23.7461, 90.3800)])
+        self.assertEqual(pool.choose('', (23.7461, 90.3742)), 2)
+        # without coordinates the text areas still decide
+        self.assertEqual(InspectorPool([far, near]).choose('Road 2, Gulshan'), 1)
+
+    def test_pool_respects_max_load(self):
+        pool = InspectorPool([(1, '', 1, 0)], max_load=2)
+        self.assertEqual(len(list(plan_assignments([(1, ''), (2, '')], pool))), 1)
+
+    def test_pool_counts_load_and_complaints_without_joining_them(self):
+        owner = make_user('owner')
+        inspector = make_user('insp', 'Inspector')
+        for status in ('Assigned', 'Assigned', 'Assigned', 'Completed'):
+            InspectionRequest.objects.create(owner=owner, inspector=inspector, status=status, building_location='x')
+        for _ in range(2):
+            Complaint.objects.create(reporter=owner, against_inspector=inspector, message='late')
+        with CaptureQueriesContext(connection) as ctx:
+            pool = load_inspector_pool()
+        self.assertEqual((pool.load[inspector.pk], pool.penalty[inspector.pk]), (3, 2 * COMPLAINT_WEIGHT))
+        self.assertNotIn('JOIN "inspection_request"', ctx.captured_queries[0]['sql'])
+
+    def test_assign_pending(self):
+        owner = make_user('owner')
+        nearby = make_user('nearby', 'Inspector')
+        Profile.objects.filter(user=nearby).update(location='Mirpur, Dhaka')
+        banned = make_user('banned', 'Inspector')
+        Profile.objects.filter(user=banned).update(is_banned=True)
+        unapproved = make_user('new', 'Inspector')
+        Profile.objects.filter(user=unapproved).update(is_approved=False)
+        manual = InspectionRequest.objects.create(owner=owner, building_location='Mirpur', inspector=banned, status='Assigned')
+        pending = [InspectionRequest.objects.create(owner=owner, building_location='Road 1, Mirpur') for _ in range(3)]
+
+        self.assertEqual(assign_pending(batch_size=2), 3)
+        for req in pending:
+            req.refresh_from_db()
+            self.assertEqual((req.inspector, req.status), (nearby, 'Assigned'))
+        manual.refresh_from_db()
+        self.assertEqual(manual.inspector, banned)
+        self.assertEqual(assign_pending(), 0)
+
+
+class GeoTests(TestCase):
+    def test_geocode_prefers_most_specific_part(self):
+        self.assertEqual(geocode('House 5, Road 2, Dhanmondi, Dhaka'), (23.7461, 90.3742))
+        self.assertEqual(geocode('12 Old Dhaka'), (23.7104, 90.4074))
+        self.assertIsNone(geocode('Somewhere else'))
+
+    def test_geohash_matches_reference(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_kdtree_agrees_with_brute_force(self):
+        rng = random.Random(1)
+        points = [(rng.uniform(22, 25), rng.uniform(88, 92), i) for i in range(300)]
+        tree = KDTree(points)
+        lat, lon = 23.8, 90.4
+        brute = sorted(points, key=lambda p: haversine_km(lat, lon, p[0], p[1]))[:5]
+        self.assertEqual([payload for _, payload in tree.nearest(lat, lon, k=5)], [p[2] for p in brute])
+        box = (23.5, 90.0, 24.0, 90.5)
+        inside = {p[2] for p in points if box[0] <= p[0] <= box[2] and box[1] <= p[1] <= box[3]}
+        self.assertEqual(set(tree.within(*box)), inside)
+
+    def test_save_geocodes_and_bbox_query_uses_geohash(self):
+        owner = make_user('owner')
+        near = InspectionRequest.objects.create(owner=owner, building_location='Road 1, Gulshan, Dhaka')
+        InspectionRequest.objects.create(owner=owner, building_location='Agrabad, Chattogram')
+        InspectionRequest.objects.create(owner=owner, building_location='Unknown place')
+        self.assertTrue(near.geohash)
+        found = in_bbox(InspectionRequest.objects.all(), *bbox_around(23.7925, 90.4078, 3))
+        self.assertEqual(list(found), [near])
+
+    def test_dashboard_map_filter_and_assignment_form(self):
+        cache.clear()
+        admin = make_user('admin', 'Admin', is_staff=True)
+        owner = make_user('owner')
+        far = make_user('far', 'Inspector')
+        for user, location in ((far, 'Sylhet'), (make_user('close', 'Inspector'), 'Banani, Dhaka')):
+            profile = Profile.objects.get(user=user)
+            profile.location = location
+            profile.save()
+        req = InspectionRequest.objects.create(owner=owner, building_location='Gulshan')
+        InspectionRequest.objects.create(owner=owner, building_location='Khulna')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin_dashboard'), {'near': 'Gulshan', 'radius_km': '2'})
+        self.assertEqual(list(response.context['data']), [req])
+        response = self.client.get(reverse('admin_assign_inspector', args=[req.pk]))
+        self.assertEqual([i['entry'].username for i in response.context['inspectors']], ['close', 'far'])
+        # the tree is built once per roster version, and only the nearest get a distance
+        self.assertIs(inspector_tree(), inspector_tree())
+        with mock.patch('myapp.views.NEAREST_INSPECTORS', 1), mock.patch('myapp.roster.KDTree') as tree:
+            response = self.client.get(reverse('admin_assign_inspector', args=[req.pk]))
+        tree.assert_not_called()
+        listed = [(i['entry'].username, i['distance_km'] is None) for i in response.context['inspectors']]
+        self.assertEqual(listed, [('close', False), ('far', True)])
+
+    def test_saves_that_leave_the_location_alone_skip_geocoding(self):
+        req = InspectionRequest.objects.create(owner=make_user('owner'), building_location='Gulshan')
+        with mock.patch('myapp.geo.geocode', return_value=None) as geocode_mock:
+            req.status = 'Assigned'
+            req.save(update_fields=['status'])
+            geocode_mock.assert_not_called()
+            req.save(update_fields=['building_location', 'latitude', 'longitude', 'geohash'])
+            geocode_mock.assert_called_once_with('Gulshan')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner')
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Road-5, Gulshan  a DHAKA'), ['road', 'gulshan', 'dhaka'])
+
+    def test_prefix_words_are_anded_and_ranked(self):
+        both = InspectionRequest.objects.create(owner=self.owner, building_location='Gulshan Avenue, Dhaka')
+        InspectionRequest.objects.create(owner=self.owner, building_location='Gulshan Circle')
+        Complaint.objects.create(reporter=self.owner, message='The gulshan inspector was late, dhaka office')
+        hits = search('gulsh dhak')
+        self.assertEqual(len(hits), 2)
+        # the building_location field weighs more than complaint text
+        self.assertEqual(hits[0][:2], ('request', both.pk))
+        self.assertEqual([h[0] for h in search('gulsh dhak', doc_types=['complaint'])], ['complaint'])
+
+    def test_index_follows_saves_and_deletes(self):
+        req = InspectionRequest.objects.create(owner=self.owner, building_location='Banani')
+        self.assertEqual(len(search('banani')), 1)
+        req.building_location = 'Uttara'
+        req.save()
+        self.assertEqual(search('banani'), [])
+        self.assertEqual(len(search('uttara')), 1)
+        req.delete()
+        self.assertFalse(SearchPosting.objects.exists())
+
+    def test_marking_message_read_skips_reindex(self):
+        msg = Message.objects.create(sender=self.owner, recipient=self.owner, subject='s', body='hello there')
+        with CaptureQueriesContext(connection) as ctx:
+            msg.is_read = True
+            msg.save(update_fields=['is_read'])
+        self.assertFalse([q for q in ctx.captured_queries if 'search_posting' in q['sql']])
+
+    def test_admin_search_view(self):
+        InspectionRequest.objects.create(owner=self.owner, building_location='Mirpur 10')
+        self.client.force_login(make_user('admin', 'Admin', is_staff=True))
+        response = self.client.get(reverse('admin_search'), {'q': 'mirp'})
+        self.assertEqual([kind for kind, _, _ in response.context['results']], ['request'])
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(reverse('admin_search')).status_code, 302)
+
+
+class SeedLoadDataTests(TestCase):
+    def test_seeds_consistent_rows_without_signals(self):
+        cache.clear()
+        self.assertEqual(inspector_roster(), ())
+        call_command('seed_load_data', users=60, chunk_size=25, workers=1, stdout=StringIO())
+        users = User.objects.filter(username__startswith='load')
+        roster = Profile.objects.filter(user_type='Inspector', is_approved=True, is_banned=False)
+        self.assertEqual(len(inspector_roster()), roster.count())
+        self.assertEqual(users.count(), 60)
+        self.assertEqual(Profile.objects.filter(user__in=users).count(), 60)
+        self.assertFalse(InspectionRequest.objects.filter(status='Pending', inspector__isnull=False).exists())
+        self.assertEqual(
+            InspectionReport.objects.count(),
+            InspectionRequest.objects.filter(status__in=['Approved', 'Rejected', 'Completed', 'Paid']).count(),
+        )
+        self.assertTrue(InspectionRequest.objects.exclude(geohash='').exists())
+        self.assertEqual(admin_balance_total(), Payment.objects.aggregate(total=Sum('amount'))['total'] or 0)
+        unread = MailboxCounter.objects.aggregate(total=Sum('unread_count'))['total'] or 0
+        self.assertEqual(unread, Message.objects.filter(is_read=False).count())
+        with self.assertRaises(CommandError):
+            call_command('seed_load_data', users=1, stdout=StringIO())
+
+
+class ViewBenchmarkTests(TestCase):
+    def test_every_url_has_a_case_and_a_budget(self):
+        self.assertEqual(set(VIEW_CASES), url_names())
+        self.assertEqual(set(load_budgets()), url_names())
+
+    def test_query_budgets_hold_as_data_grows(self):
+        # time and memory depend on the machine; run benchmark_views for those
+        results = run_benchmarks([20, 60], repeat=0, track_memory=False,
+                                 seed_options={'stdout': StringIO(), 'workers': 1})
+        self.assertEqual(check_budgets(results, load_budgets(), checks=('queries', 'scaling')), [])
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.owner = make_user('owner')
+        for i in range(3):
+            InspectionRequest.objects.create(owner=self.owner, building_location=f'Road {i}')
+
+    def test_server_timing_header_and_duplicate_fingerprints(self):
+        inspector = make_user('insp', 'Inspector')
+        InspectionRequest.objects.update(inspector=inspector)
+        stats = RequestStats()
+        with connection.execute_wrapper(stats):
+            for req in InspectionRequest.objects.all():
+                req.owner.username  # N+1
+        self.assertEqual(stats.queries, 4)
+        self.assertEqual(stats.duplicate_queries, 2)
+
+        self.client.force_login(inspector)
+        response = self.client.get(reverse('inspector_dashboard'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+')
+        self.assertNotIn('dup;', timing)
+
+    def test_metrics_endpoint(self):
+        self.client.force_login(self.owner)
+        self.client.get(reverse('owner_dashboard'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with self.settings(METRICS_TOKEN='s3cret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        body = response.content.decode()
+        self.assertIn('myapp_request_sql_queries_count{view="owner_dashboard"} 1', body)
+        self.assertIn('myapp_request_duration_seconds_bucket{view="owner_dashboard",le="+Inf"} 1', body)
+        template_sum = re.search(r'myapp_request_template_duration_seconds_sum\{view="owner_dashboard"\} (\S+)', body)
+        self.assertGreater(float(template_sum.group(1)), 0)
+
+
+class TemplateQueryCheckTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner')
+        for i in range(5):
+            sender = make_user(f'sender{i}', 'Inspector')
+            Message.objects.create(sender=sender, recipient=self.owner, subject='hi', body='hello')
+
+    def test_runner_turns_template_n_plus_one_into_error(self):
+        self.assertEqual(settings.TEMPLATE_QUERY_CHECK, 'raise')
+        template = engines['django'].from_string('{% for m in msgs %}\n{{ m.sender.username }}{% endfor %}')
+        stats = RequestStats(TemplateQueryDetector('raise', 3))
+        token = stats.activate()
+        try:
+            with connection.execute_wrapper(stats), self.assertRaises(DuplicateQueryError) as ctx:
+                template.render({'msgs': Message.objects.all()})
+        finally:
+            stats.deactivate(token)
+        self.assertIn(':2:', str(ctx.exception))
+        self.assertIn('via Message.sender', str(ctx.exception))
+
+    def test_inbox_joins_senders(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('inbox'))
+        self.assertEqual(response.status_code, 200)
+
+
+class InspectorRosterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.inspector = make_user('insp', 'Inspector')
+        InspectionRequest.objects.create(owner=self.owner, inspector=self.inspector, status='Assigned',
+                                         building_location='Banani')
+
+    def test_warm_forms_do_not_query_the_roster(self):
+        self.client.force_login(self.owner)
+        self.client.get(reverse('owner_complaint'))
+        for name in ('owner_complaint', 'send_message'):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse([q for q in ctx.captured_queries if 'inspection_request' in q['sql']])
+        self.assertContains(response, '>insp<')
+        self.assertEqual(inspector_roster()[0][:5], (self.inspector.pk, 'insp', 'insp', '', 1))
+
+    def test_approval_ban_load_and_delete_invalidate(self):
+        self.assertEqual([i.username for i in inspector_roster()], ['insp'])
+        pending = make_user('pending', 'Inspector')
+        profile = Profile.objects.get(user=pending)
+        profile.is_approved = False
+        profile.save()
+        self.assertEqual([i.username for i in inspector_roster()], ['insp'])
+        profile.is_approved = True
+        profile.save()
+        self.assertEqual(len(inspector_roster()), 2)
+
+        profile = Profile.objects.get(user=self.inspector)
+        profile.is_banned = True
+        profile.save()
+        self.assertEqual([i.username for i in inspector_roster()], ['pending'])
+
+        InspectionRequest.objects.create(owner=self.owner, inspector=pending, status='Assigned', building_location='x')
+        self.assertEqual(inspector_roster()[0].open_load, 1)
+        pending.delete()
+        self.assertEqual(inspector_roster(), ())
+
+    def test_unassignment_and_status_changes_invalidate(self):
+        req = InspectionRequest.objects.get()
+        self.assertEqual(inspector_roster()[0].open_load, 1)
+        req.inspector = None
+        req.status = 'Pending'
+        req.save()
+        self.assertEqual(inspector_roster()[0].open_load, 0)
+        req.inspector = self.inspector
+        req.status = 'Assigned'
+        req.save()
+        self.assertEqual(inspector_roster()[0].open_load, 1)
+        req.status = 'Completed'
+        req.save(update_fields=['status'])
+        self.assertEqual(inspector_roster()[0].open_load, 0)
+        version = roster_version()
+        req.building_location = 'Gulshan'
+        req.save()  # the load did not move
+        self.assertEqual(roster_version(), version)
+
+    def test_other_processes_changes_show_once_the_version_expires(self):
+        self.assertEqual([i.username for i in inspector_roster()], ['insp'])
+        # a ban made by another worker: its bump never reaches this process's cache
+        Profile.objects.filter(user=self.inspector).update(is_banned=True)
+        with mock.patch('myapp.roster._loaded', (None, None)):
+            self.assertEqual([i.username for i in inspector_roster()], ['insp'])  # served from the cache
+        later = time.time() + ROSTER_VERSION_LOCAL_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(inspector_roster(), ())
+
+
+class MailboxCounterTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.sender = make_user('sender', 'Inspector')
+
+    def send(self, n=1):
+        return [Message.objects.create(sender=self.sender, recipient=self.owner, body='hi') for _ in range(n)]
+
+    def test_counter_follows_create_read_and_delete(self):
+        first, second, third = self.send(3)
+        counter = MailboxCounter.objects.get(pk=self.owner.pk)
+        self.assertEqual(counter.unread_count, 3)
+        self.assertEqual(counter.last_message_at, third.sent_at)
+        self.client.force_login(self.owner)
+        self.client.get(reverse('view_message', args=[first.pk]))
+        self.client.get(reverse('view_message', args=[first.pk]))  # already read: no double count
+        second.delete()
+        self.assertEqual(MailboxCounter.objects.get(pk=self.owner.pk).unread_count, 1)
+        self.assertTrue(Message.objects.get(pk=first.pk).is_read)
+
+    def test_deleting_a_user_with_unread_mail(self):
+        self.send(2)
+        self.owner.delete()
+        self.assertFalse(MailboxCounter.objects.exists())
+        self.assertFalse(Message.objects.exists())
+
+    def test_badge_and_first_inbox_page_cost_the_same_for_any_mailbox(self):
+        self.send(3)
+        self.client.force_login(self.owner)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(reverse('inbox'))
+        self.assertContains(response, '3 unread')
+        Message.objects.bulk_create([Message(sender=self.sender, recipient=self.owner, body='x') for _ in range(120)])
+        forget_user(self.owner.pk)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('inbox'))
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+        self.assertEqual(len(response.context['inbox_messages']), 50)
+        self.assertIsNotNone(response.context['next_cursor'])
+        self.assertFalse([q for q in large.captured_queries if 'mailbox_counter' in q['sql'] and 'auth_user' not in q['sql']])
+
+
+class ThreadTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.inspector = make_user('insp', 'Inspector')
+
+    def test_send_and_reply_stay_in_one_thread(self):
+        self.client.force_login(self.owner)
+        self.client.post(reverse('send_message'), {'recipient': self.inspector.pk, 'subject': 'Visit', 'body': 'When?'})
+        first = Message.objects.get()
+        self.client.force_login(self.inspector)
+        response = self.client.post(reverse('view_message', args=[first.pk]), {'body': 'Monday'})
+        thread = first.thread
+        self.assertRedirects(response, reverse('view_thread', args=[thread.pk]))
+        answer = Message.objects.exclude(pk=first.pk).get()
+        self.assertEqual((answer.thread_id, answer.recipient, answer.subject), (thread.pk, self.owner, 'Re: Visit'))
+        self.assertEqual(Thread.objects.get(pk=thread.pk).last_message_at, answer.sent_at)
+        self.assertEqual(base_subject('Re: RE: re: Visit'), 'Visit')
+
+    def test_opening_a_long_thread_costs_the_same_and_marks_the_page_read(self):
+        first = start_thread(self.inspector, self.owner, 'Site', 'hello')
+        thread = first.thread
+        self.client.force_login(self.owner)
+        url = reverse('view_thread', args=[thread.pk])
+        with CaptureQueriesContext(connection) as short:
+            self.client.get(url)
+        for i in range(40):
+            reply(thread, self.inspector if i % 2 else self.owner, f'msg {i}')
+        with CaptureQueriesContext(connection) as long:
+            response = self.client.get(url)
+        self.assertEqual(len(long.captured_queries), len(short.captured_queries))
+        self.assertEqual(len(response.context['thread_messages']), 30)
+        self.assertEqual(response.context['thread_messages'][0].body, 'msg 39')
+        # the 30 newest are shown: the 15 from the inspector among them are now read
+        self.assertEqual(MailboxCounter.objects.get(pk=self.owner.pk).unread_count, 5)
+
+        self.client.force_login(make_user('outsider'))
+        self.assertRedirects(self.client.get(url), reverse('inbox'), fetch_redirect_response=False)
+
+
+class ProfileProvisioningTests(TestCase):
+    def signup(self, username, user_type, **extra):
+        data = {'username': username, 'password1': 'Load-test-pass-42', 'password2': 'Load-test-pass-42',
+                'user_type': user_type, **extra}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('signup'), data)
+        self.assertRedirects(response, reverse('dashboard_redirect'), fetch_redirect_response=False)
+        return User.objects.select_related('profile').get(username=username), ctx
+
+    def test_signup_creates_the_profile_once_with_the_form_fields(self):
+        user, ctx = self.signup('newinsp', 'Inspector', phone='01700000000', location='Dhaka')
+        profile = user.profile
+        self.assertEqual((profile.user_type, profile.phone, profile.location, profile.is_approved),
+                         ('Inspector', '01700000000', 'Dhaka', False))
+        profile_sql = [q['sql'] for q in ctx.captured_queries if 'profile' in q['sql']]
+        self.assertEqual(len(profile_sql), 1)
+        self.assertTrue(profile_sql[0].startswith('INSERT'))
+
+        admin, _ = self.signup('newadmin', 'Admin')
+        self.assertEqual((admin.profile.user_type, admin.is_staff, admin.is_superuser), ('Admin', True, True))
+
+    def test_login_and_partial_saves_skip_the_profile_signal(self):
+        user = User.objects.create_user('plain', password='pw')
+        self.assertEqual(user.profile.user_type, 'Owner')
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('login'), {'username': 'plain', 'password': 'pw'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT') and '"profile"' in q['sql']
+                          and 'auth_user' not in q['sql']])
+
+        # a full save still keeps the role in step with the staff flags
+        user.is_staff = True
+        user.save()
+        self.assertEqual(Profile.objects.get(user=user).user_type, 'Admin')
+
+
+class EmailLoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mail', email='Mail.User@Example.com', password='pw')
+        self.backend = ProfileBackend()
+
+    def test_login_by_username_or_email_ignoring_case(self):
+        self.assertEqual(self.backend.authenticate(None, username='mail', password='pw'), self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.authenticate(None, username='mail.user@EXAMPLE.com', password='pw'), self.user)
+        self.assertIsNone(self.backend.authenticate(None, username='mail.user@example.com', password='nope'))
+        response = self.client.post(reverse('login'), {'username': 'MAIL.user@example.com', 'password': 'pw'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_unknown_accounts_still_hash_the_password(self):
+        with mock.patch('myapp.backends.check_password', return_value=False) as check:
+            self.assertIsNone(self.backend.authenticate(None, username='ghost@example.com', password='pw'))
+        check.assert_called_once()
+
+    def test_emails_are_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('copy', email='mail.user@example.com')
+        User.objects.create_user('blank1')
+        User.objects.create_user('blank2')  # blank emails do not collide
+        form = SignUpForm({'username': 'other', 'email': 'MAIL.USER@example.com', 'password1': 'Load-test-pass-42',
+                           'password2': 'Load-test-pass-42', 'user_type': 'Owner'})
+        self.assertIn('email', form.errors)
+
+    def test_session_user_is_cached_until_it_changes(self):
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk).profile.user_type, 'Owner')
+        profile = self.user.profile
+        profile.user_type = 'Inspector'
+        profile.save()
+        self.assertEqual(self.backend.get_user(self.user.pk).profile.user_type, 'Inspector')
+        Message.objects.create(sender=make_user('sender'), recipient=self.user, body='hi')
+        self.assertEqual(self.backend.get_user(self.user.pk).mailbox.unread_count, 1)
+
+    def test_password_change_elsewhere_reloads_the_cached_user(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('owner_dashboard')).status_code, 200)
+        # another worker changes the password and re-signs this session
+        # (update_session_auth_hash); this process still caches the old user
+        User.objects.filter(pk=self.user.pk).update(password=make_password('new'))
+        session = self.client.session
+        session[HASH_SESSION_KEY] = User.objects.get(pk=self.user.pk).get_session_auth_hash()
+        session.save()
+        response = self.client.get(reverse('owner_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+
+class SessionModeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.inspector = make_user('insp', 'Inspector')
+
+    def test_warm_requests_and_flashes_do_not_touch_the_session_table(self):
+        self.client.force_login(self.inspector)
+        self.client.get(reverse('inspector_dashboard'))
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('inspector_dashboard'))
+            response = self.client.post(reverse('edit_profile'), {'phone': '01700000000'})
+        self.assertIn('messages', response.cookies)
+        self.assertFalse([q for q in ctx.captured_queries if 'django_session' in q['sql']])
+        # written through: the session survives losing the cache
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('inspector_dashboard')).status_code, 200)
+
+    def test_session_benchmark_runs_every_mode(self):
+        users = {'owner': make_user('owner'), 'inspector': self.inspector,
+                 'admin': make_user('admin', 'Admin', is_staff=True)}
+        for mode in SESSION_MODES:
+            results = measure_session_mode(mode, {'users': users}, requests=2)
+            self.assertEqual({r['status'] for r in results.values()}, {200, 302}, mode)
+            expected = 1 if mode == 'db' else 0
+            self.assertEqual(results['owner_dashboard']['session_queries'], expected, mode)
+
+
+ASYNC_URLCONF = types.ModuleType('async_urlconf')
+ASYNC_URLCONF.urlpatterns = myapp_urls.with_async_views(myapp_urls.urlpatterns)
+
+
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.inspector = make_user('insp', 'Inspector')
+        self.admin = make_user('admin', 'Admin', is_staff=True)
+        for i in range(3):
+            req = InspectionRequest.objects.create(owner=self.owner, inspector=self.inspector, building_location=f'Road {i}')
+            Message.objects.create(sender=self.inspector, recipient=self.owner, body=f'msg {i}')
+        self.report = InspectionReport.objects.create(inspection_request=req, inspector=self.inspector, decision='Approved')
+
+    def test_async_views_are_routed_and_match_the_sync_ones(self):
+        self.assertTrue(all(iscoroutinefunction(getattr(async_views, name)) for name in async_views.ASYNC_VIEW_NAMES))
+        cases = [
+            (self.owner, 'owner_dashboard', [], 'data'),
+            (self.owner, 'inbox', [], 'inbox_messages'),
+            (self.owner, 'view_report', [self.report.pk], 'report_body'),
+            (self.inspector, 'inspector_dashboard', [], 'data'),
+            (self.admin, 'admin_dashboard', [], 'data'),
+        ]
+        for user, name, args, key in cases:
+            url = reverse(name, args=args)
+            self.assertIs(resolve(url).func, getattr(async_views, name))
+            self.client.force_login(user)
+            self.async_client.force_login(user)
+            with override_settings(ROOT_URLCONF='ubr.urls'):
+                sync_response = self.client.get(url)
+            # cold caches, so every view queries and Server-Timing must count them
+            cache.clear()
+            async_response = async_to_sync(self.async_client.get)(url)
+            self.assertEqual(async_response.status_code, 200, name)
+            self.assertEqual(list(async_response.context[key]), list(sync_response.context[key]), name)
+            self.assertRegex(async_response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    def test_role_ban_and_conditional_checks(self):
+        self.async_client.force_login(self.owner)
+        get = async_to_sync(self.async_client.get)
+        self.assertEqual(get(reverse('admin_dashboard')).status_code, 403)
+        url = reverse('view_report', args=[self.report.pk])
+        etag = get(url)['ETag']
+        self.assertEqual(get(url, headers={'if-none-match': etag}).status_code, 304)
+
+        profile = self.owner.profile
+        profile.is_banned = True
+        profile.save()
+        self.assertRedirects(get(reverse('inbox')), reverse('banned'), fetch_redirect_response=False)
+        self.assertTrue(get(reverse('inbox'))['Location'].startswith(settings.LOGIN_URL))  # logged out
+
+
+class LoadTestClientTests(TestCase):
+    def test_keep_alive_clients_and_percentiles(self):
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+        connections = set()
+
+        async def handle(reader, writer):
+            served = 0
+            try:
+                while await reader.readuntil(b'\r\n\r\n'):
+                    connections.add(id(writer))
+                    served += 1
+                    if served % 2:
+                        writer.write(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n4\r\nok!!\r\n0\r\n\r\n')
+                    else:
+                        writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok')
+                    await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionResetError):
+                pass  # the client hung up when the run ended
+            finally:
+                writer.close()
+
+        async def main():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await run_load(f'http://127.0.0.1:{port}/x', connections=5, duration=0.2)
+
+        summary = asyncio.run(main()).summary()
+        self.assertEqual(summary['errors'], 0)
+        self.assertEqual(summary['statuses'], {200: summary['requests']})
+        self.assertGreater(summary['requests'], 10)
+        self.assertEqual(len(connections), 5)  # one keep-alive connection per client
+
+
+class ConnectionPoolTests(TestCase):
+    def test_pool_reuses_bounds_and_retires_connections(self):
+        class Conn:
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        made = []
+
+        def connect():
+            made.append(Conn())
+            return made[-1]
+
+        pool = ConnectionPool(size=2, timeout=0.05)
+        first, second = pool.acquire(connect), pool.acquire(connect)
+        with self.assertRaises(OperationalError):
+            pool.acquire(connect)  # both checked out
+        pool.release(first)
+        self.assertIs(pool.acquire(connect), first)
+        pool.release(first)
+        pool.release(second, reusable=False)
+        self.assertTrue(second.closed)
+        # a failed health check replaces the idle connection
+        third = pool.acquire(connect, is_alive=lambda conn: False)
+        self.assertTrue(first.closed)
+        pool.recycle = 0
+        pool.release(third)
+        self.assertTrue(third.closed)
+        self.assertEqual((pool.connects, pool.idle, pool.in_use), (3, 0, 0))
+
+    def test_pooled_backend_hands_back_a_clean_connection(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            settings_dict = {
+                **connection.settings_dict,
+                'ENGINE': 'myapp.db.sqlite3',
+                'NAME': os.path.join(tmp, 'pool.sqlite3'),
+                'POOL': {'SIZE': 1},
+            }
+            db = load_backend('myapp.db.sqlite3').DatabaseWrapper(settings_dict, 'pool-test')
+            try:
+                with db.cursor() as cursor:
+                    cursor.execute('CREATE TABLE t (x integer)')
+                raw = db.connection
+                db.set_autocommit(False)
+                with db.cursor() as cursor:
+                    cursor.execute('INSERT INTO t VALUES (1)')
+                db.close()  # uncommitted: rolled back on the way into the pool
+                with db.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM t')
+                    self.assertEqual(cursor.fetchone()[0], 0)
+                self.assertIs(db.connection, raw)
+                self.assertTrue(db.get_autocommit())
+                self.assertEqual(db.pool.connects, 1)
+                db.close()
+            finally:
+                discard_pool('pool-test')
+
+    def test_profile_checks(self):
+        def ids(**settings_dict):
+            settings_dict.setdefault('ENGINE', 'django.db.backends.mysql')
+            return [issue.id for issue in profile_issues('default', settings_dict)]
+
+        with override_settings(DEBUG=False, ASYNC_VIEWS=False, WEB_THREADS=8):
+            self.assertEqual(ids(CONN_MAX_AGE=0), ['myapp.W001'])
+            self.assertEqual(ids(CONN_MAX_AGE=60), ['myapp.W002'])
+            self.assertEqual(ids(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True), [])
+            self.assertEqual(ids(CONN_MAX_AGE=0, POOL={'SIZE': 4}), ['myapp.W005'])
+            self.assertEqual(ids(CONN_MAX_AGE=60, POOL={'SIZE': 0}), ['myapp.E001', 'myapp.W004'])
+        with override_settings(DEBUG=False, ASYNC_VIEWS=True):
+            self.assertEqual(ids(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True), ['myapp.W003'])
+            self.assertEqual(ids(CONN_MAX_AGE=0, POOL={'SIZE': 4}), [])
+
+    def test_asgi_application_loads_inside_an_event_loop(self):
+        # uvicorn imports the application from within its running loop
+        async def load():
+            return importlib.import_module('ubr.asgi').application
+
+        with mock.patch.dict(os.environ), mock.patch.dict(sys.modules), \
+                mock.patch('myapp.checks.checks.run_checks', return_value=[]) as run_checks:
+            sys.modules.pop('ubr.asgi', None)
+            self.assertTrue(callable(asyncio.run(load())))
+        run_checks.assert_called_once()
+        with mock.patch('myapp.checks._self_check', side_effect=RuntimeError('boom')), \
+                self.assertLogs('myapp.checks', 'ERROR'):
+            self.assertEqual(startup_self_check(), [])
@@ -1,6 +1,7 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import URLPattern, path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('banned/', views.banned_view, name='banned'),
@@ -18,6 +19,7 @@ urlpatterns = [
     path('owner/inbox/', views.inbox, name='inbox'),
     path('owner/messages/send/', views.send_message, name='send_message'),
     path('owner/messages/<int:pk>/', views.view_message, name='view_message'),
+    path('owner/threads/<int:pk>/', views.view_thread, name='view_thread'),
     path('owner/payment/', views.owner_payments, name='owner_payments'),
     path('owner/payment/<int:pk>/', views.payment, name='payment'),
     # Admin flows
@@ -25,6 +27,8 @@ urlpatterns = [
     path('admin/complaints/', views.admin_manage_complaints, name='admin_manage_complaints'),
     path('admin/set-fee/<int:pk>/', views.admin_set_fee, name='admin_set_fee'),
     path('admin/users/', views.admin_view_users, name='admin_view_users'),
+    path('admin/export/', views.admin_export, name='admin_export'),
+    path('admin/search/', views.admin_search, name='admin_search'),
     path('admin/assign-inspector/<int:pk>/', views.admin_assign_inspector, name='admin_assign_inspector'),
     path('admin/assign-inspector/', views.admin_assign_inspector, name='admin_assign_inspector_list'),
     # Inspector flows
@@ -33,5 +37,21 @@ urlpatterns = [
     path('inspector/profile/edit/', views.edit_profile, name='edit_profile'),
     path('report/<int:pk>/', views.view_report, name='view_report'),
     path('report/<int:pk>/download/', views.download_report, name='download_report'),
+    path('admin/reports/download/', views.admin_download_reports, name='admin_download_reports'),
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
+
+
+def with_async_views(patterns):
+    """`patterns` with the views in async_views.py swapped in for their sync versions."""
+    return [
+        URLPattern(p.pattern, getattr(async_views, p.name), p.default_args, p.name)
+        if p.name in async_views.ASYNC_VIEW_NAMES else p
+        for p in patterns
+    ]
+
+
+# under ASGI the read-heavy views run natively async (see async_views.py)
+if settings.ASYNC_VIEWS:
+    urlpatterns = with_async_views(urlpatterns)
@@ -1,13 +1,40 @@
+import datetime
+
 from django.shortcuts import render, redirect
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import SignUpForm
-from .models import Profile, InspectionRequest, InspectionReport, Message  # import your models
+from .models import Profile, InspectionRequest, InspectionReport, Message, Thread  # import your models
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce
+from django.utils.crypto import constant_time_compare
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .conversations import reply, start_thread, thread_for, thread_page
 from .decorators import role_required
+from .exports import EXPORT_FORMATS, export_queryset, iter_export, iter_export_rows
+from .geo import bbox_around, geocode, in_bbox, place_names
+from .instrumentation import registry
+from .ledger import admin_balance_total, record_payment
+from .mailbox import mark_many_read, mark_read, unread_count
+from .reports import (
+    batch_reports, cached_render, can_view_report, selection_digest, iter_reports_zip,
+    render_report_body, render_report_text, report_filename, report_meta, zip_cache_key,
+)
+from .pagination import keyset_page
+from .roster import admin_roster, inspector_roster, inspector_tree
+from .queries import related_count
+from .search import SEARCH_SOURCES, load_hits, search
+from .streaming import streaming_response
 
 
 def signup(request):
@@ -18,19 +45,7 @@ def signup(request):
     if request.method == 'POST':
         form = SignUpForm(request.POST)
         if form.is_valid():
-            user = form.save(commit=False)
-            user.save()
-            # If the user selected `Admin` during signup, grant Django admin privileges.
-            # WARNING: this makes any signup selecting Admin a true superuser.
-            if form.cleaned_data.get('user_type') == 'Admin':
-                user.is_staff = True
-                user.is_superuser = True
-                user.save()
-            # Create or update Profile with selected user_type
-            Profile.objects.update_or_create(
-                user=user,
-                defaults={'user_type': form.cleaned_data['user_type']}
-            )
+            user = form.save()
             login(request, user)
             messages.success(
                 request,
@@ -55,32 +70,48 @@ def dashboard_redirect(request):
     """
     Redirect users to the correct dashboard based on user_type.
     """
-    profile, _ = Profile.objects.get_or_create(user=request.user)
-    if profile.user_type == 'Owner':
+    if request.role == 'Owner':
         return redirect('owner_dashboard')
-    elif profile.user_type == 'Inspector':
+    elif request.role == 'Inspector':
         return redirect('inspector_dashboard')
-    elif profile.user_type == 'Admin':
+    elif request.role == 'Admin':
         return redirect('admin_dashboard')
     else:
         return redirect('home')
 
 
-@login_required
-@role_required('Owner')
-def owner_dashboard(request):
-    """
-    Show inspection requests for the logged-in building owner.
-    """
-    requests = list(InspectionRequest.objects.filter(owner=request.user))
+def _attach_reports(requests):
+    """Set `report_obj` (or None) from the joined report, for the template."""
     # attach report object if exists to avoid template OneToOne access errors
-    from .models import InspectionReport
     for req in requests:
         try:
             req.report_obj = req.report
         except InspectionReport.DoesNotExist:
             req.report_obj = None
-    return render(request, 'owner/dashboard.html', {'data': requests})
+
+
+@login_required
+@role_required('Owner')
+def owner_dashboard(request):
+    """
+    Show the logged-in building owner's inspection requests, newest first and paginated.
+    """
+    owned = _owner_requests(request.user)
+    # per-status counts for the whole history in a single GROUP BY query
+    status_totals = dict(_status_totals(owned))
+    status_counts = [(value, status_totals[value]) for value, _ in InspectionRequest.STATUS_CHOICES if value in status_totals]
+    requests, next_cursor = keyset_page(
+        owned,
+        'created_at',
+        request.GET.get('cursor'),
+        descending=True,
+    )
+    _attach_reports(requests)
+    return render(request, 'owner/dashboard.html', {
+        'data': requests,
+        'next_cursor': next_cursor,
+        'status_counts': status_counts,
+    })
 
 
 @login_required
@@ -89,14 +120,15 @@ def inspector_dashboard(request):
     """
     Show inspection requests assigned to the logged-in inspector.
     """
-    requests = InspectionRequest.objects.filter(inspector=request.user)
+    requests = _inspector_requests(request.user)
     return render(request, 'inspector/dashboard.html', {'data': requests})
 
 
 @login_required
 def edit_profile(request):
     """Allow users (inspectors) to edit their profile fields."""
-    profile, _ = Profile.objects.get_or_create(user=request.user)
+    # profile attached by UserRoleMiddleware; an unsaved one is created on submit
+    profile = request.profile or Profile(user=request.user)
     from .forms import ProfileForm
     if request.method == 'POST':
         form = ProfileForm(request.POST, instance=profile)
@@ -112,27 +144,122 @@ def edit_profile(request):
     return render(request, 'inspector/edit_profile.html', {'form': form, 'profile': profile})
 
 
+def _parse_day(value, end=False):
+    """Turn a YYYY-MM-DD query param into an aware datetime bound (or None)."""
+    day = parse_date(value or '')
+    if day is None:
+        return None
+    if end:
+        day += datetime.timedelta(days=1)
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+# The list queries behind the dashboards, shared by the sync and async views
+# and by `manage.py check_query_plans`, which EXPLAINs them.
+
+def _status_totals(requests):
+    """Per-status counts of `requests` in a single GROUP BY query."""
+    return requests.order_by().values_list('status').annotate(total=Count('id'))
+
+
+def _owner_requests(user):
+    # report and inspector are joined in, so a page costs the same for any history size
+    return InspectionRequest.objects.filter(owner=user).select_related('report', 'inspector')
+
+
+def _inspector_requests(user):
+    return InspectionRequest.objects.filter(inspector=user).select_related('owner')
+
+
+def _received_messages(user):
+    return Message.objects.filter(recipient=user).select_related('sender')
+
+
+def _pending_inspectors():
+    return Profile.objects.filter(user_type='Inspector', is_approved=False).select_related('user')
+
+
+def _admin_filtered_requests(request):
+    """Return (filters, queryset) for the admin dashboard's query-string filters."""
+    filters = {
+        'status': request.GET.get('status', ''),
+        'req_type': request.GET.get('req_type', ''),
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+    }
+    # owner and inspector are joined so the template does no per-row lookups
+    requests = InspectionRequest.objects.select_related('owner', 'inspector')
+    if filters['status'] in dict(InspectionRequest.STATUS_CHOICES):
+        requests = requests.filter(status=filters['status'])
+    if filters['req_type'] in dict(InspectionRequest.REQ_TYPES):
+        requests = requests.filter(req_type=filters['req_type'])
+    start = _parse_day(filters['date_from'])
+    if start:
+        requests = requests.filter(created_at__gte=start)
+    end = _parse_day(filters['date_to'], end=True)
+    if end:
+        requests = requests.filter(created_at__lt=end)
+    # map filter: requests within radius_km of a gazetteer place, via the geohash index
+    filters['near'] = request.GET.get('near', '')
+    filters['radius_km'] = request.GET.get('radius_km', '5')
+    center = geocode(filters['near'])
+    if center:
+        try:
+            radius = max(float(filters['radius_km']), 0.1)
+        except ValueError:
+            radius = 5.0
+        requests = in_bbox(requests, *bbox_around(*center, radius))
+    return filters, requests
+
+
 @login_required
 @role_required('Admin')
 def admin_dashboard(request):
     """
-    Show all inspection requests to admin with optional balance info.
+    Show inspection requests to admin (filtered, cursor-paginated) with balance info.
     """
-    # Only allow Admin users (staff check remains as an extra safety net)
-    # role_required is not applied here because some admin-only flows check is_staff
-    requests = InspectionRequest.objects.all()
-    # get or create single AdminBalance row
-    from .models import AdminBalance, Profile
-    admin_balance_obj, _ = AdminBalance.objects.get_or_create(pk=1)
+    filters, requests = _admin_filtered_requests(request)
+
+    # per-status totals for the current filter
+    status_totals = dict(_status_totals(requests))
+    status_counts = [(value, status_totals.get(value, 0)) for value, _ in InspectionRequest.STATUS_CHOICES]
+
+    page, next_cursor = keyset_page(
+        requests,
+        'created_at',
+        request.GET.get('cursor'),
+        descending=True,
+    )
+    # cached sum of the sharded AdminBalance rows
+    admin_balance = admin_balance_total()
     # pending inspector approvals
-    pending_inspectors = Profile.objects.filter(user_type='Inspector', is_approved=False)
-    return render(request, 'admin/dashboard.html', {'data': requests, 'admin_balance': admin_balance_obj, 'pending_inspectors': pending_inspectors})
+    pending_inspectors = _pending_inspectors()
+    return render(request, 'admin/dashboard.html', {
+        'data': page,
+        'next_cursor': next_cursor,
+        'filters': filters,
+        'status_counts': status_counts,
+        'status_choices': InspectionRequest.STATUS_CHOICES,
+        'req_types': InspectionRequest.REQ_TYPES,
+        'places': place_names(),
+        'admin_balance': admin_balance,
+        'pending_inspectors': pending_inspectors,
+    })
 
 
 # views.py
 from django.contrib.auth import logout
 from django.shortcuts import redirect
 
+def metrics(request):
+    """Per-view request metrics in Prometheus text format (staff or METRICS_TOKEN bearer)."""
+    token = settings.METRICS_TOKEN
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (request.user.is_staff or (token and constant_time_compare(bearer, token))):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def custom_logout(request):
     logout(request)
     return redirect('home')
@@ -158,7 +285,7 @@ def request_inspection(request):
 @login_required
 def owner_complaint(request):
     """Submit a complaint to an inspector. Template expects `inspectors` context."""
-    inspectors = User.objects.filter(profile__user_type='Inspector')
+    inspectors = inspector_roster()
     if request.method == 'POST':
         inspector_id = request.POST.get('inspector')
         message_text = request.POST.get('message', '').strip()
@@ -178,9 +305,19 @@ def owner_complaint(request):
 
 @login_required
 def inbox(request):
-    """Show messages received by the current user."""
-    received = Message.objects.filter(recipient=request.user).order_by('-sent_at')
-    return render(request, 'messages/inbox.html', {'messages': received})
+    """Show messages received by the current user, newest first and paginated."""
+    received, next_cursor = keyset_page(
+        _received_messages(request.user),
+        'sent_at',
+        request.GET.get('cursor'),
+        descending=True,
+    )
+    # not `messages`: that name belongs to the flash messages base.html shows
+    return render(request, 'messages/inbox.html', {
+        'inbox_messages': received,
+        'next_cursor': next_cursor,
+        'unread_count': unread_count(request.user),
+    })
 
 
 @login_required
@@ -193,16 +330,12 @@ def payment(request, pk):
     if request.method == 'POST':
         # get chosen method (demo only)
         method = request.POST.get('method', 'Demo')
-        # simulate payment success: create Payment and update admin balance
+        # simulate payment success: append to the ledger (see ledger.py)
         success = True
-        from .models import Payment, AdminBalance
-        Payment.objects.create(payer=request.user, inspection_request=req, amount=amount)
+        record_payment(request.user, req, amount)
         # mark request as Paid
         req.status = 'Paid'
-        req.save()
-        admin_balance_obj, _ = AdminBalance.objects.get_or_create(pk=1)
-        admin_balance_obj.balance = (admin_balance_obj.balance or 0) + amount
-        admin_balance_obj.save()
+        req.save(update_fields=['status'])
     return render(request, 'owner/payment.html', {'amount': amount, 'success': success})
 
 
@@ -228,17 +361,28 @@ def admin_approve_inspectors(request):
             profile.user.delete()
             messages.success(request, f'Inspector {profile.user.username} rejected and user removed.')
         return redirect('admin_dashboard')
-    pending = Profile.objects.filter(user_type='Inspector', is_approved=False)
+    pending = _pending_inspectors()
     return render(request, 'admin/approve_inspectors.html', {'pending': pending})
 
 
+# inspectors listed nearest-first, with their distance, on the assignment form
+NEAREST_INSPECTORS = 10
+
+
 @login_required
 def admin_assign_inspector(request, pk=None):
-    from .models import Profile
     req = None
     if pk:
         req = get_object_or_404(InspectionRequest, pk=pk)
-    inspectors = User.objects.filter(profile__user_type='Inspector', profile__is_approved=True, profile__is_banned=False)
+    inspectors = [{'entry': i, 'distance_km': None} for i in inspector_roster()]
+    if req is not None and req.latitude is not None:
+        # the nearest few first, with their distance; everyone else after them
+        nearest = [
+            {'entry': entry, 'distance_km': distance}
+            for distance, entry in inspector_tree().nearest(req.latitude, req.longitude, k=NEAREST_INSPECTORS)
+        ]
+        listed = {i['entry'].id for i in nearest}
+        inspectors = nearest + [i for i in inspectors if i['entry'].id not in listed]
     if request.method == 'POST':
         inspector_id = request.POST.get('inspector')
         inspector = User.objects.get(pk=inspector_id)
@@ -283,7 +427,7 @@ def admin_manage_complaints(request):
             messages.success(request, f'Responded to complaint {comp.pk}.')
         return redirect('admin_manage_complaints')
 
-    complaints = Complaint.objects.all().order_by('-created_at')
+    complaints = Complaint.objects.select_related('reporter', 'against_inspector').order_by('-created_at')
     return render(request, 'admin/complaints.html', {'complaints': complaints})
 
 
@@ -306,12 +450,33 @@ def admin_set_fee(request, pk):
     return render(request, 'admin/set_fee.html', {'request_obj': req})
 
 
+# Sortable columns for the admin user directory (query param -> ORM field)
+USER_SORT_FIELDS = {
+    'username': 'username',
+    'email': 'email',
+    'joined': 'date_joined',
+    'type': 'sort_type',
+}
+
+
+def _admin_users():
+    """Users with their profile and request counts, as the admin user directory lists them.
+
+    The counts are subqueries: two Count()s over joins would multiply rows
+    before counting. A user without a Profile sorts by type as ''.
+    """
+    return User.objects.select_related('profile').annotate(
+        inspections_count=related_count(InspectionRequest, 'owner'),
+        assigned_count=related_count(InspectionRequest, 'inspector'),
+        sort_type=Coalesce('profile__user_type', Value('')),
+    )
+
+
 @login_required
 def admin_view_users(request):
     if not request.user.is_staff:
         messages.error(request, 'Permission denied.')
         return redirect('dashboard_redirect')
-    users = User.objects.all().order_by('username')
     from .models import Profile
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -327,14 +492,79 @@ def admin_view_users(request):
             profile.save()
             messages.success(request, f'User {user.username} unbanned.')
         return redirect('admin_view_users')
-    # attach profile and counts
+
+    # One annotated query per page: profile is joined in and both request
+    # counts are computed by the database instead of per-user queries.
+    users = _admin_users()
+    user_type = request.GET.get('user_type', '')
+    if user_type in dict(Profile.USER_TYPES):
+        users = users.filter(profile__user_type=user_type)
+    else:
+        user_type = ''
+    banned = request.GET.get('banned', '')
+    if banned in ('yes', 'no'):
+        users = users.filter(profile__is_banned=(banned == 'yes'))
+    else:
+        banned = ''
+    sort = request.GET.get('sort', 'username')
+    if sort not in USER_SORT_FIELDS:
+        sort = 'username'
+    descending = request.GET.get('dir') == 'desc'
+    page, next_cursor = keyset_page(users, USER_SORT_FIELDS[sort], request.GET.get('cursor'), descending=descending)
+
     user_rows = []
-    for u in users:
-        profile, _ = Profile.objects.get_or_create(user=u)
-        inspections_count = InspectionRequest.objects.filter(owner=u).count()
-        assigned_count = InspectionRequest.objects.filter(inspector=u).count()
-        user_rows.append({'user': u, 'profile': profile, 'inspections_count': inspections_count, 'assigned_count': assigned_count})
-    return render(request, 'admin/users.html', {'users': user_rows})
+    for u in page:
+        user_rows.append({
+            'user': u,
+            'profile': getattr(u, 'profile', None),
+            'inspections_count': u.inspections_count,
+            'assigned_count': u.assigned_count,
+        })
+    return render(request, 'admin/users.html', {
+        'users': user_rows,
+        'next_cursor': next_cursor,
+        'user_types': Profile.USER_TYPES,
+        'filters': {'user_type': user_type, 'banned': banned, 'sort': sort, 'dir': 'desc' if descending else 'asc'},
+    })
+
+
+@login_required
+def admin_export(request):
+    """Stream requests + reports + payments as CSV or JSON Lines (staff only)."""
+    if not request.user.is_staff:
+        messages.error(request, 'Permission denied.')
+        return redirect('dashboard_redirect')
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'csv'
+    status = request.GET.get('status', '')
+    requests = export_queryset(
+        date_from=_parse_day(request.GET.get('date_from')),
+        date_to=_parse_day(request.GET.get('date_to'), end=True),
+        status=status if status in dict(InspectionRequest.STATUS_CHOICES) else None,
+    )
+    content_type = 'application/x-ndjson' if fmt == 'jsonl' else 'text/csv; charset=utf-8'
+    resp = streaming_response(request, iter_export(fmt, iter_export_rows(requests)), content_type=content_type)
+    resp['Content-Disposition'] = f'attachment; filename=inspections.{fmt}'
+    return resp
+
+
+@login_required
+def admin_search(request):
+    """Ranked prefix search over requests, reports, complaints and messages (staff only)."""
+    if not request.user.is_staff:
+        messages.error(request, 'Permission denied.')
+        return redirect('dashboard_redirect')
+    query = request.GET.get('q', '').strip()
+    doc_type = request.GET.get('type', '')
+    doc_types = [doc_type] if doc_type in SEARCH_SOURCES else None
+    results = load_hits(search(query, doc_types=doc_types)) if query else []
+    return render(request, 'admin/search.html', {
+        'query': query,
+        'doc_type': doc_type,
+        'doc_types': list(SEARCH_SOURCES),
+        'results': results,
+    })
 
 
 @login_required
@@ -374,13 +604,13 @@ def inspector_inspection_view(request, pk):
 def send_message(request):
     """Send a new internal message to another user."""
     # Restrict recipients to Admins and Inspectors only
-    users = User.objects.filter(profile__user_type__in=['Admin', 'Inspector']).exclude(pk=request.user.pk)
+    users = [u for u in admin_roster() + inspector_roster() if u.id != request.user.pk]
     if request.method == 'POST':
         recipient_id = request.POST.get('recipient')
         subject = request.POST.get('subject', '')
         body = request.POST.get('body', '')
         recipient = get_object_or_404(User, pk=recipient_id)
-        Message.objects.create(sender=request.user, recipient=recipient, subject=subject, body=body)
+        start_thread(request.user, recipient, subject, body)
         messages.success(request, 'Message sent.')
         return redirect('inbox')
     return render(request, 'messages/send.html', {'users': users})
@@ -388,61 +618,123 @@ def send_message(request):
 
 @login_required
 def view_message(request, pk):
-    """View a received message and optionally reply."""
-    msg = get_object_or_404(Message, pk=pk)
+    """View a received message and optionally reply in its thread."""
+    msg = get_object_or_404(Message.objects.select_related('sender'), pk=pk)
     # Only allow recipient or sender to view (recipient can reply)
-    if request.user != msg.recipient and request.user != msg.sender:
+    if request.user.pk not in (msg.recipient_id, msg.sender_id):
         messages.error(request, 'Permission denied.')
         return redirect('inbox')
-    if request.user == msg.recipient and not msg.is_read:
-        msg.is_read = True
-        msg.save()
+    if request.user.pk == msg.recipient_id and not msg.is_read:
+        mark_read(msg, request.user)
     if request.method == 'POST':
-        # reply
-        reply_body = request.POST.get('body', '')
-        Message.objects.create(sender=request.user, recipient=msg.sender, subject=f'Re: {msg.subject}', body=reply_body)
+        thread = thread_for(msg)
+        reply(thread, request.user, request.POST.get('body', ''))
         messages.success(request, 'Reply sent.')
-        return redirect('inbox')
+        return redirect('view_thread', pk=thread.pk)
     return render(request, 'messages/view.html', {'msg': msg})
 
 
 @login_required
+def view_thread(request, pk):
+    """Show a conversation newest first, a page at a time, and reply to it."""
+    thread = get_object_or_404(Thread.objects.prefetch_related('participants'), pk=pk)
+    participants = thread.participants.all()
+    if request.user.pk not in {u.pk for u in participants}:
+        messages.error(request, 'Permission denied.')
+        return redirect('inbox')
+    if request.method == 'POST':
+        reply(thread, request.user, request.POST.get('body', ''))
+        messages.success(request, 'Reply sent.')
+        return redirect('view_thread', pk=thread.pk)
+    page, next_cursor = thread_page(thread, request.GET.get('cursor'))
+    mark_many_read([m.pk for m in page if m.recipient_id == request.user.pk and not m.is_read], request.user)
+    return render(request, 'messages/thread.html', {
+        'thread': thread,
+        'participants': participants,
+        'thread_messages': page,
+        'next_cursor': next_cursor,
+    })
+
+
+def _report_etag(kind):
+    """Build an etag_func for `condition`; None (no conditional handling) if not permitted."""
+    def etag(request, pk):
+        meta = report_meta(pk)
+        if meta is None or not can_view_report(request.user, meta):
+            return None
+        return _report_etag_value(kind, pk, meta, request.user)
+    return etag
+
+
+def _report_etag_value(kind, pk, meta, user):
+    # the HTML page also shows who is logged in, so it varies by user
+    viewer = user.pk if kind == 'html' else ''
+    return f'report-{kind}-{pk}-{meta["updated_at"].timestamp()}-{viewer}'
+
+
+def _report_last_modified(request, pk):
+    meta = report_meta(pk)
+    if meta is None or not can_view_report(request.user, meta):
+        return None
+    return meta['updated_at']
+
+
+@login_required
+@condition(etag_func=_report_etag('html'), last_modified_func=_report_last_modified)
 def view_report(request, pk):
     """Render an inspection report for viewing by owner, inspector, or admin."""
-    report = get_object_or_404(InspectionReport, pk=pk)
+    meta = report_meta(pk)
+    if meta is None:
+        raise Http404('No InspectionReport matches the given query.')
     # permission: owner, inspector, or staff
-    if request.user != report.inspection_request.owner and request.user != report.inspector and not request.user.is_staff:
+    if not can_view_report(request.user, meta):
         messages.error(request, 'Permission denied.')
         return redirect('dashboard_redirect')
-    return render(request, 'inspector/report.html', {'report': report})
+    body = cached_render('html', pk, render_report_body)
+    resp = render(request, 'inspector/report.html', {
+        'report_body': mark_safe(body),
+        'report_pk': pk,
+        'report_owner_id': meta['owner_id'],
+    })
+    patch_cache_control(resp, private=True, no_cache=True)
+    return resp
 
 
 @login_required
+@condition(etag_func=_report_etag('txt'), last_modified_func=_report_last_modified)
 def download_report(request, pk):
     """Provide a simple text download of the inspection report."""
-    report = get_object_or_404(InspectionReport, pk=pk)
-    if request.user != report.inspection_request.owner and request.user != report.inspector and not request.user.is_staff:
+    meta = report_meta(pk)
+    if meta is None:
+        raise Http404('No InspectionReport matches the given query.')
+    if not can_view_report(request.user, meta):
         messages.error(request, 'Permission denied.')
         return redirect('dashboard_redirect')
 
-    lines = []
-    lines.append(f"Inspection Report #{report.pk}")
-    lines.append(f"Owner: {report.inspection_request.owner.username} ({report.inspection_request.owner.email})")
-    lines.append(f"Building location: {report.inspection_request.building_location}")
-    lines.append(f"Inspection date: {report.inspection_date}")
-    lines.append("")
-    lines.append("Structural safety evaluation:")
-    lines.append(report.structural_evaluation or '(none)')
-    lines.append("")
-    lines.append("Compliance checklist:")
-    lines.append(report.compliance_checklist or '(none)')
-    lines.append("")
-    lines.append(f"Decision: {report.decision}")
-    lines.append("")
-    lines.append("Remarks:")
-    lines.append(report.remarks or '(none)')
-
-    content = "\n".join(lines)
+    content = cached_render('txt', pk, render_report_text)
     resp = HttpResponse(content, content_type='text/plain; charset=utf-8')
-    resp['Content-Disposition'] = f'attachment; filename=inspection_report_{report.pk}.txt'
+    resp['Content-Disposition'] = f'attachment; filename={report_filename(pk)}'
+    patch_cache_control(resp, private=True, no_cache=True)
+    return resp
+
+
+@login_required
+def admin_download_reports(request):
+    """Stream a zip of every report in a date range and/or by one inspector (staff only)."""
+    if not request.user.is_staff:
+        messages.error(request, 'Permission denied.')
+        return redirect('dashboard_redirect')
+    inspector_id = request.GET.get('inspector')
+    reports = batch_reports(
+        date_from=_parse_day(request.GET.get('date_from')),
+        date_to=_parse_day(request.GET.get('date_to'), end=True),
+        inspector_id=int(inspector_id) if inspector_id and inspector_id.isdigit() else None,
+    )
+    digest = selection_digest(reports)
+    cached = cache.get(zip_cache_key(digest))
+    if cached is not None:
+        resp = HttpResponse(cached, content_type='application/zip')
+    else:
+        resp = streaming_response(request, iter_reports_zip(reports, digest), content_type='application/zip')
+    resp['Content-Disposition'] = 'attachment; filename=inspection_reports.zip'
     return resp
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ubr.settings')
+# route the read-heavy dashboards to their async views (myapp/async_views.py)
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# connect once and log any connection profile problems (myapp/checks.py)
+from myapp.checks import startup_self_check  # noqa: E402
+
+startup_self_check()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.middleware.InstrumentationMiddleware',
+    'myapp.middleware.UserRoleMiddleware',
     'myapp.middleware.BannedUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -55,7 +58,9 @@ ROOT_URLCONF = 'ubr.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates with render timing for Server-Timing/metrics
+        'BACKEND': 'myapp.instrumentation.InstrumentedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,6 +87,8 @@ DATABASES = {
         'PASSWORD': 'ubr_nsm123',
         'HOST': 'localhost',
         'PORT': '3306',
+        # give up on an unreachable server instead of hanging the worker
+        'OPTIONS': {'connect_timeout': 5},
     }
 }
 # DATABASES = {
@@ -95,6 +102,36 @@ DATABASES = {
 #     }
 # }
 
+# Serve the read-heavy views from myapp/async_views.py. ubr/asgi.py turns this
+# on; under WSGI the sync views are faster, so it stays off there.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '') == '1'
+
+# Connection profile (compare with `manage.py benchmark_connections`; checked
+# at startup by myapp/checks.py):
+# - DB_CONN_MAX_AGE: seconds a thread keeps its connection between requests,
+#   0 to connect for every request. Defaults to 60, or 0 under ASGI, where
+#   Django opens a connection per thread and a kept one can be left behind.
+#   Health checks ping a kept connection before a request reuses it, so a
+#   server restart or wait_timeout costs a reconnect instead of an error.
+# - DB_POOL_SIZE: when set, each worker process shares up to this many
+#   connections through the pool in myapp/dbpool.py instead, and requests hand
+#   theirs back when they finish (works under ASGI too). DB_POOL_TIMEOUT is how
+#   long a request waits for a free connection.
+# - WEB_CONCURRENCY, WEB_THREADS: worker processes and threads per worker of
+#   the app server, so the self-check can compare the connections all workers
+#   may open with the server's max_connections.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DB_POOL_SIZE:
+    DATABASES['default'].update(
+        ENGINE='myapp.db.mysql',
+        CONN_MAX_AGE=0,
+        POOL={'SIZE': DB_POOL_SIZE, 'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', '10'))},
+    )
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '0' if ASYNC_VIEWS else '60'))
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', '1'))
 
 
 # Password validation
@@ -139,6 +176,47 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR.parent / "static"]
 
 
+# Per-process memory cache by default. With several worker processes, set
+# REDIS_URL so they share one cache (requires the `redis` package).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Session storage, picked with the SESSION_MODE environment variable
+# (compare them with `manage.py benchmark_sessions`):
+# - cached_db (default): read from the cache, written through to the
+#   django_session table, so a cache miss or restart loses nothing
+# - db: every authenticated request reads a django_session row
+# - cache: cache only; sessions are lost when the cache evicts or restarts
+# - signed_cookies: no server-side storage, the data travels in a signed cookie
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_MODE', 'cached_db')]
+# Flash messages travel in a cookie, so a view that only flashes a message
+# does not write the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Loads the Profile together with the session user (see myapp/backends.py)
+AUTHENTICATION_BACKENDS = ['myapp.backends.ProfileBackend']
+
+# Bearer token Prometheus sends to scrape /metrics/ (staff can always view it)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Report templates that run the same query more than TEMPLATE_QUERY_THRESHOLD
+# times in one response (N+1 relation access): 'log', 'raise' or '' (off).
+# The test runner always raises.
+TEMPLATE_QUERY_CHECK = 'log' if DEBUG else ''
+TEMPLATE_QUERY_THRESHOLD = 3
+TEST_RUNNER = 'myapp.testing.QueryCheckingTestRunner'
+
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 # Default primary key type for models
@@ -184,6 +184,10 @@ DATABASES = {
         'PASSWORD': '12345@@',
         'HOST': 'localhost',
         'PORT': '3306',
+        # keep connections between requests; ping them before reuse
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'connect_timeout': 5},
     }
 }
 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ubr.settings')
 
 application = get_wsgi_application()
+
+# connect once and log any connection profile problems (myapp/checks.py)
+from myapp.checks import startup_self_check  # noqa: E402
+
+startup_self_check()